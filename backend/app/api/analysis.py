@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.api.dataset_store import load_dataframe, iter_dataframe_chunks
+from app.api.sketches import ReservoirSample
+from app.db.mongo import dataset_collection
+
+from logger import logger
+
+# Post-training analysis (overridable through the environment)
+ANALYSIS_ENABLED = os.getenv("ANALYSIS_ENABLED", "1") == "1"
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+ANALYSIS_N_JOBS = int(os.getenv("ANALYSIS_N_JOBS", "-1"))
+ANALYSIS_N_REPEATS = int(os.getenv("ANALYSIS_N_REPEATS", "5"))
+ANALYSIS_MAX_ROWS = int(os.getenv("ANALYSIS_MAX_ROWS", "20000"))
+ANALYSIS_CHUNK_ROWS = 200000
+
+RESIDUAL_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _round(value, digits: int = 6):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _feature_stats(X: pd.DataFrame, importances) -> dict:
+    stats = {}
+    for i, col in enumerate(X.columns):
+        series = X[col]
+        entry = {
+            "dtype": str(series.dtype),
+            "missing_pct": round(float(series.isna().mean()) * 100, 2),
+            "unique_values": int(series.nunique()),
+            "importance_mean": _round(importances.importances_mean[i]),
+            "importance_std": _round(importances.importances_std[i]),
+        }
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            entry.update({
+                "mean": _round(series.mean()),
+                "std": _round(series.std()),
+                "min": _round(series.min()),
+                "max": _round(series.max()),
+            })
+        stats[col] = entry
+    return stats
+
+
+def compute_analysis(pipeline_artifacts: dict, holdout: pd.DataFrame) -> dict:
+    """
+    Permutation importance of the raw input columns (not the one-hot
+    expanded ones), a confusion matrix or residual summary, and per-feature
+    stats for a trained model on held-out rows. Permutations run in
+    parallel across cores.
+    """
+    from sklearn.inspection import permutation_importance
+    from sklearn.metrics import classification_report, confusion_matrix
+
+    pipeline = pipeline_artifacts["pipeline"]
+    label_encoder = pipeline_artifacts.get("label_encoder")
+    target_col = pipeline_artifacts["target_col"]
+
+    X = holdout.drop(columns=[target_col])
+    y = holdout[target_col]
+    if label_encoder is not None:
+        y = label_encoder.transform(y)
+    scoring = "accuracy" if label_encoder is not None else "r2"
+
+    importances = permutation_importance(
+        pipeline, X, y, scoring=scoring, n_repeats=ANALYSIS_N_REPEATS,
+        n_jobs=ANALYSIS_N_JOBS, random_state=42,
+    )
+    order = np.argsort(importances.importances_mean)[::-1]
+
+    analysis = {
+        "rows": len(X),
+        "scoring": scoring,
+        "n_repeats": ANALYSIS_N_REPEATS,
+        "permutation_importance": {
+            X.columns[i]: {
+                "mean": _round(importances.importances_mean[i]),
+                "std": _round(importances.importances_std[i]),
+            }
+            for i in order
+        },
+        "feature_stats": _feature_stats(X, importances),
+    }
+
+    y_pred = pipeline.predict(X)
+    if label_encoder is not None:
+        labels = np.arange(len(label_encoder.classes_))
+        names = [str(c) for c in label_encoder.classes_]
+        analysis["confusion_matrix"] = {
+            "labels": names,
+            "matrix": confusion_matrix(y, y_pred, labels=labels).tolist(),
+        }
+        analysis["class_report"] = classification_report(
+            y, y_pred, labels=labels, target_names=names, output_dict=True, zero_division=0
+        )
+    else:
+        residuals = np.asarray(y, dtype=np.float64) - y_pred
+        counts, edges = np.histogram(residuals, bins=20)
+        analysis["residuals"] = {
+            "mean": _round(residuals.mean()),
+            "std": _round(residuals.std()),
+            "mae": _round(np.abs(residuals).mean()),
+            "quantiles": {str(q): _round(v) for q, v in zip(RESIDUAL_QUANTILES, np.quantile(residuals, RESIDUAL_QUANTILES))},
+            "histogram": {"counts": counts.tolist(), "edges": [_round(e) for e in edges]},
+        }
+    return analysis
+
+
+def _holdout_frame(session_id: str, meta: dict, target_col: str) -> pd.DataFrame:
+    mode = (meta.get("training_profile") or {}).get("mode", "standard")
+    if mode == "incremental":
+        # The streaming holdout isn't reproducible; a uniform sample stands in for it
+        sample = ReservoirSample(ANALYSIS_MAX_ROWS, seed=42)
+        for chunk in iter_dataframe_chunks(session_id, meta, ANALYSIS_CHUNK_ROWS):
+            sample.update(chunk)
+        return sample.frame.dropna(subset=[target_col])
+
+    from sklearn.model_selection import train_test_split
+
+    # Same rows /train held out (same size and random_state)
+    df = load_dataframe(session_id, meta)
+    _, holdout = train_test_split(df, test_size=0.2, random_state=42)
+    if len(holdout) > ANALYSIS_MAX_ROWS:
+        holdout = holdout.sample(ANALYSIS_MAX_ROWS, random_state=42)
+    return holdout
+
+
+def _set_analysis(session_id: str, model_file_id, fields: dict):
+    # Conditional on the model version, so a stale run never overwrites a newer one
+    dataset_collection.update_one(
+        {"session_id": session_id, "model_file_id": model_file_id},
+        {"$set": {f"analysis.{k}": v for k, v in fields.items()}}
+    )
+
+
+def _run_analysis(session_id: str, model_file_id):
+    """Entry point executed inside an analysis worker process."""
+    from app.api.model_cache import load_model_artifacts
+
+    meta = dataset_collection.find_one({"session_id": session_id})
+    if not meta or meta.get("model_file_id") != model_file_id:
+        return
+    _set_analysis(session_id, model_file_id, {"status": "running", "started_at": datetime.utcnow()})
+
+    start = time.perf_counter()
+    try:
+        pipeline_artifacts, _ = load_model_artifacts(model_file_id)
+        if pipeline_artifacts is None:
+            raise FileNotFoundError(f"Model file {model_file_id} not found")
+        holdout = _holdout_frame(session_id, meta, pipeline_artifacts["target_col"])
+        analysis = compute_analysis(pipeline_artifacts, holdout)
+    except Exception as e:
+        logger.exception(f"❌ Analysis failed for session {session_id}")
+        _set_analysis(session_id, model_file_id, {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()})
+        return
+
+    analysis.update({
+        "status": "completed",
+        "seconds": round(time.perf_counter() - start, 3),
+        "finished_at": datetime.utcnow(),
+    })
+    _set_analysis(session_id, model_file_id, analysis)
+    logger.info(f"🔬 Analysis for session {session_id} computed in {analysis['seconds']}s")
+
+
+class AnalysisRunner:
+    """
+    Computes post-training analysis in a separate process pool so neither
+    /train nor the training workers wait for it. Results are stored under
+    the session's `analysis` field, tagged with the model version.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def submit(self, session_id: str, model_file_id):
+        if not ANALYSIS_ENABLED:
+            return
+        dataset_collection.update_one(
+            {"session_id": session_id, "model_file_id": model_file_id},
+            {"$set": {"analysis": {
+                "status": "queued",
+                "model_file_id": model_file_id,
+                "submitted_at": datetime.utcnow(),
+            }}}
+        )
+        future = self._get_executor().submit(_run_analysis, session_id, model_file_id)
+        future.add_done_callback(lambda f: self._on_done(session_id, model_file_id, f))
+
+    def _on_done(self, session_id: str, model_file_id, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        if isinstance(future.exception(), BrokenProcessPool):
+            with self._lock:
+                self._executor = None
+        logger.error(f"❌ Analysis worker crashed for session {session_id}: {future.exception()}")
+        _set_analysis(session_id, model_file_id, {"status": "failed", "error": str(future.exception())})
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+analysis_runner = AnalysisRunner(ANALYSIS_WORKERS)
@@ -0,0 +1,183 @@
+import hashlib
+import io
+from datetime import datetime
+
+import pandas as pd
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.compaction import compact_frame, UPLOAD_COMPACT
+from app.api.dataset_store import (
+    concat_parts, dataset_fingerprint, load_profile_aggregates, put_parquet, save_profile_aggregates,
+)
+from app.api.metrics import span, record_payload, record_rows
+from app.api.profile_cache import profile_cache, PROFILE_VERSION
+from app.api.profiling import ProfileAggregates
+from app.api.session_store import session_store
+from app.db.artifacts import ArtifactWriter, DATASET_COMPRESSION
+from app.db.mongo import fs, dataset_collection
+from app.db.mongo_async import async_dataset_collection
+
+from logger import logger
+
+router = APIRouter()
+
+def _align_to_schema(df: pd.DataFrame, parsed_schema: list) -> pd.DataFrame:
+    """Check appended rows against the dataset's columns and logical types."""
+    expected = [entry["column"] for entry in parsed_schema]
+    if sorted(df.columns) != sorted(expected):
+        missing = sorted(set(expected) - set(df.columns))
+        extra = sorted(set(df.columns) - set(expected))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Appended columns don't match the dataset (missing: {missing}, unexpected: {extra})",
+        )
+    df = df[expected]
+
+    for entry in parsed_schema:
+        col, series = entry["column"], df[entry["column"]]
+        if entry["dtype"] == "numerical" and not pd.api.types.is_numeric_dtype(series) \
+                and series.notna().any():
+            raise HTTPException(status_code=400, detail=f"Column '{col}' must be numeric")
+        if entry["dtype"] == "datetime" and not pd.api.types.is_datetime64_any_dtype(series):
+            parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+            unparsed = int(parsed.isna().sum() - series.isna().sum())
+            if unparsed:
+                logger.warning(f"⚠️ {unparsed} values of '{col}' aren't dates; stored as missing")
+            df = df.assign(**{col: parsed})
+    return df
+
+
+def _updated_schema(parsed_schema: list, aggregates: ProfileAggregates) -> list:
+    schema = []
+    for entry in parsed_schema:
+        summary = aggregates.column_summary(entry["column"])
+        unique_vals = summary["unique_values"]
+        if summary["approximate_unique"]:
+            # Misra-Gries drops rare values, so never report fewer than before
+            unique_vals = max(unique_vals, entry.get("unique_values", 0))
+        schema.append({
+            **entry,
+            "unique_values": unique_vals,
+            "null_percentage": round(summary["nulls"] / aggregates.n_rows * 100, 2) if aggregates.n_rows else 0.0,
+            "high_cardinality": unique_vals > 50,
+            "constant": unique_vals == 1,
+            "approximate_unique": summary["approximate_unique"] or entry.get("approximate_unique", False),
+        })
+    return schema
+
+
+def append_rows(session_id: str, meta: dict, contents: bytes, filename: str) -> dict:
+    """
+    Add rows to a session's dataset as a new part: the raw CSV (compressed)
+    and a Parquet copy go to GridFS, and the profile is updated by merging
+    the new rows into the stored aggregates. Concurrent appends to the same
+    session are detected and the later one is rejected.
+    """
+    version = meta.get("dataset_version", 0)
+    parsed_schema = meta.get("parsed_schema", [])
+
+    with span("append.read_csv"):
+        df = pd.read_csv(io.BytesIO(contents))
+    if df.empty:
+        raise HTTPException(status_code=400, detail="The appended CSV has no rows")
+    if UPLOAD_COMPACT:
+        with span("append.compact"):
+            df, _ = compact_frame(df)
+    df = _align_to_schema(df, parsed_schema)
+    record_rows("append", len(df))
+
+    with span("append.aggregate"):
+        # Built at upload or on the first /profile; the stored rows are never rescanned here
+        aggregates = load_profile_aggregates(meta)
+        if aggregates is None:
+            raise HTTPException(
+                status_code=409,
+                detail="The dataset's profile aggregates aren't ready yet; request /profile, then retry",
+            )
+        aggregates.update(df)
+
+    with span("append.gridfs_write"):
+        writer = ArtifactWriter(filename, DATASET_COMPRESSION, session_id=session_id)
+        writer.write(contents)
+        writer.close()
+        part = {
+            "csv_file_id": writer._id,
+            "parquet_file_id": put_parquet(session_id, df),
+            "csv_sha256": hashlib.sha256(contents).hexdigest(),
+            "num_rows": len(df),
+            "appended_at": datetime.utcnow(),
+        }
+        aggregates_file_id = save_profile_aggregates(session_id, aggregates)
+
+    new_version = version + 1
+    new_schema = _updated_schema(parsed_schema, aggregates)
+    fingerprint = dataset_fingerprint(session_id, {**meta, "parts": meta.get("parts", []) + [part]})
+    profile = aggregates.to_profile(new_schema)
+    profile_mode = "exact" if aggregates.exact else "approx"
+
+    # Only applies if nobody appended in between (sessions start without a version field)
+    expected_version = version if version else {"$in": [None, 0]}
+    result = dataset_collection.update_one(
+        {"session_id": session_id, "dataset_version": expected_version},
+        {
+            "$set": {
+                "dataset_version": new_version,
+                "num_rows": aggregates.n_rows,
+                "parsed_schema": new_schema,
+                "profile": profile,
+                "profile_fingerprint": fingerprint,
+                "profile_mode": profile_mode,
+                "profile_version": PROFILE_VERSION,
+                "profile_source": "incremental",
+                "profile_aggregates": {"file_id": aggregates_file_id, "dataset_version": new_version},
+            },
+            "$push": {"parts": part},
+        },
+    )
+    if result.matched_count == 0:
+        for file_id in (part["csv_file_id"], part["parquet_file_id"], aggregates_file_id):
+            if file_id is not None:
+                fs.delete(file_id)
+        raise HTTPException(status_code=409, detail="The dataset changed during the append; retry")
+
+    old_aggregates = (meta.get("profile_aggregates") or {}).get("file_id")
+    if old_aggregates is not None:
+        fs.delete(old_aggregates)
+
+    # Keep this worker's in-memory frame current; other workers see the version change
+    session = session_store.peek(session_id, version)
+    if session is not None:
+        session_store.put(session_id, concat_parts([session["df"], df]), new_schema, new_version)
+    profile_cache.put(session_id, f"{fingerprint}:{profile_mode}", profile)
+
+    logger.info(
+        f"➕ Appended {len(df)} rows to session {session_id} "
+        f"(now {aggregates.n_rows} rows, version {new_version}, {profile_mode} profile)"
+    )
+    return {
+        "session_id": session_id,
+        "appended_rows": len(df),
+        "num_rows": aggregates.n_rows,
+        "dataset_version": new_version,
+        "parsed_schema": new_schema,
+        "profile": profile,
+    }
+
+
+@router.post("/upload/append")
+async def append_csv(session_id: str = Form(...), file: UploadFile = File(...)):
+    logger.info(f"📤 Appending file {file.filename} to session {session_id}")
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed.")
+
+    meta = await async_dataset_collection.find_one({"session_id": session_id})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    contents = await file.read()
+    record_payload("append", len(contents))
+    try:
+        return await run_in_threadpool(append_rows, session_id, meta, contents, file.filename)
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Failed to read CSV: {e}")
@@ -1,10 +1,16 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.api.auth_cache import token_cache
 from app.db import models
 from app.db.database import SessionLocal
 from app.db.schemas import UserCreate, Token, TokenData, UserOut
@@ -18,8 +24,17 @@ SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hasher
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost (log2 rounds) and how many hashes may run at once
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+
+# Password hasher. Hashes made with another cost still verify and are
+# re-hashed at the configured cost on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is CPU-bound by design; a small dedicated pool keeps a burst of
+# logins from occupying every threadpool worker or core
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # OAuth2 token dependency
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
@@ -39,11 +54,43 @@ def verify_password(plain_password: str, hashed_password: str):
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def _run_hashing(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
+def _get_user(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def _load_user(username: str):
+    db = SessionLocal()
+    try:
+        user = _get_user(db, username)
+        return UserOut.model_validate(user).model_dump() if user else None
+    finally:
+        db.close()
+
+def _update_user(db: Session, user, **fields):
+    # Every change to a stored user goes through here, so cached tokens never serve stale fields
+    for name, value in fields.items():
+        setattr(user, name, value)
+    db.commit()
+    token_cache.invalidate_user(user.username)
+
+def _rehash_user(db: Session, user, new_hash: str):
+    _update_user(db, user, hashed_password=new_hash)
+
+async def authenticate_user(db: Session, username: str, password: str):
+    user = await run_in_threadpool(_get_user, db, username)
+    if not user:
+        logger.warning(f"Authentication failed for '{username}'")
+        return None
+
+    verified, new_hash = await _run_hashing(pwd_context.verify_and_update, password, user.hashed_password)
+    if not verified:
         logger.warning(f"Authentication failed for '{username}'")
         return None
+    if new_hash:
+        logger.info(f"🔐 Re-hashing password for '{username}' at cost {BCRYPT_ROUNDS}")
+        await run_in_threadpool(_rehash_user, db, user, new_hash)
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -52,26 +99,29 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Routes
-@router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    logger.info(f"Registering user: {user.username}")
-    if db.query(models.User).filter(models.User.username == user.username).first():
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    hashed_pw = get_password_hash(user.password)
+def _create_user(db: Session, user: UserCreate, hashed_pw: str):
     new_user = models.User(username=user.username, email=user.email, hashed_password=hashed_pw)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     return new_user
 
+# Routes
+@router.post("/register", response_model=UserOut)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    logger.info(f"Registering user: {user.username}")
+    if await run_in_threadpool(_get_user, db, user.username):
+        raise HTTPException(status_code=400, detail="Username already registered")
+
+    hashed_pw = await _run_hashing(get_password_hash, user.password)
+    return await run_in_threadpool(_create_user, db, user, hashed_pw)
+
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
@@ -79,7 +129,12 @@ def login_for_access_token(
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserOut)
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    # Recently validated tokens skip the JWT decode and the user query
+    cached = token_cache.get(token)
+    if cached is not None:
+        return UserOut(**cached)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -90,8 +145,14 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate token")
 
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    user = await run_in_threadpool(_load_user, token_data.username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return user
+
+    token_cache.put(token, user, token_expires_at=payload.get("exp", 0))
+    return UserOut(**user)
+
+
+@router.get("/auth/cache-stats")
+def auth_cache_stats():
+    return token_cache.stats()
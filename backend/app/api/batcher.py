@@ -0,0 +1,138 @@
+import asyncio
+import os
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.inference import predict_records
+
+from logger import logger
+
+# Micro-batching of concurrent /predict calls (opt-in)
+PREDICT_MICROBATCH = os.getenv("PREDICT_MICROBATCH", "0") == "1"
+PREDICT_MICROBATCH_WINDOW_MS = float(os.getenv("PREDICT_MICROBATCH_WINDOW_MS", "5"))
+PREDICT_MICROBATCH_MAX_ROWS = int(os.getenv("PREDICT_MICROBATCH_MAX_ROWS", "256"))
+
+
+class _PendingBatch:
+    def __init__(self, pipeline_artifacts):
+        self.pipeline_artifacts = pipeline_artifacts
+        self.items = []  # (records, future)
+        self.rows = 0
+        self.timer = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent /predict calls for the same model into one
+    vectorized predict.
+
+    The first request for a model opens a batch; it is scored when the
+    window elapses or max_rows rows have been queued, whichever comes
+    first, and each caller gets its own slice of the predictions. Batched
+    rows always take the NumPy fast path, which validates every record the
+    same way a lone request would. If the combined call fails, the requests
+    are scored one by one so a bad request only fails itself.
+    """
+
+    def __init__(self, window_ms: float, max_rows: int):
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._pending = {}  # (session_id, id(artifacts)) -> _PendingBatch
+
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.fallbacks = 0
+
+    async def predict(self, session_id: str, pipeline_artifacts: dict, records: list):
+        if len(records) >= self.max_rows:
+            return await run_in_threadpool(predict_records, pipeline_artifacts, records)
+
+        loop = asyncio.get_running_loop()
+        key = (session_id, id(pipeline_artifacts))
+        batch = self._pending.get(key)
+        if batch is not None and batch.rows + len(records) > self.max_rows:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _PendingBatch(pipeline_artifacts)
+            batch.timer = loop.call_later(self.window, self._flush, key)
+            self._pending[key] = batch
+
+        future = loop.create_future()
+        batch.items.append((records, future))
+        batch.rows += len(records)
+        self.queue_depth += len(records)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        if batch.rows >= self.max_rows:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+
+        self.queue_depth -= batch.rows
+        self.batches += 1
+        self.requests += len(batch.items)
+        self.rows += batch.rows
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: _PendingBatch):
+        records = [record for item_records, _ in batch.items for record in item_records]
+        try:
+            preds = await run_in_threadpool(
+                predict_records, batch.pipeline_artifacts, records, self.max_rows
+            )
+        except Exception as e:
+            if len(batch.items) == 1:
+                _resolve(batch.items[0][1], error=e)
+                return
+            self.fallbacks += 1
+            logger.info(f"↩️ Batched predict failed ({e}); scoring {len(batch.items)} requests individually")
+            for item_records, future in batch.items:
+                try:
+                    _resolve(future, await run_in_threadpool(
+                        predict_records, batch.pipeline_artifacts, item_records, self.max_rows
+                    ))
+                except Exception as item_error:
+                    _resolve(future, error=item_error)
+            return
+
+        offset = 0
+        for item_records, future in batch.items:
+            _resolve(future, preds[offset:offset + len(item_records)])
+            offset += len(item_records)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PREDICT_MICROBATCH,
+            "window_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "avg_requests_per_batch": round(self.requests / self.batches, 3) if self.batches else 0.0,
+            "avg_batch_fill": round(self.rows / (self.batches * self.max_rows), 4) if self.batches else 0.0,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def _resolve(future, result=None, error=None):
+    # The caller may have gone away (client disconnect) while the batch ran
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+micro_batcher = MicroBatcher(PREDICT_MICROBATCH_WINDOW_MS, PREDICT_MICROBATCH_MAX_ROWS)
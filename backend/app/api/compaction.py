@@ -0,0 +1,328 @@
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from app.api.ingest import DistinctCounter, _hash_values
+from logger import logger
+
+# Ingestion-time compaction (overridable through the environment)
+UPLOAD_COMPACT = os.getenv("UPLOAD_COMPACT", "1") == "1"
+UPLOAD_PARSE_DATES = os.getenv("UPLOAD_PARSE_DATES", "1") == "1"
+# String columns with at most this share of distinct values become `category`
+UPLOAD_CATEGORY_MAX_RATIO = float(os.getenv("UPLOAD_CATEGORY_MAX_RATIO", "0.5"))
+
+_EPOCH = pd.Timestamp("1970-01-01", tz="UTC")
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _date_format(value: str):
+    """
+    The strptime format of a full calendar date (year, month and day, with
+    or without a time), or None. Month names, bare times ("10:30"),
+    relative words ("now") and durations ("1h") have no such format and
+    stay text.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fmt = guess_datetime_format(value)
+    if fmt is None:
+        return None
+    has_year = "%Y" in fmt or "%y" in fmt
+    has_month = any(code in fmt for code in ("%m", "%b", "%B"))
+    return fmt if has_year and has_month and "%d" in fmt else None
+
+
+def _parse_dates(series: pd.Series):
+    """The column as tz-naive datetimes if every non-null value parses with one date format, else None."""
+    values = series.dropna()
+    if values.empty or not isinstance(values.iloc[0], str):
+        return None
+    fmt = _date_format(values.iloc[0])
+    if fmt is None:
+        return None
+    parsed = pd.to_datetime(series, errors="coerce", format=fmt)
+    if parsed.notna().sum() != len(values) or not pd.api.types.is_datetime64_dtype(parsed):
+        return None
+    return parsed
+
+
+def _downcast_integer(series: pd.Series) -> pd.Series:
+    # Range-checked, so always lossless
+    return pd.to_numeric(series, downcast="integer")
+
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    compact = series.astype(np.float32)
+    # Only when every value survives the float32 round trip exactly
+    if np.array_equal(compact.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+        return compact
+    return series
+
+
+def compact_frame(df: pd.DataFrame):
+    """
+    Shrink a freshly parsed frame without changing any value: ISO/consistent
+    date strings become datetimes, low-cardinality strings become
+    `category`, integers get the smallest type that holds their range and
+    floats become float32 when that round-trips exactly.
+
+    Returns (frame, report) where the report holds per-column storage dtypes
+    and deep memory footprints before and after.
+    """
+    start = time.perf_counter()
+    before = df.memory_usage(deep=True, index=False)
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            out[col] = series
+        elif _is_text(series):
+            parsed = _parse_dates(series) if UPLOAD_PARSE_DATES else None
+            if parsed is not None:
+                out[col] = parsed
+            elif series.nunique() <= UPLOAD_CATEGORY_MAX_RATIO * max(len(series), 1):
+                out[col] = series.astype("category")
+            else:
+                out[col] = series
+        elif pd.api.types.is_integer_dtype(series):
+            out[col] = _downcast_integer(series)
+        elif pd.api.types.is_float_dtype(series):
+            out[col] = _downcast_float(series)
+        else:
+            out[col] = series
+    compact = pd.DataFrame(out, index=df.index)
+    after = compact.memory_usage(deep=True, index=False)
+
+    report = {
+        "bytes_before": int(before.sum()),
+        "bytes_after": int(after.sum()),
+        "seconds": round(time.perf_counter() - start, 4),
+        "columns": {
+            col: {
+                "storage_dtype": str(compact[col].dtype),
+                "memory_bytes_before": int(before[col]),
+                "memory_bytes": int(after[col]),
+            }
+            for col in compact.columns
+        },
+    }
+    logger.info(
+        f"🗜️ Compacted frame {report['bytes_before'] / 1e6:.1f} MB -> "
+        f"{report['bytes_after'] / 1e6:.1f} MB in {report['seconds']}s"
+    )
+    return compact, report
+
+
+def _smallest_integer(low: int, high: int) -> str:
+    # The type pd.to_numeric(downcast="integer") picks for this range
+    for dtype in ("int8", "int16", "int32"):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return "int64"
+
+
+class _ColumnPlan:
+    """What one column looks like over every chunk, and how to read and store it."""
+
+    def __init__(self):
+        self.kinds = set()
+        self.nulls = False
+        self.distinct = DistinctCounter()
+        self.date_format = None
+        self.date_dtype = None
+        self.dates = UPLOAD_PARSE_DATES
+        self.low = self.high = None
+        self.float32 = True
+        self.read_dtype = None
+        self.target = None
+
+    def update(self, series: pd.Series):
+        non_null = series.dropna()
+        self.nulls = self.nulls or len(non_null) < len(series)
+        if non_null.empty:
+            return
+
+        if pd.api.types.is_bool_dtype(series):
+            self.kinds.add("bool")
+        elif _is_text(series):
+            self.kinds.add("text")
+            self.distinct.add(_hash_values(non_null))
+            if self.dates:
+                self._check_dates(non_null)
+        else:
+            # Numbers (even in a column that turns out to be text) are never dates
+            self.dates = False
+            self.distinct.add(_hash_values(non_null.astype(str)))
+            values = non_null.to_numpy(dtype=np.float64)
+            if pd.api.types.is_integer_dtype(series):
+                self.kinds.add("int")
+                low, high = int(non_null.min()), int(non_null.max())
+                self.low = low if self.low is None else min(self.low, low)
+                self.high = high if self.high is None else max(self.high, high)
+            else:
+                self.kinds.add("float")
+            if self.float32:
+                self.float32 = np.array_equal(values.astype(np.float32).astype(np.float64), values)
+
+    def _check_dates(self, values: pd.Series):
+        # Same test as _parse_dates: one format, taken from the first value, fits every value
+        if self.date_format is None:
+            first = values.iloc[0]
+            self.date_format = _date_format(first) if isinstance(first, str) else None
+            if self.date_format is None:
+                self.dates = False
+                return
+        parsed = pd.to_datetime(values, errors="coerce", format=self.date_format)
+        if parsed.isna().any() or not pd.api.types.is_datetime64_dtype(parsed):
+            self.dates = False
+        else:
+            self.date_dtype = parsed.dtype
+
+    def settle(self, num_rows: int, compact: bool):
+        """Pick the dtype a single read_csv would give the column, then its compact_frame dtype."""
+        if self.kinds == {"int"} and not self.nulls:
+            self.read_dtype = "int64"
+            self.target = _smallest_integer(self.low, self.high)
+        elif self.kinds <= {"int", "float"}:
+            # All-null columns parse as float too
+            self.read_dtype = "float64"
+            self.target = "float32" if self.float32 else None
+        elif self.kinds == {"bool"}:
+            # With missing values read_csv keeps a bool column as objects; left to the parser
+            self.read_dtype = None if self.nulls else "bool"
+        else:
+            self.read_dtype = "str"
+            if self.dates and self.date_format is not None and self.kinds == {"text"}:
+                self.target = "datetime"
+            elif self.distinct.count() <= UPLOAD_CATEGORY_MAX_RATIO * max(num_rows, 1):
+                self.target = "category"
+        if not compact:
+            self.target = None
+
+    def convert(self, series: pd.Series) -> pd.Series:
+        if self.target is None:
+            return series
+        if self.target == "datetime":
+            parsed = pd.to_datetime(series, errors="coerce", format=self.date_format)
+            return parsed.astype(self.date_dtype)
+        return series.astype(self.target)
+
+
+class StreamingCompactor:
+    """
+    compact_frame for a CSV that is only ever held one chunk at a time.
+
+    The first pass feeds update() every chunk as read_csv parses it, which
+    settles each column's type the way one read_csv of the whole file
+    followed by compact_frame would. read_csv() then parses the file again
+    with those types and yields compacted chunks, so every chunk agrees on
+    its dtypes; report() has compact_frame's shape, with memory summed over
+    the chunks (category columns count their categories once per chunk).
+    """
+
+    def __init__(self, compact: bool = UPLOAD_COMPACT):
+        self.compact = compact
+        self.columns = None
+        self.num_rows = 0
+        self._settled = False
+        self._seconds = 0.0
+        self._bytes_before = None
+        self._bytes_after = None
+        self._storage_dtypes = None
+
+    def update(self, chunk: pd.DataFrame):
+        start = time.perf_counter()
+        if self.columns is None:
+            self.columns = {col: _ColumnPlan() for col in chunk.columns}
+        for col, plan in self.columns.items():
+            plan.update(chunk[col])
+        self.num_rows += len(chunk)
+        self._seconds += time.perf_counter() - start
+
+    def _settle(self):
+        if not self._settled:
+            for plan in (self.columns or {}).values():
+                plan.settle(self.num_rows, self.compact)
+            self._settled = True
+
+    def read_csv(self, source, chunk_rows: int):
+        """Parse `source` (the file update() saw) again, yielding compacted chunks."""
+        self._settle()
+        dtypes = {col: plan.read_dtype for col, plan in self.columns.items() if plan.read_dtype}
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=dtypes):
+            yield self._apply(chunk) if self.compact else chunk
+
+    def _apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        start = time.perf_counter()
+        before = chunk.memory_usage(deep=True, index=False)
+        compact = pd.DataFrame(
+            {col: plan.convert(chunk[col]) for col, plan in self.columns.items()}, index=chunk.index
+        )
+        after = compact.memory_usage(deep=True, index=False)
+        self._bytes_before = before if self._bytes_before is None else self._bytes_before + before
+        self._bytes_after = after if self._bytes_after is None else self._bytes_after + after
+        self._storage_dtypes = compact.dtypes.astype(str).to_dict()
+        self._seconds += time.perf_counter() - start
+        return compact
+
+    def report(self):
+        """compact_frame's report for the chunks read_csv() yielded; None when not compacting."""
+        if not self.compact or self._bytes_before is None:
+            return None
+        return {
+            "bytes_before": int(self._bytes_before.sum()),
+            "bytes_after": int(self._bytes_after.sum()),
+            "seconds": round(self._seconds, 4),
+            "columns": {
+                col: {
+                    "storage_dtype": self._storage_dtypes[col],
+                    "memory_bytes_before": int(self._bytes_before[col]),
+                    "memory_bytes": int(self._bytes_after[col]),
+                }
+                for col in self.columns
+            },
+        }
+
+
+def datetime_columns(X: pd.DataFrame) -> list:
+    return [col for col in X.columns if pd.api.types.is_datetime64_any_dtype(X[col])]
+
+
+def date_transformer(scale: bool = True):
+    """Datetime columns as (scaled) epoch seconds, with missing values imputed."""
+    # Only training needs sklearn; uploads import this module for compact_frame
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+    steps = [
+        ("epoch", FunctionTransformer(to_epoch_seconds, feature_names_out="one-to-one")),
+        ("imputer", SimpleImputer(strategy="mean")),
+    ]
+    if scale:
+        steps.append(("scaler", StandardScaler()))
+    return Pipeline(steps=steps)
+
+
+def to_epoch_seconds(X):
+    """
+    Datetime features as float seconds since the epoch (NaN for missing).
+    Accepts datetime columns from training frames as well as the raw
+    strings /predict receives, so both encode the same way.
+    """
+    frame = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+    columns = []
+    for col in frame.columns:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(frame[col], errors="coerce", format="mixed", utc=True)
+        columns.append(((parsed - _EPOCH) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64))
+    return np.column_stack(columns) if columns else np.empty((len(frame), 0))
@@ -0,0 +1,443 @@
+import io
+import json
+import os
+import struct
+import zipfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# sklearn is only imported by the compile functions: loading and scoring
+# an export needs NumPy alone, so /predict doesn't pay for it at startup
+from app.api.compaction import to_epoch_seconds
+
+# Export a compiled copy of supported models after training, and serve /predict from it
+MODEL_EXPORT_COMPILED = os.getenv("MODEL_EXPORT_COMPILED", "1") == "1"
+PREDICT_COMPILED = os.getenv("PREDICT_COMPILED", "1") == "1"
+# Requests up to this many rows use the compiled model; past it the
+# Pipeline's compiled tree code is faster
+COMPILED_MAX_ROWS = int(os.getenv("COMPILED_MAX_ROWS", "256"))
+# Rows evaluated together; bounds the rows x trees node-index matrix
+COMPILED_BLOCK_ROWS = int(os.getenv("COMPILED_BLOCK_ROWS", "2048"))
+# Rows of the held-out split the export is checked against
+COMPILED_VERIFY_ROWS = int(os.getenv("COMPILED_VERIFY_ROWS", "2000"))
+
+COMPILED_FORMAT_VERSION = 1
+
+
+class UnsupportedModel(Exception):
+    pass
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _compile_imputer(imputer, numeric: bool) -> dict:
+    if imputer.add_indicator or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values)):
+        raise UnsupportedModel("imputer with indicator or non-NaN missing marker")
+    statistics = imputer.statistics_
+    # Columns without a statistic (all missing at fit time) are dropped by transform
+    valid = ~pd.isna(statistics)
+    keep = None if imputer.keep_empty_features or valid.all() else np.flatnonzero(valid)
+    if keep is not None:
+        statistics = statistics[keep]
+    if numeric:
+        return {"op": "impute", "keep": keep, "fill": np.asarray(statistics, dtype=np.float64)}
+    return {"op": "impute", "keep": keep, "fill": [_plain(v) for v in statistics]}
+
+
+def _compile_transformer(transformer) -> dict:
+    """One ColumnTransformer branch as a list of array operations."""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+    steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+    kind = "numeric"
+    if isinstance(steps[0], FunctionTransformer) and steps[0].func is to_epoch_seconds:
+        kind, steps = "date", steps[1:]
+    elif any(isinstance(step, OneHotEncoder) for step in steps):
+        kind = "categorical"
+
+    ops = []
+    for step in steps:
+        if isinstance(step, SimpleImputer):
+            ops.append(_compile_imputer(step, numeric=kind != "categorical"))
+        elif isinstance(step, StandardScaler) and kind != "categorical":
+            ops.append({
+                "op": "scale",
+                "mean": step.mean_ if step.with_mean else None,
+                "scale": step.scale_ if step.with_std else None,
+            })
+        elif isinstance(step, OneHotEncoder) and step is steps[-1]:
+            if step.drop_idx_ is not None or step._infrequent_enabled or step.handle_unknown == "error":
+                raise UnsupportedModel("one-hot encoder with drop, infrequent categories or unknown=error")
+            ops.append({"op": "onehot", "categories": [[_plain(v) for v in cats] for cats in step.categories_]})
+        else:
+            raise UnsupportedModel(f"{type(step).__name__} in a {kind} branch")
+    return {"kind": kind, "ops": ops}
+
+
+def _float32_floor(thresholds: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 not above each float64 threshold. Trees compare float32
+    features against float64 thresholds; for a float32 x, x <= t holds
+    exactly when x <= floor32(t), so all-float32 comparisons stay exact.
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _compile_forest(model) -> dict:
+    from sklearn.ensemble import (
+        ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor,
+    )
+
+    forests = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+    if not isinstance(model, forests) or model.n_outputs_ != 1:
+        raise UnsupportedModel(f"{type(model).__name__} is not a single-output forest")
+
+    features, thresholds, children, missing_left, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        leaf = tree.children_left < 0
+        # Leaves loop onto themselves (x > +inf never holds), so traversal needs no leaf checks
+        left = np.where(leaf, np.arange(n), tree.children_left) + offset
+        right = np.where(leaf, np.arange(n), tree.children_right) + offset
+        threshold = _float32_floor(tree.threshold)
+        threshold[leaf] = np.inf
+
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(threshold)
+        children.append(np.column_stack([left, right]).astype(np.int32))
+        missing_left.append(np.asarray(getattr(tree, "missing_go_to_left", np.ones(n)), dtype=bool))
+        values.append(tree.value[:, 0, :].astype(np.float64))
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    is_classifier = hasattr(model, "classes_")
+    return {
+        "kind": "classifier" if is_classifier else "regressor",
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max_depth),
+        "classes": model.classes_ if is_classifier else None,
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "children": np.concatenate(children).ravel(),
+        "missing_left": np.concatenate(missing_left),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+
+
+def _pack(value, arrays: dict):
+    # Numeric arrays go to the npz, everything else into the JSON header
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in "biuf":
+            key = f"a{len(arrays)}"
+            arrays[key] = value
+            return {"$array": key}
+        return {"$values": [_plain(v) for v in value], "dtype": str(value.dtype)}
+    if isinstance(value, dict):
+        return {k: _pack(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_pack(v, arrays) for v in value]
+    return _plain(value)
+
+
+def _unpack(value, arrays):
+    if isinstance(value, dict):
+        if "$array" in value:
+            return arrays[value["$array"]]
+        if "$values" in value:
+            return np.array(value["$values"], dtype=value["dtype"])
+        return {k: _unpack(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack(v, arrays) for v in value]
+    return value
+
+
+class CompiledModel:
+    """
+    A fitted preprocessing + forest Pipeline flattened into plain arrays and
+    evaluated with NumPy, returning exactly what the Pipeline (and label
+    decoding) would.
+
+    Preprocessing branches become imputer fill values, scaler means and
+    scales, and one-hot category lists. All trees share concatenated node
+    arrays (feature, float32 threshold, child pairs); every tree of a block
+    of rows is walked at once, one level per step, and leaf values are
+    summed in tree order like the forest does. Stored as an .npz with a
+    JSON header, so loading never unpickles anything.
+    """
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.columns = spec["columns"]
+        self.groups = spec["groups"]
+        self.forest = spec["forest"]
+        self.labels = spec["labels"]
+
+    @classmethod
+    def from_artifacts(cls, pipeline_artifacts: dict) -> "CompiledModel":
+        """Compile the artifacts /train saves; raises UnsupportedModel otherwise."""
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+
+        pipeline = pipeline_artifacts["pipeline"]
+        if not isinstance(pipeline, Pipeline) or [name for name, _ in pipeline.steps] != ["preprocessor", "model"]:
+            raise UnsupportedModel("pipeline isn't preprocessor + model")
+        preprocessor = pipeline.named_steps["preprocessor"]
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise UnsupportedModel("preprocessor isn't a ColumnTransformer")
+
+        groups = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            if transformer == "passthrough" or name == "remainder":
+                raise UnsupportedModel("passthrough columns")
+            groups.append({"columns": list(columns), **_compile_transformer(transformer)})
+
+        label_encoder = pipeline_artifacts.get("label_encoder")
+        return cls({
+            "format_version": COMPILED_FORMAT_VERSION,
+            "target_col": pipeline_artifacts.get("target_col"),
+            "columns": [col for group in groups for col in group["columns"]],
+            "groups": groups,
+            "forest": _compile_forest(pipeline.named_steps["model"]),
+            "labels": label_encoder.classes_ if label_encoder is not None else None,
+        })
+
+    def to_bytes(self) -> bytes:
+        arrays = {}
+        header = json.dumps(_pack(self.spec, arrays)).encode()
+        buffer = io.BytesIO()
+        np.savez(buffer, header=np.frombuffer(header, dtype=np.uint8), **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompiledModel":
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+        spec = _unpack(json.loads(arrays.pop("header").tobytes()), arrays)
+        if spec["format_version"] != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {spec['format_version']}")
+        return cls(spec)
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledModel":
+        """Like from_bytes, with the node arrays memory-mapped read-only from the file."""
+        arrays = _mapped_npz(path)
+        spec = _unpack(json.loads(np.asarray(arrays.pop("header")).tobytes()), arrays)
+        if spec["format_version"] != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {spec['format_version']}")
+        return cls(spec)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self.forest.values() if isinstance(v, np.ndarray))
+
+    # Encoding
+    def _group_input(self, group: dict, columns, numeric: bool):
+        # columns: callable col -> 1-D values (list or array)
+        if not numeric:
+            return np.column_stack([np.asarray(columns(col), dtype=object) for col in group["columns"]])
+        return np.column_stack([np.asarray(columns(col), dtype=np.float64) for col in group["columns"]])
+
+    def _encode(self, n_rows: int, column_values, frame: Optional[pd.DataFrame] = None) -> np.ndarray:
+        blocks = []
+        for group in self.groups:
+            if group["kind"] == "date":
+                raw = frame[group["columns"]] if frame is not None else \
+                    self._group_input(group, column_values, numeric=False)
+                X = to_epoch_seconds(raw)
+            elif group["kind"] == "numeric":
+                X = _numeric_block(frame, group["columns"]) if frame is not None else \
+                    self._group_input(group, column_values, numeric=True)
+            else:
+                X = self._group_input(group, column_values, numeric=False)
+
+            for op in group["ops"]:
+                X = _apply(op, X)
+            blocks.append(X)
+
+        X = np.hstack(blocks) if blocks else np.empty((n_rows, 0))
+        if X.shape[1] != self.forest["n_features"]:
+            raise ValueError(f"Encoded {X.shape[1]} features, the model expects {self.forest['n_features']}")
+        with np.errstate(over="ignore"):
+            X32 = X.astype(np.float32)
+        if np.isinf(X32).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float32').")
+        return X32
+
+    # Trees
+    def _leaves(self, X32: np.ndarray) -> np.ndarray:
+        forest = self.forest
+        n_trees = len(forest["roots"])
+        n_rows, n_features = X32.shape
+        feature, threshold, children = forest["feature"], forest["threshold"], forest["children"]
+
+        # One entry per (tree, row), rows varying fastest so neighbouring
+        # lookups land in the same tree's nodes
+        leaves = np.repeat(forest["roots"], n_rows)
+        base = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        flat = X32.ravel()
+        has_missing = np.isnan(X32).any()
+
+        # Paths still descending; finished ones are written out and dropped
+        # once they are a fifth of the rest (compacting costs a pass too)
+        active, node = np.arange(len(leaves)), leaves.copy()
+        for _ in range(forest["max_depth"]):
+            x = flat[base + feature[node]]
+            go_right = x > threshold[node]
+            if has_missing:
+                missing = np.isnan(x)
+                go_right[missing] = ~forest["missing_left"][node[missing]]
+            child = children[2 * node + go_right]
+
+            moved = child != node
+            if len(moved) - np.count_nonzero(moved) > len(moved) // 5:
+                leaves[active[~moved]] = node[~moved]
+                active, child, base = active[moved], child[moved], base[moved]
+            node = child
+            if not len(active):
+                break
+        leaves[active] = node
+        return leaves.reshape(n_trees, n_rows)
+
+    def _predict_encoded(self, X32: np.ndarray):
+        forest = self.forest
+        n_trees = len(forest["roots"])
+        out = np.zeros((len(X32), forest["value"].shape[1]), dtype=np.float64)
+        for start in range(0, len(X32), COMPILED_BLOCK_ROWS):
+            leaves = self._leaves(X32[start:start + COMPILED_BLOCK_ROWS])
+            block = out[start:start + COMPILED_BLOCK_ROWS]
+            # Tree by tree, like the forest's accumulation, so sums round identically
+            for t in range(n_trees):
+                block += forest["value"][leaves[t]]
+        out /= n_trees
+
+        if forest["kind"] == "regressor":
+            return out[:, 0]
+        raw = forest["classes"].take(np.argmax(out, axis=1), axis=0)
+        return self.labels[raw] if self.labels is not None else raw
+
+    def predict_frame(self, input_df: pd.DataFrame):
+        missing = [col for col in self.columns if col not in input_df.columns]
+        if missing:
+            raise KeyError(f"Missing columns: {missing}")
+        return self._predict_encoded(self._encode(len(input_df), lambda col: input_df[col], frame=input_df))
+
+    def predict_records(self, records: List[Dict[str, Any]]):
+        def column_values(col):
+            return [rec[col] for rec in records]
+
+        return self._predict_encoded(self._encode(len(records), column_values))
+
+
+def _mapped_npz(path: str) -> dict:
+    """
+    The arrays of an .npz, each mapped straight from the archive member that
+    np.savez stored uncompressed, so every process loading the file shares
+    the page cache. Other members are read into memory.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as raw:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type == zipfile.ZIP_STORED:
+                # Member data follows the local file header and its name and extra fields
+                raw.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack("<HH", raw.read(4))
+                raw.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(raw)
+                if version in ((1, 0), (2, 0)):
+                    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+                        else np.lib.format.read_array_header_2_0
+                    shape, fortran_order, dtype = read_header(raw)
+                    if not dtype.hasobject and 0 not in shape:
+                        arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=raw.tell(), shape=shape,
+                                                 order="F" if fortran_order else "C")
+                        continue
+            arrays[name] = np.load(io.BytesIO(archive.read(info)), allow_pickle=False)
+    return arrays
+
+
+def _numeric_block(frame: pd.DataFrame, columns: list) -> np.ndarray:
+    # Same dtype check_array picks: float32 stays float32, anything else is float64
+    block = frame[columns]
+    if all(dtype == np.float32 for dtype in block.dtypes):
+        return block.to_numpy(dtype=np.float32, copy=True)
+    return block.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+
+def _apply(op: dict, X: np.ndarray) -> np.ndarray:
+    if op["op"] == "impute":
+        if op["keep"] is not None:
+            X = X[:, op["keep"]]
+        if X.dtype == object:
+            X = X.copy()
+            for j, fill in enumerate(op["fill"]):
+                X[pd.isna(X[:, j]), j] = fill
+            return X
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+        missing = np.isnan(X)
+        if missing.any():
+            # Assigned in place so the fill is cast to X's dtype, as the imputer does
+            X[missing] = np.broadcast_to(op["fill"], X.shape)[missing]
+        return X
+
+    if op["op"] == "scale":
+        # In X's dtype, as StandardScaler does: float32 columns scale in float32
+        if op["mean"] is not None:
+            X -= op["mean"].astype(X.dtype, copy=False)
+        if op["scale"] is not None:
+            X /= op["scale"].astype(X.dtype, copy=False)
+        return X
+
+    # One-hot with unknown categories encoded as all zeros
+    widths = [len(categories) for categories in op["categories"]]
+    out = np.zeros((len(X), sum(widths)), dtype=np.float64)
+    offset, rows = 0, np.arange(len(X))
+    for j, categories in enumerate(op["categories"]):
+        codes = pd.Index(categories, dtype=object).get_indexer(pd.Index(X[:, j], dtype=object))
+        known = codes >= 0
+        out[rows[known], offset + codes[known]] = 1.0
+        offset += widths[j]
+    return out
+
+
+def compile_verified(pipeline_artifacts: dict, X_check: pd.DataFrame):
+    """
+    Compile the trained artifacts and check the result against the
+    Pipeline's own predictions on held-out rows. Returns (compiled model,
+    verified rows), or (None, reason) when the model isn't supported or
+    the predictions differ.
+    """
+    try:
+        compiled = CompiledModel.from_artifacts(pipeline_artifacts)
+    except UnsupportedModel as e:
+        return None, str(e)
+
+    sample = X_check.iloc[:COMPILED_VERIFY_ROWS]
+    expected = pipeline_artifacts["pipeline"].predict(sample)
+    label_encoder = pipeline_artifacts.get("label_encoder")
+    if label_encoder is not None:
+        expected = label_encoder.inverse_transform(expected)
+    if not np.array_equal(compiled.predict_frame(sample), expected):
+        return None, "compiled predictions don't match the pipeline"
+    return compiled, len(sample)
+
+
+def load_compiled_model(data: bytes) -> dict:
+    """Artifacts dict for inference (see app.api.inference) from stored bytes."""
+    return {"compiled": CompiledModel.from_bytes(data)}
@@ -0,0 +1,280 @@
+import hashlib
+import io
+from typing import Optional
+
+import pandas as pd
+
+from app.api.compaction import compact_frame, UPLOAD_COMPACT
+from app.api.metrics import span
+from app.api.session_store import session_store
+from app.db.artifacts import ArtifactWriter, open_artifact, DATASET_COMPRESSION, GRIDFS_CHUNK_SIZE_BYTES
+from app.db.mongo import fs, dataset_collection
+
+from logger import logger
+
+COLUMNAR_FILENAME = "dataset.parquet"
+AGGREGATES_FILENAME = "profile_aggregates.joblib"
+
+
+def put_parquet(session_id: str, df: pd.DataFrame):
+    """Write the frame to GridFS as Parquet; None when it can't be represented in Arrow."""
+    buffer = io.BytesIO()
+    try:
+        df.to_parquet(buffer, index=False)
+    except Exception:
+        logger.warning(f"⚠️ Could not build columnar copy for session {session_id}; CSV will be used")
+        return None
+
+    buffer.seek(0)
+    # Parquet is already compressed internally, so it is stored as-is
+    return fs.put(
+        buffer, filename=COLUMNAR_FILENAME, session_id=session_id, chunk_size=GRIDFS_CHUNK_SIZE_BYTES
+    )
+
+
+def save_columnar_copy(session_id: str, df: pd.DataFrame):
+    """
+    Store a Parquet copy of the parsed frame next to the raw CSV in GridFS.
+    Returns the GridFS id, or None when the frame can't be represented in Arrow.
+    """
+    parquet_file_id = put_parquet(session_id, df)
+    if parquet_file_id is None:
+        return None
+    dataset_collection.update_one(
+        {"session_id": session_id},
+        {"$set": {"parquet_file_id": parquet_file_id}}
+    )
+    logger.info(f"🧱 Columnar copy saved to GridFS: {parquet_file_id}")
+    return parquet_file_id
+
+
+class ColumnarWriter:
+    """
+    Parquet copy of a dataset written into GridFS chunk by chunk, for
+    uploads that are never held in memory whole. Chunks must share the
+    first chunk's dtypes; category columns may differ in their categories.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # Parquet is already compressed internally, so it is stored as-is
+        self._writer = ArtifactWriter(COLUMNAR_FILENAME, session_id=session_id)
+        self._parquet = None
+        self._schema = None
+
+    def write(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._parquet is None:
+            # Category codes are widened so later chunks with more categories fit
+            self._schema = pa.schema(
+                [
+                    pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+                    if pa.types.is_dictionary(f.type) else f
+                    for f in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            self._parquet = pq.ParquetWriter(self._writer, self._schema)
+        self._parquet.write_table(table.cast(self._schema))
+
+    def close(self):
+        """Finish the file and return its GridFS id (None when nothing was written)."""
+        if self._parquet is None:
+            self._writer.abort()
+            return None
+        self._parquet.close()
+        self._writer.close()
+        return self._writer._id
+
+    def abort(self):
+        self._writer.abort()
+
+
+def save_profile_aggregates(session_id: str, aggregates):
+    """Write a session's ProfileAggregates to GridFS and return the file id."""
+    import joblib
+
+    writer = ArtifactWriter(AGGREGATES_FILENAME, DATASET_COMPRESSION, session_id=session_id)
+    try:
+        joblib.dump(aggregates, writer)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    return writer._id
+
+
+def load_profile_aggregates(meta: dict):
+    """The stored ProfileAggregates of the dataset's current version, or None."""
+    import joblib
+
+    stored = meta.get("profile_aggregates") or {}
+    if stored.get("dataset_version") != meta.get("dataset_version", 0):
+        return None
+    source = open_artifact(stored.get("file_id"))
+    return joblib.load(source) if source is not None else None
+
+
+def record_profile_aggregates(session_id: str, meta: dict, aggregates) -> bool:
+    """
+    Store aggregates built from every row of the dataset version `meta`
+    describes. Dropped (False) when the dataset has changed since or already
+    has aggregates for that version.
+    """
+    version = meta.get("dataset_version", 0)
+    file_id = save_profile_aggregates(session_id, aggregates)
+    result = dataset_collection.update_one(
+        {
+            "session_id": session_id,
+            # Sessions start without a version field
+            "dataset_version": version if version else {"$in": [None, 0]},
+            "profile_aggregates.dataset_version": {"$ne": version},
+        },
+        {"$set": {"profile_aggregates": {"file_id": file_id, "dataset_version": version}}},
+    )
+    if result.matched_count == 0:
+        fs.delete(file_id)
+        return False
+    logger.info(f"🧮 Profile aggregates saved for session {session_id} (version {version})")
+    return True
+
+
+def load_dataframe(session_id: str, meta: Optional[dict] = None) -> Optional[pd.DataFrame]:
+    """
+    Return the canonical parsed frame for a session.
+
+    Order of preference: the in-memory frame from upload, the Parquet copy in
+    GridFS, and finally the raw CSV (parsed once, then stored as Parquet so
+    later readers don't parse text again). Returns None for unknown sessions.
+    """
+    session = session_store.peek(session_id, meta.get("dataset_version", 0) if meta else None)
+    if session is not None:
+        return session["df"]
+
+    return load_persisted_dataframe(session_id, meta)
+
+
+def concat_parts(frames: list) -> pd.DataFrame:
+    """
+    Concatenate a dataset's parts, keeping the first part's representation:
+    categories with different category sets (or str next to category) would
+    otherwise fall back to object.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    for col, dtype in frames[0].dtypes.items():
+        if df[col].dtype == object and dtype != object:
+            df[col] = df[col].astype("category" if isinstance(dtype, pd.CategoricalDtype) else dtype)
+    return df
+
+
+def dataset_parts(meta: dict) -> list:
+    """(csv_file_id, parquet_file_id) of the upload followed by every appended part."""
+    parts = [(meta.get("csv_file_id"), meta.get("parquet_file_id"))]
+    parts.extend((part["csv_file_id"], part.get("parquet_file_id")) for part in meta.get("parts", []))
+    return parts
+
+
+def load_persisted_dataframe(session_id: str, meta: Optional[dict] = None) -> Optional[pd.DataFrame]:
+    """Load the frame from GridFS only, preferring the columnar copy."""
+    if meta is None:
+        meta = dataset_collection.find_one({"session_id": session_id})
+    if not meta:
+        return None
+
+    frames = []
+    for i, (csv_file_id, parquet_file_id) in enumerate(dataset_parts(meta)):
+        df = _load_part(session_id, csv_file_id, parquet_file_id, is_base=i == 0)
+        if df is None:
+            return None
+        frames.append(df)
+    return concat_parts(frames)
+
+
+def _load_part(session_id: str, csv_file_id, parquet_file_id, is_base: bool) -> Optional[pd.DataFrame]:
+    if parquet_file_id is not None:
+        parquet_file = fs.find_one({"_id": parquet_file_id})
+        if parquet_file:
+            with span("dataset.read_parquet"):
+                return pd.read_parquet(parquet_file)
+
+    csv_file = open_artifact(csv_file_id)
+    if not csv_file:
+        return None
+
+    logger.info(f"📄 No columnar copy for session {session_id}; parsing CSV")
+    with span("dataset.parse_csv"):
+        df = pd.read_csv(csv_file)
+    if UPLOAD_COMPACT:
+        # Same representation an in-memory upload gets
+        df, _ = compact_frame(df)
+    if is_base:
+        save_columnar_copy(session_id, df)
+    return df
+
+
+def dataset_fingerprint(session_id: str, meta: dict) -> Optional[str]:
+    """
+    Content hash of the session's uncompressed CSV. Recorded at upload time;
+    older sessions are hashed once from GridFS and the result is saved.
+    Appended parts chain their own hashes onto it.
+    """
+    if meta.get("csv_sha256"):
+        return _chain_fingerprint(meta["csv_sha256"], meta.get("parts", []))
+
+    csv_file = open_artifact(meta.get("csv_file_id"))
+    if not csv_file:
+        return None
+
+    digest = hashlib.sha256()
+    for block in iter(lambda: csv_file.read(1024 * 1024), b""):
+        digest.update(block)
+    fingerprint = digest.hexdigest()
+
+    dataset_collection.update_one({"session_id": session_id}, {"$set": {"csv_sha256": fingerprint}})
+    return _chain_fingerprint(fingerprint, meta.get("parts", []))
+
+
+def _chain_fingerprint(fingerprint: str, parts: list) -> str:
+    for part in parts:
+        fingerprint = hashlib.sha256(f"{fingerprint}:{part['csv_sha256']}".encode()).hexdigest()
+    return fingerprint
+
+
+def iter_dataframe_chunks(session_id: str, meta: dict, chunk_rows: int, first_part: int = 0):
+    """
+    Yield the session's rows in chunks without materializing the whole frame
+    (unless it is already in memory). `first_part` skips the upload (0) and
+    earlier appended parts, e.g. to read only rows appended since some point.
+    """
+    session = session_store.peek(session_id, meta.get("dataset_version", 0))
+    if session is not None:
+        df = session["df"]
+        skip = 0
+        if first_part:
+            skip = len(df) - sum(part["num_rows"] for part in meta.get("parts", [])[first_part - 1:])
+        for start in range(skip, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    for csv_file_id, parquet_file_id in dataset_parts(meta)[first_part:]:
+        yield from _iter_part_chunks(csv_file_id, parquet_file_id, chunk_rows)
+
+
+def _iter_part_chunks(csv_file_id, parquet_file_id, chunk_rows: int):
+    if parquet_file_id is not None:
+        parquet_file = fs.find_one({"_id": parquet_file_id})
+        if parquet_file:
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(parquet_file).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+            return
+
+    csv_file = open_artifact(csv_file_id)
+    if csv_file:
+        yield from pd.read_csv(csv_file, chunksize=chunk_rows)
@@ -0,0 +1,138 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.db.mongo import ping
+
+from logger import logger
+
+router = APIRouter()
+
+# Import the training stack in the background once the app is serving, so the
+# first /train or model load doesn't pay for it
+STARTUP_PRELOAD = os.getenv("STARTUP_PRELOAD", "1") == "1"
+STARTUP_PRELOAD_MODULES = tuple(
+    name for name in os.getenv("STARTUP_PRELOAD_MODULES", "app.api.training,pyarrow.parquet").split(",") if name
+)
+# Pause between attempts while MongoDB is unreachable at startup
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+# Longest /health/ready waits for a MongoDB ping
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+
+def preload_modules(names=STARTUP_PRELOAD_MODULES):
+    for name in names:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        logger.info(f"📚 Preloaded {name} in {time.perf_counter() - start:.3f}s")
+
+
+class StartupTasks:
+    """
+    Runs the startup work that used to block the server from accepting
+    connections (imports, job resumption, cache warm-up) on a background
+    thread. Steps that need MongoDB wait for it and retry until they
+    succeed, so an outage delays readiness instead of failing startup.
+    Only required steps hold back readiness; the rest (preloading) just
+    save later requests some work.
+    """
+
+    def __init__(self, retry_seconds: float):
+        self.retry_seconds = retry_seconds
+        self._steps = []  # (name, fn, needs_db, required)
+        self._state = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def start(self, steps):
+        self._steps = list(steps)
+        self._state = {
+            name: {"status": "pending", "required": required} for name, _, _, required in self._steps
+        }
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="startup-tasks", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            self._state[name] = {**self._state[name], **fields}
+
+    def _run(self):
+        for name, fn, needs_db, _ in self._steps:
+            self._set(name, status="running")
+            start = time.perf_counter()
+            attempts = 0
+            while not self._stop.is_set():
+                attempts += 1
+                try:
+                    if needs_db:
+                        ping()
+                    fn()
+                except Exception as e:
+                    if not needs_db:
+                        logger.exception(f"❌ Startup step {name} failed")
+                        self._set(name, status="failed", error=str(e))
+                        break
+                    if attempts == 1:
+                        logger.warning(f"⚠️ Startup step {name} waiting for MongoDB: {e}")
+                    self._set(name, error=str(e), attempts=attempts)
+                    self._stop.wait(self.retry_seconds)
+                    continue
+                self._set(name, status="done", error=None, attempts=attempts,
+                          seconds=round(time.perf_counter() - start, 4))
+                break
+            if self._stop.is_set():
+                return
+        logger.info(f"✅ Startup tasks finished in {time.monotonic() - self.started_at:.3f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "ready": all(state["status"] == "done" for state in steps.values() if state["required"]),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "steps_pending": sum(state["status"] in ("pending", "running") for state in steps.values()),
+            "steps_failed": sum(state["status"] == "failed" for state in steps.values()),
+            "steps": steps,
+        }
+
+
+startup_tasks = StartupTasks(STARTUP_RETRY_SECONDS)
+
+
+@router.get("/health/live")
+def live():
+    """The process is up and serving; says nothing about its dependencies."""
+    return {"status": "ok", "uptime_seconds": startup_tasks.stats()["uptime_seconds"]}
+
+
+@router.get("/health/ready")
+async def ready():
+    """200 once startup work is done and MongoDB answers a ping, else 503."""
+    checks = {"startup": startup_tasks.stats()}
+    try:
+        await asyncio.wait_for(run_in_threadpool(ping), READINESS_TIMEOUT_SECONDS)
+        checks["mongo"] = {"status": "ok"}
+    except Exception as e:
+        checks["mongo"] = {"status": "unavailable", "error": str(e) or type(e).__name__}
+
+    is_ready = checks["startup"]["ready"] and checks["mongo"]["status"] == "ok"
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else "not_ready", **checks},
+    )
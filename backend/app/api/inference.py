@@ -0,0 +1,123 @@
+import copy
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.api.compiled_model import COMPILED_MAX_ROWS
+
+# Requests with at most this many rows skip DataFrame construction
+FAST_PATH_MAX_ROWS = int(os.getenv("PREDICT_FAST_PATH_MAX_ROWS", "64"))
+
+
+def _decode(pipeline_artifacts: dict, raw_preds):
+    # Decode if classification
+    label_encoder = pipeline_artifacts.get("label_encoder")  # Could be None
+    if label_encoder is not None:
+        raw_preds = label_encoder.inverse_transform(raw_preds)
+    return raw_preds
+
+
+def _compiled_or_pipeline(pipeline_artifacts: dict, n_rows: int):
+    """
+    (compiled model, None) when the compiled export should score n_rows,
+    else (None, artifacts holding the Pipeline).
+    """
+    compiled = pipeline_artifacts.get("compiled")
+    if compiled is None:
+        return None, pipeline_artifacts
+    load_pipeline = pipeline_artifacts.get("load_pipeline")
+    if n_rows <= COMPILED_MAX_ROWS or load_pipeline is None:
+        return compiled, None
+    return None, load_pipeline()
+
+
+def predict_frame(pipeline_artifacts: dict, input_df: pd.DataFrame):
+    """Run the saved Pipeline on a DataFrame and return decoded predictions."""
+    compiled, pipeline_artifacts = _compiled_or_pipeline(pipeline_artifacts, len(input_df))
+    if compiled is not None:
+        return compiled.predict_frame(input_df)
+
+    pipeline = pipeline_artifacts["pipeline"]
+    raw_preds = pipeline.predict(input_df)
+    return _decode(pipeline_artifacts, raw_preds)
+
+
+def _strip_feature_names(estimator):
+    # Sub-transformers were fit on DataFrame slices; feeding them plain arrays
+    # would otherwise emit a feature-name warning on every call.
+    if hasattr(estimator, "steps"):
+        for _, step in estimator.steps:
+            _strip_feature_names(step)
+    elif hasattr(estimator, "feature_names_in_"):
+        del estimator.feature_names_in_
+
+
+def _build_fast_path(pipeline):
+    """
+    Precompute the per-column-group transformers of the fitted ColumnTransformer
+    so small requests can be encoded straight from dicts into NumPy arrays.
+    """
+    preprocessor = pipeline.named_steps["preprocessor"]
+
+    groups = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        transformer = copy.deepcopy(transformer)
+        _strip_feature_names(transformer)
+        groups.append({
+            "columns": list(columns),
+            "numeric": name == "num",
+            "transformer": transformer,
+        })
+
+    return {
+        "groups": groups,
+        "sparse_output": getattr(preprocessor, "sparse_output_", False),
+        "model": pipeline.named_steps["model"],
+    }
+
+
+def _encode_records(fast_path: dict, records: List[Dict[str, Any]]):
+    blocks = []
+    for group in fast_path["groups"]:
+        columns = group["columns"]
+        values = np.array(
+            [[np.nan if rec[c] is None else rec[c] for c in columns] for rec in records],
+            dtype=np.float64 if group["numeric"] else object,
+        )
+        blocks.append(group["transformer"].transform(values))
+
+    # Mirror ColumnTransformer's own stacking so the model sees the same layout
+    # (SciPy is loaded by the unpickled Pipeline already; no cost at import)
+    from scipy import sparse
+
+    if fast_path["sparse_output"]:
+        return sparse.hstack([sparse.csr_matrix(b) for b in blocks]).tocsr()
+    return np.hstack([b.toarray() if sparse.issparse(b) else b for b in blocks])
+
+
+def predict_records(pipeline_artifacts: dict, records: List[Dict[str, Any]],
+                    fast_path_max_rows: int = FAST_PATH_MAX_ROWS):
+    """
+    Predict from request dicts. Small requests go through a column-ordered
+    NumPy fast path; larger ones use the Pipeline on a DataFrame. Compiled
+    models score requests of up to COMPILED_MAX_ROWS records directly.
+    """
+    compiled, pipeline_artifacts = _compiled_or_pipeline(pipeline_artifacts, len(records))
+    if compiled is not None:
+        return compiled.predict_records(records)
+
+    if len(records) > fast_path_max_rows:
+        return predict_frame(pipeline_artifacts, pd.DataFrame(records))
+
+    fast_path = pipeline_artifacts.get("_fast_path")
+    if fast_path is None:
+        fast_path = _build_fast_path(pipeline_artifacts["pipeline"])
+        # Cached artifacts are shared, so the plan is built once per model
+        pipeline_artifacts["_fast_path"] = fast_path
+
+    raw_preds = fast_path["model"].predict(_encode_records(fast_path, records))
+    return _decode(pipeline_artifacts, raw_preds)
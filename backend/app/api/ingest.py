@@ -0,0 +1,187 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+# Streaming ingestion settings
+UPLOAD_STREAMING_THRESHOLD_BYTES = int(os.getenv("UPLOAD_STREAMING_THRESHOLD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_PARSE_CHUNK_ROWS = int(os.getenv("UPLOAD_PARSE_CHUNK_ROWS", "100000"))
+
+# Distinct values are counted exactly up to this many, then with HyperLogLog
+EXACT_DISTINCT_LIMIT = 10_000
+HLL_PRECISION = 14
+SAMPLE_SIZE = 3
+
+
+def infer_column_type(series: pd.Series):
+    if pd.api.types.is_numeric_dtype(series):
+        return "numerical"
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    elif pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    else:
+        return "categorical"
+
+
+def _hash_values(values: pd.Series) -> np.ndarray:
+    # Hash numbers as float64 so 1 (int chunk) and 1.0 (float chunk) agree
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype("float64")
+    else:
+        values = values.astype(str)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class DistinctCounter:
+    """Exact distinct count for small columns, HyperLogLog beyond EXACT_DISTINCT_LIMIT."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self._exact = set()
+        self._registers = None
+
+    def add(self, hashes: np.ndarray):
+        if self._registers is None:
+            self._exact.update(hashes.tolist())
+            if len(self._exact) <= EXACT_DISTINCT_LIMIT:
+                return
+            hashes = np.fromiter(self._exact, dtype=np.uint64, count=len(self._exact))
+            self._exact = None
+            self._registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        self._add_hll(hashes)
+
+    def _add_hll(self, hashes: np.ndarray):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Position of the leftmost 1-bit in the remaining 64-p bits
+        bit_length = np.frexp(remainder.astype(np.float64))[1]
+        rank = ((64 - p) - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self._registers, index, rank)
+
+    @property
+    def approximate(self) -> bool:
+        return self._registers is not None
+
+    def count(self) -> int:
+        if self._registers is None:
+            return len(self._exact)
+
+        m = float(len(self._registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self._registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnAccumulator:
+    def __init__(self, column: str):
+        self.column = column
+        self.count = 0
+        self.nulls = 0
+        self.kinds = set()
+        self.distinct = DistinctCounter()
+        self.samples = []
+
+    def update(self, series: pd.Series):
+        self.count += len(series)
+        non_null = series.dropna()
+        self.nulls += len(series) - len(non_null)
+        if non_null.empty:
+            return
+
+        # Chunks that are entirely null say nothing about the column type
+        self.kinds.add(infer_column_type(series))
+        self.distinct.add(_hash_values(non_null))
+
+        if len(self.samples) < SAMPLE_SIZE:
+            for val in non_null.unique()[:SAMPLE_SIZE]:
+                if str(val) not in self.samples:
+                    self.samples.append(str(val))
+                if len(self.samples) == SAMPLE_SIZE:
+                    break
+
+    def to_schema(self) -> dict:
+        # Mixed chunk types would have parsed as text in a single read_csv
+        if len(self.kinds) == 1:
+            col_type = next(iter(self.kinds))
+        elif not self.kinds:
+            col_type = "numerical"
+        else:
+            col_type = "categorical"
+
+        unique_vals = self.distinct.count()
+        null_pct = (self.nulls / self.count * 100) if self.count else 0.0
+        return {
+            "column": self.column,
+            "dtype": col_type,
+            "unique_values": unique_vals,
+            "null_percentage": round(null_pct, 2),
+            "high_cardinality": unique_vals > 50,
+            "constant": unique_vals == 1,
+            "sample_values": self.samples,
+            "approximate_unique": self.distinct.approximate,
+        }
+
+
+class SchemaAccumulator:
+    """Builds parsed_schema incrementally from CSV chunks."""
+
+    def __init__(self):
+        self.columns = None
+        self.num_rows = 0
+
+    def update(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = {col: ColumnAccumulator(col) for col in chunk.columns}
+        for col, acc in self.columns.items():
+            acc.update(chunk[col])
+        self.num_rows += len(chunk)
+
+    def parsed_schema(self) -> list:
+        return [acc.to_schema() for acc in (self.columns or {}).values()]
+
+
+class TeeReader:
+    """
+    File-like wrapper that forwards every block pandas reads to a writable sink
+    (a GridFS GridIn) and hashes it, so the upload is parsed, stored and
+    fingerprinted in one pass.
+    """
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        if data:
+            self.sink.write(data)
+            self.sha256.update(data)
+            self.bytes_read += len(data)
+        return data
+
+    def drain(self, block_size: int = 1024 * 1024):
+        while self.read(block_size):
+            pass
+
+
+def ingest_csv_stream(source, sink, chunk_rows: int = UPLOAD_PARSE_CHUNK_ROWS, accumulator=None):
+    """
+    Parse `source` chunk by chunk while copying its bytes into `sink`,
+    feeding every chunk to `accumulator` (a SchemaAccumulator by default).
+    Peak memory is bounded by chunk_rows, not by the file size.
+    """
+    tee = TeeReader(source, sink)
+    accumulator = accumulator if accumulator is not None else SchemaAccumulator()
+    for chunk in pd.read_csv(tee, chunksize=chunk_rows):
+        accumulator.update(chunk)
+    # Anything the parser didn't need to read (e.g. trailing blank lines) still belongs in GridFS
+    tee.drain()
+    return accumulator, tee
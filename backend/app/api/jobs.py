@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi import HTTPException
+from typing import Optional
+
+from app.db.mongo import dataset_collection
+from app.db.mongo_async import async_dataset_collection
+
+from logger import logger
+
+# Number of processes available for background training
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "2"))
+# How often a server marks the jobs it runs as alive, and how long a job
+# may go unmarked before another server takes it over
+TRAIN_JOB_HEARTBEAT_SECONDS = float(os.getenv("TRAIN_JOB_HEARTBEAT_SECONDS", "15"))
+TRAIN_JOB_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("TRAIN_JOB_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _set_job(job_id: str, fields: dict):
+    dataset_collection.update_one(
+        {"train_job.job_id": job_id},
+        {"$set": {f"train_job.{k}": v for k, v in fields.items()}}
+    )
+
+
+def _run_train_job(job_id: str, session_id: str):
+    """
+    Entry point executed inside a worker process. Job state is written straight
+    to dataset_collection so the API process (or a restarted one) can read it.
+    """
+    from app.api.training import run_training
+
+    job = dataset_collection.find_one({"train_job.job_id": job_id}, {"train_job": 1})
+    if not job or job["train_job"].get("cancel_requested"):
+        _set_job(job_id, {"status": "cancelled", "finished_at": datetime.utcnow()})
+        return
+
+    _set_job(job_id, {"status": "running", "started_at": datetime.utcnow()})
+
+    def progress(stage: str, fraction: float):
+        current = dataset_collection.find_one({"train_job.job_id": job_id}, {"train_job.cancel_requested": 1})
+        if current and current["train_job"].get("cancel_requested"):
+            raise JobCancelled()
+        _set_job(job_id, {"stage": stage, "progress": round(fraction, 3)})
+
+    try:
+        result = run_training(session_id, progress=progress, options=job["train_job"].get("options"))
+        _set_job(job_id, {"status": "completed", "stage": "done", "progress": 1.0, "result": result,
+                          "finished_at": datetime.utcnow()})
+        return result
+    except JobCancelled:
+        _set_job(job_id, {"status": "cancelled", "finished_at": datetime.utcnow()})
+    except Exception as e:
+        error = getattr(e, "detail", None) or str(e)
+        _set_job(job_id, {"status": "failed", "error": error, "finished_at": datetime.utcnow()})
+
+
+class TrainJobManager:
+    """
+    Runs training in a bounded process pool. The job document lives under the
+    session's `train_job` field in dataset_collection; one job per session.
+
+    Each job records the server (`owner`) running it, which refreshes its
+    `heartbeat_at` while the job is queued or running. Jobs whose heartbeat
+    has expired belong to a server that is gone and are taken over by the
+    next server that notices; live ones are never touched.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._stop = threading.Event()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: each worker opens its own MongoClient instead of inheriting one
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _schedule(self, job_id: str, session_id: str):
+        future = self._get_executor().submit(_run_train_job, job_id, session_id)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, session_id, f))
+
+    def _on_done(self, job_id: str, session_id: str, future):
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # The worker process itself died (e.g. out of memory)
+            if isinstance(future.exception(), BrokenProcessPool):
+                with self._lock:
+                    self._executor = None
+            logger.error(f"❌ Training job {job_id} crashed: {future.exception()}")
+            _set_job(job_id, {"status": "failed", "error": str(future.exception()), "finished_at": datetime.utcnow()})
+            return
+
+        from app.api.model_cache import model_cache
+        model_cache.invalidate(session_id)
+        logger.info(f"🏁 Training job {job_id} finished for session {session_id}")
+
+        result = future.result()
+        if result and (result.get("retrain") or {}).get("strategy") != "reused":
+            from app.api.analysis import analysis_runner
+            analysis_runner.submit(session_id, ObjectId(result["model_file_id"]))
+
+    def submit(self, session_id: str, options: Optional[dict] = None) -> dict:
+        now = datetime.utcnow()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "options": options or {},
+            "status": "queued",
+            "stage": None,
+            "progress": 0.0,
+            "cancel_requested": False,
+            "attempt": 0,
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "submitted_at": now,
+        }
+        # Only replaces a finished job; the session's active one keeps running
+        result = dataset_collection.update_one(
+            {"session_id": session_id, "train_job.status": {"$nin": list(ACTIVE_STATUSES)}},
+            {"$set": {"train_job": job}},
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=409, detail="A training job is already queued or running for this session")
+        self._schedule(job["job_id"], session_id)
+        logger.info(f"🧵 Training job {job['job_id']} queued for session {session_id}")
+        return job
+
+    def get(self, job_id: str):
+        doc = dataset_collection.find_one({"train_job.job_id": job_id}, {"train_job": 1})
+        return doc["train_job"] if doc else None
+
+    async def get_async(self, job_id: str):
+        doc = await async_dataset_collection.find_one({"train_job.job_id": job_id}, {"train_job": 1})
+        return doc["train_job"] if doc else None
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if not job or job["status"] not in ACTIVE_STATUSES:
+            return job
+
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            _set_job(job_id, {"status": "cancelled", "finished_at": datetime.utcnow()})
+        else:
+            # Running: the worker checks this flag between stages
+            _set_job(job_id, {"cancel_requested": True})
+        return self.get(job_id)
+
+    def _expired(self) -> dict:
+        cutoff = datetime.utcnow() - timedelta(seconds=TRAIN_JOB_HEARTBEAT_TIMEOUT_SECONDS)
+        # Jobs from before heartbeats were recorded count as expired
+        return {"$or": [
+            {"train_job.heartbeat_at": {"$exists": False}},
+            {"train_job.heartbeat_at": {"$lt": cutoff}},
+        ]}
+
+    def heartbeat(self):
+        job_ids = list(self._futures)
+        if job_ids:
+            dataset_collection.update_many(
+                {"train_job.job_id": {"$in": job_ids}, "train_job.owner": self.owner},
+                {"$set": {"train_job.heartbeat_at": datetime.utcnow()}},
+            )
+
+    def resume(self):
+        """Re-queue queued or running jobs whose server stopped heartbeating."""
+        resumed = 0
+        query = {"train_job.status": {"$in": list(ACTIVE_STATUSES)}, **self._expired()}
+        for doc in dataset_collection.find(query, {"train_job": 1}):
+            job = doc["train_job"]
+            if job["job_id"] in self._futures:
+                continue
+            # Conditional on the attempt counter (and the heartbeat still being
+            # expired) so concurrent servers claim a job only once
+            claimed = dataset_collection.update_one(
+                {"train_job.job_id": job["job_id"], "train_job.attempt": job.get("attempt", 0), **self._expired()},
+                {"$set": {"train_job.status": "queued", "train_job.stage": None, "train_job.progress": 0.0,
+                          "train_job.owner": self.owner, "train_job.heartbeat_at": datetime.utcnow()},
+                 "$inc": {"train_job.attempt": 1}}
+            )
+            if not claimed.modified_count:
+                continue
+            self._schedule(job["job_id"], job["session_id"])
+            resumed += 1
+        if resumed:
+            logger.info(f"🔁 Resumed {resumed} training job(s)")
+        return resumed
+
+    def start(self):
+        """
+        Take over abandoned jobs now, then keep heartbeating this server's
+        jobs and taking over ones whose servers die later (including this
+        server's previous process, whose heartbeats expire after a restart).
+        """
+        self.resume()
+        if self._monitor is None:
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._run_monitor, name="train-job-monitor", daemon=True)
+            self._monitor.start()
+
+    def _run_monitor(self):
+        while not self._stop.wait(TRAIN_JOB_HEARTBEAT_SECONDS):
+            try:
+                self.heartbeat()
+                self.resume()
+            except Exception:
+                logger.exception("⚠️ Training job heartbeat failed")
+
+    def shutdown(self):
+        self._stop.set()
+        self._monitor = None
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+job_manager = TrainJobManager(TRAIN_WORKERS)
@@ -0,0 +1,230 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from app.db.artifacts import artifact_size, compression_of, decompressing_reader
+from app.db.mongo import fs
+
+from logger import logger
+
+# Host-local model tier (overridable through the environment)
+MODEL_LOCAL_TIER = os.getenv("MODEL_LOCAL_TIER", "1") == "1"
+MODEL_LOCAL_DIR = os.getenv("MODEL_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "data-analyzer-models"))
+MODEL_LOCAL_MAX_BYTES = int(os.getenv("MODEL_LOCAL_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+COPY_BLOCK_BYTES = 1024 * 1024
+
+
+class LocalModelStore:
+    """
+    Uncompressed copies of GridFS model artifacts on local disk, shared by
+    every worker process on the host.
+
+    An artifact is fetched and decompressed from GridFS once per host, then
+    memory-mapped. Compiled exports (see app.api.compiled_model) are mapped
+    as-is, so every worker serving a model shares one copy of its node
+    arrays in the page cache. Pipelines are loaded with joblib's
+    mmap_mode="r", which only saves the fetch: sklearn's Tree copies its
+    node arrays on unpickling, so each worker still holds its own forest.
+
+    Each file has a JSON sidecar with its SHA-256 and size, checked against
+    the GridFS metadata before use; a flock per artifact keeps concurrent
+    workers from materializing the same file twice. The directory is kept
+    under max_bytes by evicting the least recently used files.
+    """
+
+    SUFFIXES = (".joblib", ".npz")
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.materializations = 0
+        self.checksum_failures = 0
+        self.evictions = 0
+
+    def _path(self, file_id, suffix: str) -> str:
+        return os.path.join(self.root, f"{file_id}{suffix}")
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _lock_current(handle, path: str) -> bool:
+        # Eviction unlinks the lock file while holding it; a lock taken on the
+        # unlinked file protects nothing, so callers reopen and try again
+        try:
+            return os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def _file_lock(self, file_id):
+        path = self._path(file_id, ".lock")
+        while True:
+            with open(path, "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    if self._lock_current(handle, path):
+                        yield
+                        return
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _is_valid(self, file_id, suffix: str, expected_sha256) -> bool:
+        path = self._path(file_id, suffix)
+        try:
+            with open(self._path(file_id, ".json")) as handle:
+                sidecar = json.load(handle)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            return False
+
+        if size != sidecar.get("length") or (expected_sha256 and sidecar.get("sha256") != expected_sha256):
+            self._count("checksum_failures")
+            logger.warning(f"⚠️ Local copy of model {file_id} doesn't match GridFS, refetching")
+            return False
+        return True
+
+    def _materialize(self, grid_out, suffix: str, expected_sha256):
+        file_id = grid_out._id
+        source = decompressing_reader(grid_out, compression_of(grid_out))
+        digest, length = hashlib.sha256(), 0
+
+        # Written under a temporary name and renamed, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: source.read(COPY_BLOCK_BYTES), b""):
+                    out.write(block)
+                    digest.update(block)
+                    length += len(block)
+            sha256 = digest.hexdigest()
+            if expected_sha256 and sha256 != expected_sha256:
+                self._count("checksum_failures")
+                raise IOError(f"Checksum mismatch while copying model {file_id} from GridFS")
+
+            os.replace(tmp_path, self._path(file_id, suffix))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with open(self._path(file_id, ".json"), "w") as handle:
+            json.dump({"sha256": sha256, "length": length}, handle)
+        self._count("materializations")
+        logger.info(f"💽 Model {file_id} materialized locally ({length} bytes)")
+
+    def _try_remove(self, base: str) -> bool:
+        # Skip files another worker is materializing or loading right now
+        lock_path = base + ".lock"
+        with open(lock_path, "a") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                if self._lock_current(handle, lock_path):
+                    self._remove_files(base)
+                    # Last, while still held: waiters notice and reopen
+                    os.remove(lock_path)
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        return True
+
+    def _remove_files(self, base: str):
+        for suffix in (*self.SUFFIXES, ".json"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep: str):
+        entries, bases = [], set()
+        for name in os.listdir(self.root):
+            base, suffix = os.path.splitext(name)
+            if suffix == ".lock":
+                bases.add(base)
+                continue
+            if suffix not in self.SUFFIXES:
+                continue
+            bases.discard(base)
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        # Lock files left by failed fetches
+        orphans = bases - {os.path.splitext(os.path.basename(path))[0] for _, _, path in entries}
+        for base in orphans:
+            self._try_remove(os.path.join(self.root, base))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first; already-mapped files stay valid for their readers after unlink
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep or not self._try_remove(os.path.splitext(path)[0]):
+                continue
+            total -= size
+            self.evictions += 1
+
+    def _load(self, file_id, suffix: str, open_local):
+        grid_out = fs.find_one({"_id": file_id})
+        if grid_out is None:
+            return None, 0
+        expected_sha256 = (grid_out.metadata or {}).get("sha256")
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(file_id, suffix)
+        with self._file_lock(file_id):
+            if self._is_valid(file_id, suffix, expected_sha256):
+                self._count("hits")
+            else:
+                self._materialize(grid_out, suffix, expected_sha256)
+            # mtime doubles as the last-use time for eviction
+            os.utime(path)
+            artifacts = open_local(path)
+
+        with self._lock:
+            self._evict(keep=path)
+        return artifacts, artifact_size(grid_out)
+
+    def load(self, model_file_id):
+        """
+        Return (artifacts, size) with the model's arrays memory-mapped from
+        the local copy, fetching it from GridFS first if needed. Returns
+        (None, 0) when the GridFS file doesn't exist.
+        """
+        import joblib
+
+        return self._load(model_file_id, ".joblib", lambda path: joblib.load(path, mmap_mode="r"))
+
+    def load_compiled(self, compiled_file_id):
+        """Like load, for a compiled export: (artifacts holding the mapped CompiledModel, size)."""
+        from app.api.compiled_model import CompiledModel
+
+        return self._load(compiled_file_id, ".npz", lambda path: {"compiled": CompiledModel.from_file(path)})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": MODEL_LOCAL_TIER,
+                "root": self.root,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "materializations": self.materializations,
+                "checksum_failures": self.checksum_failures,
+                "evictions": self.evictions,
+            }
+
+
+local_model_store = LocalModelStore(MODEL_LOCAL_DIR, MODEL_LOCAL_MAX_BYTES)
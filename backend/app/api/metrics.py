@@ -0,0 +1,209 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from logger import logger
+
+router = APIRouter()
+
+# Bucket layouts (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = tuple(4 ** i * 256 for i in range(12))  # 256 B .. 1 GiB
+ROW_BUCKETS = tuple(10 ** i for i in range(9))  # 1 .. 100M
+
+
+def _format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics. Histograms are observed directly; component
+    stats (cache hit rates, queue depths, ...) are pulled from their
+    stats() functions at scrape time and exported as gauges. With several
+    uvicorn workers, each worker serves its own numbers.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._stats_sources = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._histograms[name]
+
+    def register_stats(self, prefix: str, stats_fn):
+        """Export every numeric field of stats_fn() as a `<prefix>_<field>` gauge."""
+        with self._lock:
+            self._stats_sources[prefix] = stats_fn
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = list(self._histograms.values())
+            sources = dict(self._stats_sources)
+        for histogram in histograms:
+            lines.extend(histogram.render())
+
+        for prefix, stats_fn in sorted(sources.items()):
+            try:
+                stats = stats_fn()
+            except Exception:
+                logger.exception(f"⚠️ Failed to collect {prefix} stats for /metrics")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last body byte is sent",
+    ("method", "route", "status"),
+)
+request_size = registry.histogram(
+    "http_request_size_bytes", "HTTP request body size", ("method", "route"), SIZE_BUCKETS,
+)
+response_size = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS,
+)
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Duration of named processing stages", ("stage",),
+)
+payload_bytes = registry.histogram(
+    "payload_bytes", "Bytes handled by a processing stage", ("stage",), SIZE_BUCKETS,
+)
+rows_processed = registry.histogram(
+    "rows_processed", "Rows handled by a processing stage", ("stage",), ROW_BUCKETS,
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block into stage_duration_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_rows(stage: str, rows: int):
+    rows_processed.observe(rows, stage=stage)
+
+
+def record_payload(stage: str, size: int):
+    payload_bytes.observe(size, stage=stage)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, request and response sizes per route
+    template (so /train/jobs/{job_id} is one series, not one per id).
+    Streaming responses are timed until their final chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = {"status": 500, "request_bytes": 0, "response_bytes": 0}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["request_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, recording_send)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            request_duration.observe(
+                time.perf_counter() - start, method=method, route=route_path, status=str(state["status"])
+            )
+            request_size.observe(state["request_bytes"], method=method, route=route_path)
+            response_size.observe(state["response_bytes"], method=method, route=route_path)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,307 @@
+import asyncio
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.compiled_model import load_compiled_model
+from app.api.metrics import span
+from app.api.local_models import local_model_store, MODEL_LOCAL_TIER
+from app.db.artifacts import artifact_size, compression_of, decompressing_reader
+from app.db.mongo import fs, dataset_collection
+from app.db.mongo_async import read_gridfs_file
+
+from logger import logger
+
+# Limits (overridable through the environment)
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "16"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MODEL_CACHE_WARMUP = int(os.getenv("MODEL_CACHE_WARMUP", "0"))
+
+
+class ModelCache:
+    """
+    Bounded LRU cache of deserialized model artifacts.
+
+    Entries are keyed by (session_id, model_file_id) so a newly trained model
+    never collides with a stale one. Size is accounted using the uncompressed
+    artifact length recorded in GridFS.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (artifacts, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, session_id: str, model_file_id, loader):
+        """
+        Return cached artifacts or call loader() -> (artifacts, size) once per key.
+        """
+        key = (session_id, str(model_file_id))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread deserializes a given model; the others wait for it
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                self.misses += 1
+
+            try:
+                artifacts, size = loader()
+                with self._lock:
+                    self._store(key, artifacts, size)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+        return artifacts
+
+    def lookup(self, session_id: str, model_file_id):
+        """Return cached artifacts or None, counting the hit or miss."""
+        key = (session_id, str(model_file_id))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def store(self, session_id: str, model_file_id, artifacts, size: int):
+        with self._lock:
+            self._store((session_id, str(model_file_id)), artifacts, size)
+
+    def _store(self, key, artifacts, size: int):
+        # A new model version replaces any older one for the same session
+        self._drop_session(key[0], keep=key)
+        if key in self._entries:
+            # Re-stored with a new size (e.g. a compiled model that loaded its Pipeline)
+            self._total_bytes -= self._entries.pop(key)[1]
+
+        if size > self.max_bytes:
+            logger.warning(f"⚠️ Model {key[1]} ({size} bytes) exceeds cache size, not cached")
+            return
+
+        self._entries[key] = (artifacts, size)
+        self._total_bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            self.evictions += 1
+
+    def _drop_session(self, session_id: str, keep=None):
+        stale = [k for k in self._entries if k[0] == session_id and k != keep]
+        for k in stale:
+            _, size = self._entries.pop(k)
+            self._total_bytes -= size
+            self.invalidations += 1
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._drop_session(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+model_cache = ModelCache(MODEL_CACHE_MAX_ENTRIES, MODEL_CACHE_MAX_BYTES)
+
+
+def _deserialize(source, grid_out):
+    # Decompresses and unpickles in one streaming pass
+    import joblib
+
+    start = time.perf_counter()
+    with span("model.deserialize"):
+        artifacts = joblib.load(decompressing_reader(source, compression_of(grid_out)))
+    logger.info(
+        f"📦 Model {grid_out._id} loaded in {time.perf_counter() - start:.3f}s "
+        f"({grid_out.length} bytes stored, {compression_of(grid_out)})"
+    )
+    return artifacts
+
+
+def load_model_artifacts(model_file_id):
+    if MODEL_LOCAL_TIER:
+        return local_model_store.load(model_file_id)
+
+    model_file = fs.find_one({"_id": model_file_id})
+    if not model_file:
+        return None, 0
+
+    return _deserialize(model_file, model_file), artifact_size(model_file)
+
+
+def get_model_artifacts(session_id: str, model_file_id):
+    """
+    Cached lookup of the joblib artifacts for a session's current model.
+    Returns None when the GridFS file is missing.
+    """
+    def loader():
+        artifacts, size = load_model_artifacts(model_file_id)
+        if artifacts is None:
+            raise FileNotFoundError(str(model_file_id))
+        return artifacts, size
+
+    try:
+        return model_cache.get_or_load(session_id, model_file_id, loader)
+    except FileNotFoundError:
+        return None
+
+
+# In-flight async loads, so concurrent requests for one model share a download
+_async_loads = {}
+
+
+async def _load_model_async(session_id: str, model_file_id):
+    if MODEL_LOCAL_TIER:
+        # Local disk I/O and mmap setup; the GridFS fetch only happens once per host
+        artifacts, size = await run_in_threadpool(local_model_store.load, model_file_id)
+        if artifacts is not None:
+            model_cache.store(session_id, model_file_id, artifacts, size)
+        return artifacts
+
+    blob, grid_out = await read_gridfs_file(model_file_id)
+    if blob is None:
+        return None
+
+    # Deserialization is CPU-bound; keep it off the event loop
+    artifacts = await run_in_threadpool(_deserialize, io.BytesIO(blob), grid_out)
+    model_cache.store(session_id, model_file_id, artifacts, artifact_size(grid_out))
+    return artifacts
+
+
+def _pipeline_loader(session_id: str, compiled_file_id, model_file_id, artifacts: dict):
+    """
+    Large requests are faster through the Pipeline than the NumPy evaluator;
+    the first one loads it into the compiled model's cache entry.
+    """
+    lock = threading.Lock()
+
+    def load():
+        with lock:
+            if "_pipeline" not in artifacts:
+                pipeline_artifacts, size = load_model_artifacts(model_file_id)
+                if pipeline_artifacts is None:
+                    raise FileNotFoundError(f"Model file {model_file_id} not found")
+                artifacts["_pipeline"] = pipeline_artifacts
+                model_cache.store(session_id, compiled_file_id, artifacts, artifacts["compiled"].nbytes + size)
+        return artifacts["_pipeline"]
+
+    return load
+
+
+def _deserialize_compiled(session_id: str, blob: bytes, grid_out, model_file_id):
+    start = time.perf_counter()
+    with span("model.load_compiled"):
+        artifacts = load_compiled_model(decompressing_reader(io.BytesIO(blob), compression_of(grid_out)).read())
+    artifacts["load_pipeline"] = _pipeline_loader(session_id, grid_out._id, model_file_id, artifacts)
+    logger.info(f"📦 Compiled model {grid_out._id} loaded in {time.perf_counter() - start:.3f}s")
+    return artifacts
+
+
+async def _load_compiled_async(session_id: str, compiled_file_id, model_file_id):
+    if MODEL_LOCAL_TIER:
+        # Node arrays mapped from the host's local copy, shared by every worker
+        artifacts, _ = await run_in_threadpool(local_model_store.load_compiled, compiled_file_id)
+        if artifacts is None:
+            return None
+        artifacts["load_pipeline"] = _pipeline_loader(session_id, compiled_file_id, model_file_id, artifacts)
+        model_cache.store(session_id, compiled_file_id, artifacts, artifacts["compiled"].nbytes)
+        return artifacts
+
+    blob, grid_out = await read_gridfs_file(compiled_file_id)
+    if blob is None:
+        return None
+
+    artifacts = await run_in_threadpool(_deserialize_compiled, session_id, blob, grid_out, model_file_id)
+    model_cache.store(session_id, compiled_file_id, artifacts, artifacts["compiled"].nbytes)
+    return artifacts
+
+
+async def get_model_artifacts_async(session_id: str, model_file_id, compiled_file_id=None):
+    """
+    Event-loop friendly get_model_artifacts using the async GridFS bucket.
+    With a compiled_file_id the artifacts hold the compiled export (see
+    app.api.compiled_model) and the Pipeline is only loaded on demand.
+    """
+    file_id = compiled_file_id or model_file_id
+    artifacts = model_cache.lookup(session_id, file_id)
+    if artifacts is not None:
+        return artifacts
+
+    key = (session_id, str(file_id))
+    pending = _async_loads.get(key)
+    if pending is None:
+        if compiled_file_id is not None:
+            pending = asyncio.ensure_future(_load_compiled_async(session_id, compiled_file_id, model_file_id))
+        else:
+            pending = asyncio.ensure_future(_load_model_async(session_id, model_file_id))
+        _async_loads[key] = pending
+        pending.add_done_callback(lambda _: _async_loads.pop(key, None))
+    return await asyncio.shield(pending)
+
+
+def warm_up_model_cache(limit: int = MODEL_CACHE_WARMUP):
+    """Preload the most recently trained models into the cache."""
+    if limit <= 0:
+        return 0
+
+    loaded = 0
+    cursor = (
+        dataset_collection.find(
+            {"model_file_id": {"$exists": True}},
+            {"session_id": 1, "model_file_id": 1},
+        )
+        .sort("trained_at", -1)
+        .limit(limit)
+    )
+    for meta in cursor:
+        try:
+            if get_model_artifacts(meta["session_id"], meta["model_file_id"]) is not None:
+                loaded += 1
+        except Exception:
+            logger.exception(f"❌ Failed to warm up model for session {meta.get('session_id')}")
+
+    logger.info(f"🔥 Model cache warmed with {loaded} model(s)")
+    return loaded
@@ -0,0 +1,261 @@
+import os
+import time
+from math import ceil, floor, log
+
+import numpy as np
+import pandas as pd
+from joblib import effective_n_jobs
+from scipy.stats import loguniform, randint
+from sklearn.base import clone
+from sklearn.ensemble import (
+    RandomForestClassifier, RandomForestRegressor,
+    HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+)
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.model_selection import HalvingRandomSearchCV, KFold, StratifiedKFold
+from sklearn.pipeline import Pipeline
+
+from logger import logger
+
+# Search limits (overridable through the environment)
+TRAIN_SEARCH_TIME_BUDGET_SECONDS = float(os.getenv("TRAIN_SEARCH_TIME_BUDGET_SECONDS", "300"))
+TRAIN_SEARCH_CV_FOLDS = int(os.getenv("TRAIN_SEARCH_CV_FOLDS", "5"))
+TRAIN_SEARCH_CANDIDATES = int(os.getenv("TRAIN_SEARCH_CANDIDATES", "12"))
+TRAIN_SEARCH_N_JOBS = int(os.getenv("TRAIN_SEARCH_N_JOBS", "-1"))
+# Rows of the timed fit that sizes each family's search
+TRAIN_SEARCH_PROBE_ROWS = int(os.getenv("TRAIN_SEARCH_PROBE_ROWS", "1000"))
+
+HALVING_FACTOR = 3
+
+
+def candidate_families(is_classification: bool) -> list:
+    """
+    (name, estimator, param distributions, needs_dense) per model family,
+    in the order they are searched. Cheaper families go first so a tight
+    budget still yields a reasonable model.
+    """
+    if is_classification:
+        return [
+            ("logistic_regression", LogisticRegression(max_iter=1000), {
+                "model__C": loguniform(1e-3, 1e2),
+            }, False),
+            ("hist_gradient_boosting", HistGradientBoostingClassifier(random_state=42), {
+                "model__learning_rate": loguniform(0.01, 0.3),
+                "model__max_leaf_nodes": randint(15, 64),
+                "model__min_samples_leaf": randint(5, 50),
+                "model__l2_regularization": loguniform(1e-6, 1.0),
+            }, True),
+            ("random_forest", RandomForestClassifier(random_state=42), {
+                "model__n_estimators": randint(50, 300),
+                "model__max_depth": [None, 8, 16, 32],
+                "model__min_samples_leaf": randint(1, 10),
+                "model__max_features": ["sqrt", "log2", 0.5],
+            }, False),
+        ]
+    return [
+        ("ridge", Ridge(), {
+            "model__alpha": loguniform(1e-3, 1e3),
+        }, False),
+        ("hist_gradient_boosting", HistGradientBoostingRegressor(random_state=42), {
+            "model__learning_rate": loguniform(0.01, 0.3),
+            "model__max_leaf_nodes": randint(15, 64),
+            "model__min_samples_leaf": randint(5, 50),
+            "model__l2_regularization": loguniform(1e-6, 1.0),
+        }, True),
+        ("random_forest", RandomForestRegressor(random_state=42), {
+            "model__n_estimators": randint(50, 300),
+            "model__max_depth": [None, 8, 16, 32],
+            "model__min_samples_leaf": randint(1, 10),
+            "model__max_features": [1.0, "sqrt", 0.5],
+        }, False),
+    ]
+
+
+def _cv_splitter(is_classification: bool, y, folds: int):
+    if is_classification:
+        # Every fold needs each class at least once
+        folds = max(2, min(folds, int(np.bincount(y).min())))
+        return StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    return KFold(n_splits=max(2, folds), shuffle=True, random_state=42)
+
+
+def _jsonable(value):
+    # Mongo-friendly scalars; failed candidates score NaN
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _estimate_search_seconds(n_candidates: int, max_resources: int, folds: int,
+                             probe_seconds: float, probe_rows: int, workers: int) -> float:
+    """
+    Expected wall time of a halving search, following HalvingRandomSearchCV's
+    schedule (min_resources="exhaust"): each iteration fits a third of the
+    candidates on three times the rows, folds fits per candidate spread over
+    the workers, then the winner is refit on every row. A fit costs the
+    timed probe fit scaled by its rows, and never less than the probe
+    (fixed per-fit overhead dominates small fits).
+    """
+    def fit_seconds(rows: float) -> float:
+        return probe_seconds * max(rows, probe_rows) / probe_rows
+
+    n_iterations = 1 + floor(log(n_candidates, HALVING_FACTOR))
+    min_resources = max_resources // HALVING_FACTOR ** (n_iterations - 1)
+    seconds = 0.0
+    for i in range(n_iterations):
+        fits = ceil(n_candidates / HALVING_FACTOR ** i) * folds
+        rows = min_resources * HALVING_FACTOR ** i * (folds - 1) / folds
+        seconds += ceil(fits / workers) * fit_seconds(rows)
+    return seconds + fit_seconds(max_resources)
+
+
+def _plan_search(n_rows: int, folds: int, min_rows: int, probe_seconds: float, probe_rows: int, budget: float):
+    """
+    (n_candidates, max_resources) for a search expected to finish within
+    budget: as many candidates as allowed on every row, then fewer
+    candidates (down to one halving step), then fewer rows. None when even
+    the smallest search doesn't fit.
+    """
+    workers = effective_n_jobs(TRAIN_SEARCH_N_JOBS)
+
+    def estimate(n_candidates: int, max_resources: int) -> float:
+        return _estimate_search_seconds(n_candidates, max_resources, folds, probe_seconds, probe_rows, workers)
+
+    for n_candidates in range(max(TRAIN_SEARCH_CANDIDATES, HALVING_FACTOR), HALVING_FACTOR - 1, -1):
+        if estimate(n_candidates, n_rows) <= budget:
+            return n_candidates, n_rows
+
+    # Fewest candidates, on the most rows that fit (the estimate grows with the rows)
+    low, high = 0, n_rows
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate(HALVING_FACTOR, middle) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    # Smallest iteration still needs min_rows per fold split
+    if low // HALVING_FACTOR < min_rows:
+        return None
+    return HALVING_FACTOR, low
+
+
+def _sample(X, y, n_rows: int):
+    if n_rows >= len(X):
+        return X, y
+    rows = np.random.default_rng(42).choice(len(X), n_rows, replace=False)
+    return X.iloc[rows], (y.iloc[rows] if isinstance(y, pd.Series) else y[rows])
+
+
+def select_model(preprocessor, X_train, y_train, is_classification: bool,
+                 time_budget: float = TRAIN_SEARCH_TIME_BUDGET_SECONDS, progress=None):
+    """
+    Successive-halving random search over several model families with
+    parallel k-fold CV, bounded by a total time budget.
+
+    Each family gets an even share of the time left. A timed fit on a
+    sample of rows sizes its search (candidates, rows) to that share;
+    families whose smallest search doesn't fit are skipped. When not even
+    the first family fits, its default model is fit on as many rows as the
+    budget allows, unscored. Returns (best_pipeline, report) where the
+    report holds per-candidate scores and timings.
+    """
+    scoring = "f1_weighted" if is_classification else "neg_root_mean_squared_error"
+    cv = _cv_splitter(is_classification, y_train, TRAIN_SEARCH_CV_FOLDS)
+    folds = cv.get_n_splits()
+    # HalvingRandomSearchCV's own floor for the smallest iteration
+    min_rows = folds * (2 * len(np.unique(y_train)) if is_classification else 2)
+    families = candidate_families(is_classification)
+
+    started = time.perf_counter()
+    best = None  # (score, family, params, pipeline)
+    fallback = None
+    candidates, skipped = [], []
+
+    for i, (family, estimator, distributions, needs_dense) in enumerate(families):
+        # The first family always gets its timed fit, so there is a model to return
+        if i > 0 and time.perf_counter() - started >= time_budget:
+            skipped.append(family)
+            continue
+        if progress:
+            progress(f"searching:{family}", i / len(families))
+
+        family_preprocessor = clone(preprocessor)
+        if needs_dense:
+            family_preprocessor.set_params(sparse_threshold=0)
+        pipeline = Pipeline(steps=[("preprocessor", family_preprocessor), ("model", estimator)])
+
+        probe_rows = min(len(X_train), TRAIN_SEARCH_PROBE_ROWS)
+        probe_start = time.perf_counter()
+        clone(pipeline).fit(*_sample(X_train, y_train, probe_rows))
+        probe_seconds = time.perf_counter() - probe_start
+
+        share = (time_budget - (time.perf_counter() - started)) / (len(families) - i)
+        plan = _plan_search(len(X_train), folds, min_rows, probe_seconds, probe_rows, share)
+        if plan is None:
+            skipped.append(family)
+            if fallback is None:
+                fallback = (family, pipeline, probe_seconds / probe_rows)
+            continue
+        n_candidates, max_resources = plan
+
+        search = HalvingRandomSearchCV(
+            pipeline,
+            distributions,
+            n_candidates=n_candidates,
+            factor=HALVING_FACTOR,
+            max_resources=max_resources,
+            cv=cv,
+            scoring=scoring,
+            n_jobs=TRAIN_SEARCH_N_JOBS,
+            random_state=42,
+            error_score=np.nan,
+        )
+        family_start = time.perf_counter()
+        search.fit(X_train, y_train)
+        logger.info(
+            f"🔎 {family}: best {scoring}={search.best_score_:.4f} "
+            f"in {time.perf_counter() - family_start:.1f}s "
+            f"({n_candidates} candidates, up to {max_resources} rows)"
+        )
+
+        results = search.cv_results_
+        for j, params in enumerate(results["params"]):
+            candidates.append({
+                "family": family,
+                "params": {k.replace("model__", ""): _jsonable(v) for k, v in params.items()},
+                "iteration": int(results["iter"][j]),
+                "n_resources": int(results["n_resources"][j]),
+                "mean_score": _jsonable(results["mean_test_score"][j]),
+                "std_score": _jsonable(results["std_test_score"][j]),
+                "mean_fit_seconds": round(float(results["mean_fit_time"][j]), 4),
+                "mean_score_seconds": round(float(results["mean_score_time"][j]), 4),
+            })
+
+        if best is None or search.best_score_ > best[0]:
+            best = (float(search.best_score_), family, search.best_params_, search.best_estimator_)
+
+    if best is None:
+        family, pipeline, seconds_per_row = fallback
+        remaining = time_budget - (time.perf_counter() - started)
+        rows = max(TRAIN_SEARCH_PROBE_ROWS, min(len(X_train), int(remaining / seconds_per_row)))
+        logger.warning(f"⚠️ No search fits the time budget; fitting default {family} on {rows} rows")
+        pipeline.fit(*_sample(X_train, y_train, rows))
+        skipped.remove(family)
+        best = (None, family, {}, pipeline)
+
+    best_score, best_family, best_params, best_pipeline = best
+    report = {
+        "scoring": scoring,
+        "cv_folds": folds,
+        "time_budget_seconds": time_budget,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "best_family": best_family,
+        "best_params": {k.replace("model__", ""): _jsonable(v) for k, v in best_params.items()},
+        "best_score": best_score,
+        "skipped_families": skipped,
+        "candidates": candidates,
+    }
+    return best_pipeline, report
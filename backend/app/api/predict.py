@@ -1,14 +1,32 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
 import pandas as pd
+import json
 import io
-import joblib
+import os
 
-from app.db.mongo import fs, dataset_collection
+from app.api.batcher import micro_batcher, PREDICT_MICROBATCH
+from app.api.compiled_model import PREDICT_COMPILED
+from app.api.metrics import span, record_rows
+from app.api.inference import predict_frame, predict_records
+from app.api.local_models import local_model_store
+from app.api.model_cache import model_cache, get_model_artifacts_async
+from app.db.artifacts import compression_of, decompressing_reader
+from app.db.mongo import fs
+from app.db.mongo_async import async_dataset_collection
+
+from logger import logger
 
 router = APIRouter()
 
+# Rows scored per chunk by /predict/batch
+BATCH_CHUNK_ROWS = int(os.getenv("PREDICT_BATCH_CHUNK_ROWS", "50000"))
+
 class PredictRequest(BaseModel):
     session_id: str
     inputs: List[Dict[str, Any]]
@@ -16,42 +34,145 @@ class PredictRequest(BaseModel):
 class PredictResponse(BaseModel):
     predictions: List[Any]
 
-@router.post("/predict", response_model=PredictResponse)
-def predict(request: PredictRequest):
+
+async def _load_session_model(session_id: str):
     # Fetch model metadata
-    meta = dataset_collection.find_one({"session_id": request.session_id})
+    meta = await async_dataset_collection.find_one(
+        {"session_id": session_id}, {"model_file_id": 1, "compiled_model_file_id": 1}
+    )
     if not meta or "model_file_id" not in meta:
         raise HTTPException(status_code=404, detail="Model not found for session.")
 
-    # Load pipeline artifacts from GridFS
-    model_file = fs.find_one({"_id": meta["model_file_id"]})
-    if not model_file:
+    # The compiled export when there is one; the Pipeline otherwise (or if it's gone)
+    if PREDICT_COMPILED and meta.get("compiled_model_file_id"):
+        pipeline_artifacts = await get_model_artifacts_async(
+            session_id, meta["model_file_id"], compiled_file_id=meta["compiled_model_file_id"]
+        )
+        if pipeline_artifacts is not None:
+            return pipeline_artifacts
+
+    # Load pipeline artifacts (cached per session + model version)
+    pipeline_artifacts = await get_model_artifacts_async(session_id, meta["model_file_id"])
+    if pipeline_artifacts is None:
         raise HTTPException(status_code=404, detail="Model file not found.")
 
-    pipeline_artifacts = joblib.load(io.BytesIO(model_file.read()))
+    return pipeline_artifacts
 
-    model = pipeline_artifacts["model"]
-    imputer = pipeline_artifacts["imputer"]
-    scaler = pipeline_artifacts["scaler"]
-    feature_names = pipeline_artifacts["feature_names"]
-    label_encoder = pipeline_artifacts.get("label_encoder")  # Could be None
 
-    # Prepare input
-    input_df = pd.DataFrame(request.inputs)
-    input_df = pd.get_dummies(input_df)
+@router.post("/predict", response_model=PredictResponse)
+async def predict(request: PredictRequest):
+    with span("predict.load_model"):
+        pipeline_artifacts = await _load_session_model(request.session_id)
+    record_rows("predict", len(request.inputs))
 
-    # Align input to training feature space
-    input_df_aligned = input_df.reindex(columns=feature_names, fill_value=0)
+    try:
+        with span("predict.inference"):
+            if PREDICT_MICROBATCH:
+                # Concurrent calls for the same model share one vectorized predict
+                raw_preds = await micro_batcher.predict(request.session_id, pipeline_artifacts, request.inputs)
+            else:
+                raw_preds = await run_in_threadpool(predict_records, pipeline_artifacts, request.inputs)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid prediction input: {e}")
 
-    # Apply imputer and scaler
-    input_imputed = imputer.transform(input_df_aligned)
-    input_scaled = scaler.transform(input_imputed)
+    return PredictResponse(predictions=raw_preds.tolist())
 
-    # Predict
-    raw_preds = model.predict(input_scaled)
 
-    # Decode if classification
-    if label_encoder:
-        raw_preds = label_encoder.inverse_transform(raw_preds)
+def _iter_chunks(stream, is_parquet: bool, chunk_rows: int):
+    """Yield DataFrames of at most chunk_rows rows without loading the whole file."""
+    if is_parquet:
+        import pyarrow.parquet as pq
 
-    return PredictResponse(predictions=raw_preds.tolist())
+        parquet_file = pq.ParquetFile(stream)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(stream, chunksize=chunk_rows)
+
+
+def _stream_predictions(pipeline_artifacts, stream, is_parquet, chunk_rows, output_format, on_close):
+    offset = 0
+    try:
+        if output_format == "csv":
+            yield "row,prediction\n"
+
+        for chunk in _iter_chunks(stream, is_parquet, chunk_rows):
+            with span("predict.batch_chunk"):
+                preds = predict_frame(pipeline_artifacts, chunk).tolist()
+            record_rows("predict.batch_chunk", len(preds))
+
+            if output_format == "csv":
+                out = io.StringIO()
+                pd.DataFrame(
+                    {"row": range(offset, offset + len(preds)), "prediction": preds}
+                ).to_csv(out, index=False, header=False)
+                yield out.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({"row": offset + i, "prediction": p}) + "\n"
+                    for i, p in enumerate(preds)
+                )
+            offset += len(preds)
+
+        logger.info(f"📦 Batch scoring complete — {offset} rows")
+    finally:
+        on_close()
+
+
+@router.post("/predict/batch")
+async def predict_batch(
+    session_id: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    file_id: Optional[str] = Form(None),
+    output_format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    chunk_rows: int = Query(BATCH_CHUNK_ROWS, gt=0),
+):
+    """
+    Score an uploaded CSV/Parquet file or a stored GridFS file chunk by chunk
+    and stream predictions back as NDJSON or CSV.
+    """
+    if (file is None) == (file_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'file' or 'file_id'.")
+
+    pipeline_artifacts = await _load_session_model(session_id)
+
+    if file is not None:
+        filename = file.filename or ""
+        # The upload is closed once the endpoint returns, so keep our own handle to it
+        stream = os.fdopen(os.dup(file.file.fileno()), "rb")
+        stream.seek(0)
+    else:
+        from gridfs.errors import NoFile
+
+        try:
+            # Chunks are then read lazily from the response's worker thread
+            grid_out = await run_in_threadpool(fs.get, ObjectId(file_id))
+        except (InvalidId, NoFile):
+            raise HTTPException(status_code=404, detail="File not found.")
+        filename = grid_out.filename or ""
+        stream = decompressing_reader(grid_out, compression_of(grid_out))
+
+    if not filename.endswith((".csv", ".parquet")):
+        stream.close()
+        raise HTTPException(status_code=400, detail="Only CSV or Parquet files are supported.")
+
+    logger.info(f"📥 Batch scoring '{filename}' for session {session_id}")
+
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_predictions(
+            pipeline_artifacts, stream, filename.endswith(".parquet"),
+            chunk_rows, output_format, stream.close
+        ),
+        media_type=media_type,
+    )
+
+
+@router.get("/predict/batcher-stats")
+def batcher_stats():
+    return micro_batcher.stats()
+
+
+@router.get("/predict/cache-stats")
+def cache_stats():
+    return {**model_cache.stats(), "local_tier": local_model_store.stats()}
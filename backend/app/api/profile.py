@@ -1,93 +1,179 @@
-from fastapi import APIRouter, Query
-import pandas as pd
-import numpy as np
-from scipy.stats import skew
+from fastapi import APIRouter, BackgroundTasks, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+import os
+import threading
 
-from app.api.upload import session_data
-from app.db.mongo import dataset_collection
+from app.api.metrics import span, record_rows
+from app.api.dataset_store import dataset_fingerprint, iter_dataframe_chunks, record_profile_aggregates
+from app.api.profile_cache import profile_cache, profile_etag, PROFILE_VERSION
+from app.api.profiling import compute_profile, compute_approximate_profile, ProfileAggregates
+from app.api.session_store import session_store
+from app.db.mongo_async import async_dataset_collection
 
 from logger import logger
 from exception import DAException
 
 router = APIRouter()
 
+# Approximate profiling settings
+PROFILE_APPROX_ROW_THRESHOLD = int(os.getenv("PROFILE_APPROX_ROW_THRESHOLD", "5000000"))
+PROFILE_SAMPLE_SIZE = int(os.getenv("PROFILE_SAMPLE_SIZE", "100000"))
+PROFILE_CHUNK_ROWS = int(os.getenv("PROFILE_CHUNK_ROWS", "500000"))
+# Distinct values tracked exactly per column before frequency tables turn approximate
+PROFILE_FREQUENCY_COUNTERS = int(os.getenv("PROFILE_FREQUENCY_COUNTERS", "10000"))
+
+# Sessions whose aggregates are being built by this worker
+_building_aggregates = set()
+_building_lock = threading.Lock()
+
+
+def new_profile_aggregates() -> ProfileAggregates:
+    return ProfileAggregates(PROFILE_SAMPLE_SIZE, PROFILE_FREQUENCY_COUNTERS)
+
+
+def has_profile_aggregates(meta: dict) -> bool:
+    stored = meta.get("profile_aggregates") or {}
+    return stored.get("dataset_version") == meta.get("dataset_version", 0)
+
+
+def build_profile_aggregates(session_id: str, meta: dict):
+    """
+    One scan of the stored rows into the mergeable aggregates /upload/append
+    updates, for datasets that don't have them yet (uploaded before they
+    were kept). Runs after the first /profile response, never in an append.
+    """
+    with _building_lock:
+        if session_id in _building_aggregates:
+            return
+        _building_aggregates.add(session_id)
+    try:
+        logger.info(f"🧮 Building profile aggregates for session {session_id} from its stored rows (one-time)")
+        aggregates = new_profile_aggregates()
+        for chunk in iter_dataframe_chunks(session_id, meta, PROFILE_CHUNK_ROWS):
+            aggregates.update(chunk)
+        record_profile_aggregates(session_id, meta, aggregates)
+    except Exception:
+        logger.exception(f"❌ Failed to build profile aggregates for session {session_id}")
+    finally:
+        with _building_lock:
+            _building_aggregates.discard(session_id)
+
+
+async def _save_profile(session_id: str, fingerprint: str, mode: str, profile: dict):
+    # Save to DB
+    with span("profile.save"):
+        await async_dataset_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {
+                "profile": profile,
+                "profile_fingerprint": fingerprint,
+                "profile_mode": mode,
+                "profile_version": PROFILE_VERSION,
+                "profile_source": "scan"
+            }},
+            upsert=True
+        )
+    if fingerprint:
+        profile_cache.put(session_id, f"{fingerprint}:{mode}", profile)
+    logger.info(f"💾 Profile saved to DB for session_id: {session_id}")
+    logger.info(f"💾 Profile saved to DB tat is: {profile}")
+    return {
+        "message": "Data profiling complete.",
+        "profile": profile
+    }
+
+
 @router.get("/profile")
-def profile(session_id: str = Query(...)):
+async def profile(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    session_id: str = Query(...),
+    mode: str = Query("auto", pattern="^(auto|exact|approx)$"),
+):
     logger.info(f"📥 Received profile request for session_id: {session_id}")
 
-    if session_id not in session_data:
+    meta = await async_dataset_collection.find_one({"session_id": session_id})
+    if not meta:
+        logger.warning(f"❌ Invalid session_id: {session_id}")
+        raise DAException("Invalid session_id", status_code=404)
+
+    if not has_profile_aggregates(meta):
+        background_tasks.add_task(build_profile_aggregates, session_id, meta)
+
+    # Profiles only change when the stored CSV does
+    with span("profile.fingerprint"):
+        fingerprint = await run_in_threadpool(dataset_fingerprint, session_id, meta)
+
+    if mode == "auto":
+        if meta.get("profile_source") == "incremental" and meta.get("profile_fingerprint") == fingerprint:
+            # Kept current by /upload/append from merged aggregates
+            mode = meta.get("profile_mode", "exact")
+        else:
+            # Very large datasets are profiled from samples and sketches unless exact is requested
+            mode = "approx" if meta.get("num_rows", 0) > PROFILE_APPROX_ROW_THRESHOLD else "exact"
+    cache_key = f"{fingerprint}:{mode}"
+    etag = profile_etag(fingerprint, mode) if fingerprint else None
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+        if request.headers.get("if-none-match") == etag:
+            profile_cache.record_not_modified()
+            logger.info(f"♻️ Profile not modified for session_id: {session_id}")
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+        cached = profile_cache.get(session_id, cache_key)
+        if cached is None and meta.get("profile_fingerprint") == fingerprint \
+                and meta.get("profile_mode", "exact") == mode \
+                and meta.get("profile_version") == PROFILE_VERSION:
+            cached = meta["profile"]
+            profile_cache.put(session_id, cache_key, cached)
+        if cached is not None:
+            logger.info(f"♻️ Profile served from cache for session_id: {session_id}")
+            return {
+                "message": "Data profiling complete.",
+                "profile": cached
+            }
+
+    if mode == "approx":
+        try:
+            chunks = iter_dataframe_chunks(session_id, meta, PROFILE_CHUNK_ROWS)
+            with span("profile.compute_approx"):
+                profile = await run_in_threadpool(
+                    compute_approximate_profile, chunks, meta.get("parsed_schema", []), PROFILE_SAMPLE_SIZE
+                )
+            record_rows("profile", profile["approximation"]["total_rows"])
+            logger.info(f"📊 Approximate profile computed from {profile['approximation']['sample_size']} sampled rows")
+            return await _save_profile(session_id, fingerprint, mode, profile)
+        except Exception as e:
+            logger.exception(f"🔥 Error while profiling session {session_id}")
+            raise DAException("Error during profiling. Please try again.")
+
+    # Served from memory, or rehydrated from GridFS by whichever worker gets the request
+    with span("profile.load"):
+        session = await run_in_threadpool(session_store.get, session_id, meta.get("dataset_version", 0))
+    if session is None:
         logger.warning(f"❌ Invalid session_id: {session_id}")
         raise DAException("Invalid session_id", status_code=404)
 
     try:
-        session = session_data[session_id]
         df = session["df"]
         parsed_schema = session.get("parsed_schema", [])
 
         logger.info(f"✅ DataFrame retrieved. Columns: {df.columns.tolist()}")
 
-        # Outliers
-        outliers = {}
-        for col in df.select_dtypes(include=[np.number]).columns:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            outlier_count = ((df[col] < Q1 - 1.5 * IQR) | (df[col] > Q3 + 1.5 * IQR)).sum()
-            outliers[col] = int(outlier_count)
-        logger.info("📊 Outliers computed")
-
-        # Skewness
-        skewness = df.select_dtypes(include=[np.number]).apply(
-            lambda x: round(skew(x.dropna()), 3)
-        ).to_dict()
-        logger.info("📈 Skewness calculated")
-
-        # Correlations
-        correlations = df.select_dtypes(include=[np.number]).corr().to_dict()
-        logger.info("🔗 Correlation matrix calculated")
-
-        # Imbalance
-        imbalance = {}
-        for col in df.columns:
-            freq = df[col].value_counts(normalize=True, dropna=False)
-            if not freq.empty and freq.iloc[0] > 0.9:
-                imbalance[col] = round(freq.iloc[0] * 100, 2)
-        logger.info("⚖️  Imbalance check complete")
-
-        # Data leakage
-        leakage = {}
-        if 'target' in df.columns:
-            for col in df.select_dtypes(include=[np.number]).columns:
-                if col != 'target':
-                    sub = df[[col, 'target']].dropna()
-                    if len(sub) > 1:
-                        corr_val = sub.corr().iloc[0, 1]
-                        if pd.notna(corr_val) and abs(corr_val) > 0.9:
-                            leakage[col] = round(corr_val, 4)
-        logger.info("🔒 Potential leakage check complete")
-
-        profile = {
-            "parsed_schema": parsed_schema,
-            "outliers": outliers,
-            "skewness": skewness,
-            "pairwise_correlations": correlations,
-            "imbalanced_columns": imbalance,
-            "potential_leakage": leakage
-        }
-
-        # Save to DB
-        dataset_collection.update_one(
-            {"session_id": session_id},
-            {"$set": {"profile": profile}},
-            upsert=True
-        )
-        logger.info(f"💾 Profile saved to DB for session_id: {session_id}")
-        logger.info(f"💾 Profile saved to DB tat is: {profile}")
-        return {
-            "message": "Data profiling complete.",
-            "profile": profile
-        }
+        with span("profile.compute_exact"):
+            profile = await run_in_threadpool(compute_profile, df, parsed_schema)
+        record_rows("profile", len(df))
+        logger.info("📊 Profile computed (outliers, skewness, correlations, imbalance, leakage)")
+        return await _save_profile(session_id, fingerprint, mode, profile)
 
     except Exception as e:
         logger.exception(f"🔥 Error while profiling session {session_id}")
         raise DAException("Error during profiling. Please try again.")
+
+
+@router.get("/profile/cache-stats")
+def cache_stats():
+    return profile_cache.stats()
@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Limits (overridable through the environment)
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "128"))
+
+# Bump when the profile output changes so stored profiles and ETags are recomputed
+PROFILE_VERSION = 1
+
+
+def profile_etag(fingerprint: str, mode: str) -> str:
+    return f'"{fingerprint[:32]}-{mode}-v{PROFILE_VERSION}"'
+
+
+class ProfileCache:
+    """LRU of computed profiles keyed by (session_id, dataset fingerprint + mode)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, session_id: str, fingerprint: str):
+        key = (session_id, fingerprint)
+        with self._lock:
+            profile = self._entries.get(key)
+            if profile is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return profile
+
+    def put(self, session_id: str, fingerprint: str, profile: dict):
+        with self._lock:
+            # Only the latest fingerprint of a session is worth keeping
+            for key in [k for k in self._entries if k[0] == session_id]:
+                del self._entries[key]
+            self._entries[(session_id, fingerprint)] = profile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+profile_cache = ProfileCache(PROFILE_CACHE_MAX_ENTRIES)
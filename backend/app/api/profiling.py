@@ -0,0 +1,445 @@
+import numpy as np
+import pandas as pd
+
+from app.api.sketches import (
+    ReservoirSample, MisraGries, quantile_rank_error, proportion_interval,
+    skewness_half_width, correlation_interval, Z_95,
+)
+
+# Thresholds used by the profile checks
+IMBALANCE_THRESHOLD = 0.9
+LEAKAGE_THRESHOLD = 0.9
+
+# Counters per column for heavy-hitter tracking in approximate mode
+HEAVY_HITTER_COUNTERS = 100
+
+
+def _lerp(a, b, t):
+    # Same linear interpolation NumPy (and so pandas.quantile) uses
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def _sorted_quantiles(sorted_block: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Quantile per column of a block sorted along axis 0 with NaNs last."""
+    pos = (np.maximum(counts, 1) - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(counts - 1, 0))
+    cols = np.arange(sorted_block.shape[1])
+    values = _lerp(sorted_block[lo, cols], sorted_block[hi, cols], pos - lo)
+    return np.where(counts > 0, values, np.nan)
+
+
+def _max_run_lengths(sorted_block: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Longest run of equal non-NaN values per column of a sorted block."""
+    n_rows = sorted_block.shape[0]
+    if n_rows == 0:
+        return np.zeros(sorted_block.shape[1], dtype=np.int64)
+
+    starts = np.ones_like(sorted_block, dtype=bool)
+    starts[1:] = sorted_block[1:] != sorted_block[:-1]
+    row_idx = np.arange(n_rows)[:, None]
+    run_start = np.maximum.accumulate(np.where(starts, row_idx, 0), axis=0)
+    run_length = np.where(valid, row_idx - run_start + 1, 0)
+    return run_length.max(axis=0)
+
+
+def _pairwise_correlation(block: np.ndarray, valid: np.ndarray):
+    """
+    Pearson correlation over pairwise-complete rows (pandas DataFrame.corr
+    semantics) using a handful of matrix products instead of per-pair loops.
+    Returns (corr, pair_counts).
+    """
+    counts = valid.sum(axis=0)
+    means = np.divide(np.where(valid, block, 0.0).sum(axis=0), counts,
+                      out=np.zeros(block.shape[1]), where=counts > 0)
+    # Center on the column means first for numerical stability
+    centered = np.where(valid, block - means, 0.0)
+
+    sxy = centered.T @ centered
+    if valid.all():
+        # No missing values: every pair shares all rows, one product is enough
+        n = np.full_like(sxy, block.shape[0])
+        sx = np.zeros_like(sxy)
+        sxx = np.broadcast_to(np.diag(sxy)[:, None], sxy.shape)
+    else:
+        mask = valid.astype(np.float64)
+        n = mask.T @ mask
+        sx = centered.T @ mask
+        sxx = (centered * centered).T @ mask
+    return _correlation_from_sums(n, sx, sxx, sxy), n
+
+
+def _correlation_from_sums(n, sx, sxx, sxy) -> np.ndarray:
+    """
+    Pearson correlation from pairwise-complete sums of (shifted) values:
+    n[i, j] rows where both are present, sx[i, j] the sum of column i over
+    those rows, sxx[i, j] its sum of squares, sxy[i, j] the cross products.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx * sx / n
+        var_y = var_x.T
+        corr = cov / np.sqrt(var_x * var_y)
+
+    corr[(n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    diag = np.diag_indices_from(corr)
+    corr[diag] = np.where(np.isnan(corr[diag]), np.nan, 1.0)
+    return corr
+
+
+def _skewness(block: np.ndarray, valid: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Biased sample skewness per column, matching scipy.stats.skew on dropna()."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(valid, block, 0.0).sum(axis=0) / counts
+        centered = np.where(valid, block - means, 0.0)
+        squared = centered * centered
+        m2 = squared.sum(axis=0) / counts
+        m3 = (squared * centered).sum(axis=0) / counts
+        zero = m2 <= (np.finfo(np.float64).resolution * means) ** 2
+        return np.where(zero | (counts == 0), np.nan, m3 / m2 ** 1.5)
+
+
+def _top_frequency(series: pd.Series) -> float:
+    # Share of the most frequent value, NaN counted as its own value
+    codes, _ = pd.factorize(series, use_na_sentinel=True)
+    return np.bincount(codes + 1).max() / len(codes)
+
+
+def compute_profile(df: pd.DataFrame, parsed_schema: list) -> dict:
+    """
+    Compute every /profile statistic from a single float block of the numeric
+    columns: one sort feeds the quantiles and imbalance check, one set of
+    moments feeds skewness, and one correlation matrix is reused for leakage.
+    """
+    numeric_df = df.select_dtypes(include=[np.number])
+    numeric_cols = numeric_df.columns.tolist()
+    n_rows = len(df)
+
+    block = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(block)
+    counts = valid.sum(axis=0)
+    sorted_block = np.sort(block, axis=0)
+
+    # Outliers (IQR rule)
+    q1 = _sorted_quantiles(sorted_block, counts, 0.25)
+    q3 = _sorted_quantiles(sorted_block, counts, 0.75)
+    iqr = q3 - q1
+    with np.errstate(invalid="ignore"):
+        outlier_counts = ((block < q1 - 1.5 * iqr) | (block > q3 + 1.5 * iqr)).sum(axis=0)
+    outliers = {col: int(c) for col, c in zip(numeric_cols, outlier_counts)}
+
+    # Skewness
+    skew_values = _skewness(block, valid, counts)
+    skewness = {col: round(float(s), 3) for col, s in zip(numeric_cols, skew_values)}
+
+    # Correlations
+    corr, pair_counts = _pairwise_correlation(block, valid)
+    correlations = {
+        col: dict(zip(numeric_cols, corr[:, j].tolist()))
+        for j, col in enumerate(numeric_cols)
+    }
+
+    # Imbalance
+    imbalance = {}
+    if n_rows:
+        numeric_top = np.maximum(_max_run_lengths(sorted_block, valid), n_rows - counts) / n_rows
+        top_share = dict(zip(numeric_cols, numeric_top))
+        for col in df.columns:
+            share = top_share[col] if col in top_share else _top_frequency(df[col])
+            if share > IMBALANCE_THRESHOLD:
+                imbalance[col] = round(float(share) * 100, 2)
+
+    # Data leakage (reuses the correlation matrix)
+    leakage = {}
+    if "target" in numeric_cols:
+        t = numeric_cols.index("target")
+        for i, col in enumerate(numeric_cols):
+            if col == "target" or pair_counts[i, t] <= 1:
+                continue
+            corr_val = corr[i, t]
+            if not np.isnan(corr_val) and abs(corr_val) > LEAKAGE_THRESHOLD:
+                leakage[col] = round(float(corr_val), 4)
+
+    return {
+        "parsed_schema": parsed_schema,
+        "outliers": outliers,
+        "skewness": skewness,
+        "pairwise_correlations": correlations,
+        "imbalanced_columns": imbalance,
+        "potential_leakage": leakage
+    }
+
+
+def compute_approximate_profile(chunks, parsed_schema: list, sample_size: int, seed: int = 0) -> dict:
+    """
+    Profile a stream of DataFrame chunks in one pass with bounded memory.
+
+    Quantiles, outlier rates, skewness and correlations come from a uniform
+    reservoir sample; the imbalance check uses Misra-Gries heavy hitters over
+    all rows. Every metric is reported with its 95% error bound and the
+    sample size it was computed from.
+    """
+    reservoir = ReservoirSample(sample_size, seed=seed)
+    heavy_hitters = {}
+    for chunk in chunks:
+        reservoir.update(chunk)
+        for col in chunk.columns:
+            summary = heavy_hitters.setdefault(col, MisraGries(HEAVY_HITTER_COUNTERS))
+            summary.update_counts(chunk[col].value_counts(dropna=False))
+
+    n_rows = reservoir.rows_seen
+    sample = reservoir.frame
+    n_sample = len(sample)
+
+    numeric_df = sample.select_dtypes(include=[np.number])
+    numeric_cols = numeric_df.columns.tolist()
+    block = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(block)
+    counts = valid.sum(axis=0)
+    sorted_block = np.sort(block, axis=0)
+
+    # Outliers: fences from sampled quartiles, count scaled up to all rows
+    q1 = _sorted_quantiles(sorted_block, counts, 0.25)
+    q3 = _sorted_quantiles(sorted_block, counts, 0.75)
+    iqr = q3 - q1
+    with np.errstate(invalid="ignore"):
+        sample_outliers = ((block < q1 - 1.5 * iqr) | (block > q3 + 1.5 * iqr)).sum(axis=0)
+    outliers, outlier_bounds = {}, {}
+    for col, c in zip(numeric_cols, sample_outliers):
+        share = c / n_sample if n_sample else 0.0
+        lo, hi = proportion_interval(share, n_sample, n_rows)
+        outliers[col] = int(round(share * n_rows))
+        outlier_bounds[col] = [int(lo * n_rows), int(np.ceil(hi * n_rows))]
+
+    # Skewness
+    skew_values = _skewness(block, valid, counts)
+    skewness = {col: round(float(s), 3) for col, s in zip(numeric_cols, skew_values)}
+    skewness_bounds = {}
+    for col, c in zip(numeric_cols, counts):
+        half_width = skewness_half_width(int(c))
+        skewness_bounds[col] = round(half_width, 4) if half_width is not None else None
+
+    # Correlations (sampled)
+    corr, pair_counts = _pairwise_correlation(block, valid)
+    correlations = {
+        col: dict(zip(numeric_cols, corr[:, j].tolist()))
+        for j, col in enumerate(numeric_cols)
+    }
+
+    # Imbalance (heavy hitters over every row)
+    imbalance, imbalance_bounds = {}, {}
+    for col, summary in heavy_hitters.items():
+        _, top_count = summary.top()
+        share = top_count / n_rows if n_rows else 0.0
+        # Misra-Gries only undercounts, so `share` is a lower bound
+        if share > IMBALANCE_THRESHOLD:
+            upper = min(1.0, share + summary.error_bound)
+            imbalance[col] = round(share * 100, 2)
+            imbalance_bounds[col] = [round(share * 100, 2), round(upper * 100, 2)]
+
+    # Data leakage (reuses the sampled correlation matrix)
+    leakage, leakage_bounds = {}, {}
+    if "target" in numeric_cols:
+        t = numeric_cols.index("target")
+        for i, col in enumerate(numeric_cols):
+            if col == "target" or pair_counts[i, t] <= 1:
+                continue
+            corr_val = corr[i, t]
+            if not np.isnan(corr_val) and abs(corr_val) > LEAKAGE_THRESHOLD:
+                leakage[col] = round(float(corr_val), 4)
+                lo, hi = correlation_interval(float(corr_val), int(pair_counts[i, t]))
+                leakage_bounds[col] = [round(lo, 4), round(hi, 4)]
+
+    return {
+        "parsed_schema": parsed_schema,
+        "outliers": outliers,
+        "skewness": skewness,
+        "pairwise_correlations": correlations,
+        "imbalanced_columns": imbalance,
+        "potential_leakage": leakage,
+        "approximation": {
+            "total_rows": n_rows,
+            "sample_size": n_sample,
+            "confidence": 0.95,
+            "quantile_rank_error": round(quantile_rank_error(n_sample), 6),
+            "outliers": outlier_bounds,
+            "skewness_half_width": skewness_bounds,
+            "correlation_z_half_width": round(Z_95 / np.sqrt(n_sample - 3), 6) if n_sample > 3 else None,
+            "imbalanced_columns": imbalance_bounds,
+            "imbalance_max_error_pct": round(100.0 / (HEAVY_HITTER_COUNTERS + 1), 4),
+            "potential_leakage": leakage_bounds,
+        },
+    }
+
+
+def _merge_frequencies(table: pd.Series, counts: pd.Series, k: int) -> pd.Series:
+    """Misra-Gries merge of value counts into a table of at most k counters."""
+    counts = counts.copy()
+    counts.index = counts.index.astype(object)
+    table = counts if table is None else table.add(counts, fill_value=0)
+    if len(table) > k:
+        cut = table.nlargest(k + 1).iloc[-1]
+        table = table[table > cut] - cut
+    return table
+
+
+class ProfileAggregates:
+    """
+    Mergeable partial aggregates behind /profile, so appended rows update
+    a profile without rescanning the rows already stored.
+
+    Per numeric pair: row counts, sums, sums of squares and cross products
+    of shifted values (correlations, leakage). Per numeric column: power
+    sums up to the third (skewness). Per column: a frequency table, exact
+    up to `frequency_counters` distinct values and Misra-Gries beyond
+    (imbalance, unique and null counts). Quartile fences don't merge, so
+    outliers come from a reservoir sample, which holds every row until the
+    dataset outgrows `sample_size`.
+    """
+
+    def __init__(self, sample_size: int, frequency_counters: int, seed: int = 0):
+        self.sample_size = sample_size
+        self.frequency_counters = frequency_counters
+        self.n_rows = 0
+        self.columns = None
+        self.numeric_cols = None
+        self.shift = None
+        self.pair_n = self.pair_sx = self.pair_sxx = self.pair_sxy = None
+        self.sum_cubes = None
+        self.frequencies = {}
+        self.sample = ReservoirSample(sample_size, seed=seed)
+
+    def update(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = chunk.columns.tolist()
+            self.numeric_cols = chunk.select_dtypes(include=[np.number]).columns.tolist()
+        chunk = chunk[self.columns]
+        self.n_rows += len(chunk)
+
+        numeric = chunk[self.numeric_cols].apply(pd.to_numeric, errors="coerce")
+        block = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(block)
+        if self.shift is None:
+            # Shift by the first chunk's means so the sums stay well conditioned
+            counts = valid.sum(axis=0)
+            self.shift = np.divide(np.where(valid, block, 0.0).sum(axis=0), counts,
+                                   out=np.zeros(block.shape[1]), where=counts > 0)
+            k = block.shape[1]
+            self.pair_n, self.pair_sx, self.pair_sxx, self.pair_sxy = (np.zeros((k, k)) for _ in range(4))
+            self.sum_cubes = np.zeros(k)
+
+        shifted = np.where(valid, block - self.shift, 0.0)
+        mask = valid.astype(np.float64)
+        self.pair_n += mask.T @ mask
+        self.pair_sx += shifted.T @ mask
+        self.pair_sxx += (shifted * shifted).T @ mask
+        self.pair_sxy += shifted.T @ shifted
+        self.sum_cubes += (shifted ** 3).sum(axis=0)
+
+        for col in self.columns:
+            self.frequencies[col] = _merge_frequencies(
+                self.frequencies.get(col), chunk[col].value_counts(dropna=False), self.frequency_counters
+            )
+        self.sample.update(numeric)
+
+    @property
+    def exact(self) -> bool:
+        """True while the sample holds every row and no frequency table overflowed."""
+        return self.sample.rows_seen == len(self.sample.frame) and all(
+            table.sum() == self.n_rows for table in self.frequencies.values()
+        )
+
+    def column_summary(self, col: str) -> dict:
+        table = self.frequencies[col]
+        exact = table.sum() == self.n_rows
+        # Misra-Gries decrements and unused categories leave zero-count keys
+        table = table[table > 0]
+        nulls = int(table[table.index.isna()].sum())
+        return {
+            "nulls": nulls,
+            "unique_values": int((~table.index.isna()).sum()),
+            "approximate_unique": not exact,
+        }
+
+    def _skewness(self) -> np.ndarray:
+        counts = np.diag(self.pair_n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.diag(self.pair_sx) / counts
+            m2 = np.diag(self.pair_sxx) / counts - mean ** 2
+            m3 = self.sum_cubes / counts - 3 * mean * np.diag(self.pair_sxx) / counts + 2 * mean ** 3
+            zero = m2 <= (np.finfo(np.float64).resolution * (mean + self.shift)) ** 2
+            return np.where(zero | (counts == 0), np.nan, m3 / m2 ** 1.5)
+
+    def to_profile(self, parsed_schema: list) -> dict:
+        numeric_cols = self.numeric_cols or []
+        n_rows = self.n_rows
+
+        # Outliers: IQR fences from the sample, counts scaled up when it doesn't hold every row
+        sample = self.sample.frame
+        n_sample = len(sample)
+        block = sample[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan) if n_sample \
+            else np.empty((0, len(numeric_cols)))
+        counts = (~np.isnan(block)).sum(axis=0)
+        sorted_block = np.sort(block, axis=0)
+        q1 = _sorted_quantiles(sorted_block, counts, 0.25)
+        q3 = _sorted_quantiles(sorted_block, counts, 0.75)
+        iqr = q3 - q1
+        with np.errstate(invalid="ignore"):
+            sample_outliers = ((block < q1 - 1.5 * iqr) | (block > q3 + 1.5 * iqr)).sum(axis=0)
+        sampled = n_sample < n_rows
+        outliers, outlier_bounds = {}, {}
+        for col, c in zip(numeric_cols, sample_outliers):
+            if not sampled:
+                outliers[col] = int(c)
+                continue
+            share = c / n_sample if n_sample else 0.0
+            lo, hi = proportion_interval(share, n_sample, n_rows)
+            outliers[col] = int(round(share * n_rows))
+            outlier_bounds[col] = [int(lo * n_rows), int(np.ceil(hi * n_rows))]
+
+        skewness = {col: round(float(s), 3) for col, s in zip(numeric_cols, self._skewness())}
+
+        corr = _correlation_from_sums(self.pair_n, self.pair_sx, self.pair_sxx, self.pair_sxy) \
+            if numeric_cols else np.empty((0, 0))
+        correlations = {
+            col: dict(zip(numeric_cols, corr[:, j].tolist()))
+            for j, col in enumerate(numeric_cols)
+        }
+
+        imbalance = {}
+        if n_rows:
+            for col in self.columns:
+                share = self.frequencies[col].max() / n_rows
+                if share > IMBALANCE_THRESHOLD:
+                    imbalance[col] = round(float(share) * 100, 2)
+
+        leakage = {}
+        if "target" in numeric_cols:
+            t = numeric_cols.index("target")
+            for i, col in enumerate(numeric_cols):
+                if col == "target" or self.pair_n[i, t] <= 1:
+                    continue
+                corr_val = corr[i, t]
+                if not np.isnan(corr_val) and abs(corr_val) > LEAKAGE_THRESHOLD:
+                    leakage[col] = round(float(corr_val), 4)
+
+        profile = {
+            "parsed_schema": parsed_schema,
+            "outliers": outliers,
+            "skewness": skewness,
+            "pairwise_correlations": correlations,
+            "imbalanced_columns": imbalance,
+            "potential_leakage": leakage
+        }
+        if not self.exact:
+            profile["approximation"] = {
+                "total_rows": n_rows,
+                "sample_size": n_sample,
+                "confidence": 0.95,
+                "quantile_rank_error": round(quantile_rank_error(n_sample), 6) if sampled else 0.0,
+                "outliers": outlier_bounds,
+                "imbalance_max_error_pct": round(100.0 / (self.frequency_counters + 1), 4),
+            }
+        return profile
@@ -0,0 +1,160 @@
+import math
+import os
+from typing import Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+from app.api.dataset_store import dataset_fingerprint
+from app.db.artifacts import open_artifact
+
+from logger import logger
+
+# Warm starts add trees in proportion to the rows added, within these bounds
+RETRAIN_MIN_NEW_ESTIMATORS = int(os.getenv("RETRAIN_MIN_NEW_ESTIMATORS", "10"))
+# Past this many trees the forest is refit from scratch instead of growing
+RETRAIN_MAX_ESTIMATORS = int(os.getenv("RETRAIN_MAX_ESTIMATORS", "400"))
+
+# Training paths whose models can continue from a previous fit
+WARM_START_MODES = ("standard", "incremental")
+
+
+class WarmStartUnavailable(Exception):
+    pass
+
+
+def schema_signature(meta: dict) -> list:
+    return [[entry["column"], entry["dtype"]] for entry in meta.get("parsed_schema", [])]
+
+
+def training_record(meta: dict, fingerprint: Optional[str], mode: str, options: dict, segments: list) -> dict:
+    """
+    What a model was trained on, stored with it so the next retrain can tell
+    an unchanged dataset from a grown one. `segments` are the row counts
+    that were split into train/test separately, in dataset order.
+    """
+    return {
+        "fingerprint": fingerprint,
+        "dataset_version": meta.get("dataset_version", 0),
+        "parts": len(meta.get("parts", [])),
+        "segments": segments,
+        "mode": mode,
+        "options": options,
+        "schema": schema_signature(meta),
+    }
+
+
+def reusable_result(meta: dict, fingerprint: Optional[str], options: dict) -> Optional[dict]:
+    """The stored training result when the dataset and options are unchanged, else None."""
+    record = meta.get("trained_dataset")
+    if not record or not meta.get("model_file_id") or fingerprint is None:
+        return None
+    if record["fingerprint"] != fingerprint or record["options"] != options:
+        return None
+
+    return {
+        "model_type": meta["model_type"],
+        "model_file_id": str(meta["model_file_id"]),
+        "metrics": meta["metrics"],
+        "feature_importances": dict(meta.get("feature_importances", [])),
+        "model_selection": meta.get("model_selection"),
+        "training_profile": meta.get("training_profile"),
+        "retrain": {"strategy": "reused", "base_model_file_id": str(meta["model_file_id"])},
+    }
+
+
+def plan_warm_start(session_id: str, meta: dict, mode: str, options: dict):
+    """
+    Decide whether the previous model can continue on the grown dataset.
+    Returns (plan, reason): plan is None when a full fit is needed, with
+    the reason; otherwise it holds the previous record and the loaded
+    artifacts (a private copy, never the prediction cache's).
+    """
+    record = meta.get("trained_dataset")
+    if not record or not record["fingerprint"] or not meta.get("model_file_id"):
+        return None, "no previous training record"
+    if options.get("model_selection") or record["options"].get("model_selection"):
+        return None, "model selection always searches from scratch"
+    if mode not in WARM_START_MODES:
+        return None, f"{mode} models can't continue on new rows"
+    if record["mode"] != mode:
+        return None, f"training mode changed ({record['mode']} -> {mode})"
+    if record["schema"] != schema_signature(meta):
+        return None, "schema changed"
+
+    # The dataset must have only grown: the parts trained on are a prefix of today's
+    parts = meta.get("parts", [])
+    prefix = dataset_fingerprint(session_id, {**meta, "parts": parts[:record["parts"]]})
+    if len(parts) < record["parts"] or prefix != record["fingerprint"]:
+        return None, "dataset was replaced"
+    if len(parts) == record["parts"]:
+        # Same rows; only the options differ from the previous training
+        return None, "training options changed"
+
+    source = open_artifact(meta["model_file_id"])
+    if source is None:
+        return None, "previous model file is missing"
+    artifacts = joblib.load(source)
+    model = artifacts["pipeline"].named_steps["model"]
+    plan = {
+        "record": record,
+        "artifacts": artifacts,
+        "new_rows": sum(part["num_rows"] for part in parts[record["parts"]:]),
+        "base_model_file_id": meta["model_file_id"],
+    }
+
+    if mode == "standard":
+        if not isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+            return None, f"{type(model).__name__} can't add trees"
+        plan["added_estimators"] = added_estimators(model.n_estimators, sum(record["segments"]), plan["new_rows"])
+        if model.n_estimators + plan["added_estimators"] > RETRAIN_MAX_ESTIMATORS:
+            return None, f"forest would exceed {RETRAIN_MAX_ESTIMATORS} trees"
+    elif not hasattr(model, "partial_fit"):
+        return None, f"{type(model).__name__} has no partial_fit"
+    return plan, None
+
+
+def segmented_split(X: pd.DataFrame, y, segments: list):
+    """
+    Train/test split done per segment, so rows keep the side they were on
+    when earlier trees were fit (a warm-started model is never scored on
+    rows it trained on). One segment is exactly the plain 80/20 split.
+    """
+    y = np.asarray(y)
+    train_idx, test_idx, start = [], [], 0
+    for rows in segments:
+        idx = np.arange(start, start + rows)
+        if start and rows < 5:
+            # An appended segment too small to hold any rows out
+            train, test = idx, idx[:0]
+        else:
+            train, test = train_test_split(idx, test_size=0.2, random_state=42)
+        train_idx.append(train)
+        test_idx.append(test)
+        start += rows
+    train_idx, test_idx = np.concatenate(train_idx), np.concatenate(test_idx)
+    return X.iloc[train_idx], X.iloc[test_idx], y[train_idx], y[test_idx]
+
+
+def added_estimators(n_estimators: int, old_rows: int, new_rows: int) -> int:
+    """Trees to add for new_rows, matching the forest's current trees-per-row."""
+    return max(RETRAIN_MIN_NEW_ESTIMATORS, math.ceil(n_estimators * new_rows / max(old_rows, 1)))
+
+
+def warm_start_forest(pipeline, X_train, y_train, n_new: int):
+    """
+    Grow a fitted forest by n_new trees trained on the full (grown) training
+    split. The fitted preprocessor is kept as-is, so its encoders and
+    scalers still describe the rows the earlier trees saw.
+    """
+    Xt = pipeline.named_steps["preprocessor"].transform(X_train)
+    model = pipeline.named_steps["model"]
+    n_before = model.n_estimators
+    model.set_params(warm_start=True, n_estimators=n_before + n_new)
+    model.fit(Xt, y_train)
+    model.set_params(warm_start=False)
+    logger.info(f"🌲 Warm start added {n_new} trees to a {n_before}-tree forest")
+    return pipeline
@@ -1 +1,192 @@
-session_data = {}
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+from logger import logger
+
+# Limits (overridable through the environment)
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_STORE_MAX_ENTRIES = int(os.getenv("SESSION_STORE_MAX_ENTRIES", "64"))
+SESSION_STORE_MAX_BYTES = int(os.getenv("SESSION_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+class SessionBackend(ABC):
+    """Interface for session storage backends."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, session: dict):
+        ...
+
+    @abstractmethod
+    def pop(self, session_id: str):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    Per-process LRU of parsed sessions, bounded by entry count and by the
+    deep memory footprint of the DataFrames. Entries expire after ttl seconds
+    since last access.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # session_id -> (session, nbytes, last_access)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, session_id: str):
+        _, nbytes, _ = self._entries.pop(session_id)
+        self._total_bytes -= nbytes
+
+    def _expire(self, now: float):
+        while self._entries:
+            session_id, (_, _, last_access) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            session, nbytes, _ = entry
+            self._entries[session_id] = (session, nbytes, now)
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+    def put(self, session_id: str, session: dict):
+        nbytes = frame_nbytes(session["df"])
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._expire(now)
+
+            if nbytes > self.max_bytes:
+                logger.warning(f"⚠️ Session {session_id} ({nbytes} bytes) exceeds store size, not kept in memory")
+                return
+
+            self._entries[session_id] = (session, nbytes, now)
+            self._total_bytes += nbytes
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SessionStore:
+    """
+    Session lookup shared by all endpoints. Misses are rehydrated from the
+    persisted dataset (Parquet copy or CSV in GridFS), so any worker process
+    can serve any session.
+    """
+
+    def __init__(self, backend: SessionBackend):
+        self.backend = backend
+        self.rehydrations = 0
+
+    def put(self, session_id: str, df: pd.DataFrame, parsed_schema: list, version: int = 0):
+        self.backend.put(session_id, {"df": df, "parsed_schema": parsed_schema, "version": version})
+
+    def peek(self, session_id: str, version: Optional[int] = None) -> Optional[dict]:
+        """
+        Memory-only lookup; never touches MongoDB. With `version`, a frame
+        cached before rows were appended (possibly by another worker) is
+        treated as missing.
+        """
+        session = self.backend.get(session_id)
+        if session is not None and version is not None and session.get("version", 0) != version:
+            self.backend.pop(session_id)
+            return None
+        return session
+
+    def get(self, session_id: str, version: Optional[int] = None) -> Optional[dict]:
+        session = self.peek(session_id, version)
+        if session is not None:
+            return session
+
+        from app.api.dataset_store import load_persisted_dataframe
+        from app.db.mongo import dataset_collection
+
+        meta = dataset_collection.find_one({"session_id": session_id})
+        if not meta:
+            return None
+
+        df = load_persisted_dataframe(session_id, meta)
+        if df is None:
+            return None
+
+        logger.info(f"💧 Session {session_id} rehydrated from GridFS")
+        self.rehydrations += 1
+        version = meta.get("dataset_version", 0)
+        self.put(session_id, df, meta.get("parsed_schema", []), version)
+        return {"df": df, "parsed_schema": meta.get("parsed_schema", []), "version": version}
+
+    def pop(self, session_id: str):
+        self.backend.pop(session_id)
+
+    def stats(self) -> dict:
+        return {**self.backend.stats(), "rehydrations": self.rehydrations}
+
+
+def _make_backend(name: str) -> SessionBackend:
+    if name == "memory":
+        return InMemorySessionBackend(SESSION_STORE_MAX_ENTRIES, SESSION_STORE_MAX_BYTES, SESSION_TTL_SECONDS)
+    raise ValueError(f"Unknown session store backend: {name}")
+
+
+session_store = SessionStore(_make_backend(SESSION_STORE_BACKEND))
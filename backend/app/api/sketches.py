@@ -0,0 +1,114 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Two-sided 95% normal quantile used for the reported error bounds
+Z_95 = 1.959964
+
+
+class ReservoirSample:
+    """
+    Uniform sample without replacement over a stream of DataFrame chunks.
+
+    Every row gets a random key and the rows with the smallest keys are kept
+    (bottom-k sampling), which is equivalent to classic reservoir sampling
+    but vectorizes per chunk.
+    """
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = size
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._frame = None
+        self._keys = np.empty(0)
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows_seen += len(chunk)
+        keys = self._rng.random(len(chunk))
+        if self._frame is None:
+            frame, all_keys = chunk.reset_index(drop=True), keys
+        else:
+            frame = pd.concat([self._frame, chunk], ignore_index=True)
+            all_keys = np.concatenate([self._keys, keys])
+
+        if len(frame) > self.size:
+            keep = np.argpartition(all_keys, self.size - 1)[:self.size]
+            keep.sort()
+            frame, all_keys = frame.iloc[keep].reset_index(drop=True), all_keys[keep]
+
+        self._frame, self._keys = frame, all_keys
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._frame if self._frame is not None else pd.DataFrame()
+
+
+class MisraGries:
+    """
+    Heavy-hitter summary with k counters. Each reported count undercounts the
+    true frequency by at most rows_seen / (k + 1).
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.rows_seen = 0
+        self.counters = {}
+
+    def update_counts(self, counts: pd.Series):
+        """Merge a chunk's value_counts(dropna=False) into the summary."""
+        self.rows_seen += int(counts.sum())
+        for value, count in counts.items():
+            key = "__nan__" if pd.isna(value) else value
+            self.counters[key] = self.counters.get(key, 0) + int(count)
+
+        if len(self.counters) > self.k:
+            # Subtract the (k+1)-th largest count from everything and drop non-positive counters
+            cut = sorted(self.counters.values(), reverse=True)[self.k]
+            self.counters = {v: c - cut for v, c in self.counters.items() if c > cut}
+
+    def top(self):
+        if not self.counters:
+            return None, 0
+        value = max(self.counters, key=self.counters.get)
+        return value, self.counters[value]
+
+    @property
+    def error_bound(self) -> float:
+        """Maximum undercount of any frequency, as a share of rows seen."""
+        return 1.0 / (self.k + 1)
+
+
+def quantile_rank_error(sample_size: int, confidence: float = 0.95) -> float:
+    """DKW bound on the rank error of quantiles estimated from a uniform sample."""
+    if sample_size <= 0:
+        return 1.0
+    return math.sqrt(math.log(2 / (1 - confidence)) / (2 * sample_size))
+
+
+def proportion_interval(p: float, sample_size: int, population: int):
+    """Normal-approximation 95% interval for a sampled proportion, with finite population correction."""
+    if sample_size <= 0:
+        return 0.0, 1.0
+    fpc = math.sqrt((population - sample_size) / (population - 1)) if population > 1 else 0.0
+    half = Z_95 * math.sqrt(p * (1 - p) / sample_size) * fpc
+    return max(0.0, p - half), min(1.0, p + half)
+
+
+def skewness_half_width(sample_size: int) -> Optional[float]:
+    """Approximate 95% half-width of sample skewness (normal-theory SE); None for 3 or fewer values."""
+    if sample_size <= 3:
+        return None
+    n = sample_size
+    se = math.sqrt(6 * n * (n - 1) / ((n - 2) * (n + 1) * (n + 3)))
+    return Z_95 * se
+
+
+def correlation_interval(r: float, sample_size: int):
+    """Fisher z 95% interval for a sampled Pearson correlation."""
+    if sample_size <= 3 or not np.isfinite(r):
+        return -1.0, 1.0
+    z = math.atanh(max(min(r, 0.999999), -0.999999))
+    half = Z_95 / math.sqrt(sample_size - 3)
+    return math.tanh(z - half), math.tanh(z + half)
@@ -0,0 +1,400 @@
+from typing import Dict, Optional
+from datetime import datetime
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.api.compaction import datetime_columns, date_transformer
+from app.api.compiled_model import compile_verified, MODEL_EXPORT_COMPILED
+from app.api.dataset_store import load_dataframe, iter_dataframe_chunks, dataset_fingerprint
+from app.api.metrics import span, record_rows
+from app.api.model_cache import model_cache
+from app.api.model_selection import select_model, TRAIN_SEARCH_TIME_BUDGET_SECONDS
+from app.api.retraining import (
+    reusable_result, plan_warm_start, segmented_split, warm_start_forest, training_record,
+    WarmStartUnavailable,
+)
+from app.api.training_modes import (
+    choose_training_mode, load_compact_frame, build_hist_pipeline, fit_incremental,
+    continue_incremental, track_resources, TRAIN_CHUNK_ROWS,
+)
+from app.db.artifacts import ArtifactWriter, MODEL_COMPRESSION
+from app.db.mongo import dataset_collection, fs
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
+from sklearn.impute import SimpleImputer
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, mean_squared_error, r2_score
+
+from logger import logger
+
+# Model fitting behind /train and the training job workers. Kept apart from
+# the router so the app starts without importing sklearn; app.api.train
+# loads it on the first training request (or the startup preload does).
+
+
+def _noop_progress(stage: str, progress: float):
+    pass
+
+
+def build_preprocessor(X: pd.DataFrame) -> ColumnTransformer:
+    # Column types
+    # Any width: uploaded frames are downcast (int8, float32, ...) at ingestion
+    numeric_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    date_cols = datetime_columns(X)
+    categorical_cols = [col for col in X.columns if col not in numeric_cols and col not in date_cols]
+
+    # Pipeline preprocessors
+    numeric_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="mean")),
+        ("scaler", StandardScaler())
+    ])
+    categorical_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("onehot", OneHotEncoder(handle_unknown="ignore"))
+    ])
+    return ColumnTransformer(transformers=[
+        ("num", numeric_transformer, numeric_cols),
+        ("date", date_transformer(), date_cols),
+        ("cat", categorical_transformer, categorical_cols)
+    ])
+
+
+def evaluate(is_classification: bool, y_test, y_pred) -> Dict[str, float]:
+    if is_classification:
+        return {
+            "accuracy": accuracy_score(y_test, y_pred),
+            "precision": precision_score(y_test, y_pred, average="weighted", zero_division=0),
+            "recall": recall_score(y_test, y_pred, average="weighted", zero_division=0),
+            "f1_score": f1_score(y_test, y_pred, average="weighted", zero_division=0),
+        }
+    return {
+        "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "r2": r2_score(y_test, y_pred),
+    }
+
+
+def is_classification_target(y: pd.Series) -> bool:
+    # Text labels may arrive as object, str or (compacted at upload) category
+    return not pd.api.types.is_numeric_dtype(y) or y.nunique() < 20
+
+
+def find_target_column(columns) -> Optional[str]:
+    # Auto-detect target
+    possible_targets = ["target", "label"]
+    return next((col for col in columns if col.strip().lower() in possible_targets), None)
+
+
+def _fit_in_memory(session_id: str, meta: dict, mode: str, options: dict, progress):
+    with span("train.load"):
+        if mode == "hist":
+            # Downcast chunk by chunk so the float64 frame is never materialized
+            df = load_compact_frame(iter_dataframe_chunks(session_id, meta, TRAIN_CHUNK_ROWS))
+        else:
+            # Canonical parsed frame: in-memory upload or the columnar copy in GridFS
+            df = load_dataframe(session_id, meta)
+    if df is None or df.empty:
+        raise HTTPException(status_code=404, detail="CSV file not found")
+    record_rows("train", len(df))
+
+    progress("preprocessing", 0.25)
+    target_col = find_target_column(df.columns)
+    if not target_col:
+        raise HTTPException(status_code=400, detail="Target column not found")
+
+    X = df.drop(columns=[target_col])
+    y = df[target_col]
+
+    # Auto-detect task
+    is_classification = is_classification_target(y)
+    label_encoder = None
+    if is_classification:
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform(y)
+
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    segments = [len(df)]
+
+    selection_report = None
+    if options.get("model_selection"):
+        # Bounded search; the winner is refit on the whole training split
+        def search_progress(stage: str, fraction: float):
+            progress(stage, 0.35 + 0.5 * fraction)
+
+        with span("train.model_selection"):
+            pipeline, selection_report = select_model(
+                build_preprocessor(X), X_train, y_train, is_classification,
+                time_budget=options.get("time_budget_seconds") or TRAIN_SEARCH_TIME_BUDGET_SECONDS,
+                progress=search_progress,
+            )
+    else:
+        if mode == "hist":
+            pipeline = build_hist_pipeline(X, is_classification)
+        else:
+            # Model selection
+            if is_classification:
+                model = RandomForestClassifier(random_state=42)
+            else:
+                model = RandomForestRegressor(random_state=42)
+
+            # Full pipeline
+            pipeline = Pipeline(steps=[
+                ("preprocessor", build_preprocessor(X)),
+                ("model", model)
+            ])
+
+        progress("fitting", 0.35)
+        with span(f"train.fit_{mode}"):
+            pipeline.fit(X_train, y_train)
+
+    return pipeline, label_encoder, target_col, is_classification, X_test, y_test, selection_report, segments
+
+
+def _fit_incremental(session_id: str, meta: dict, progress):
+    columns = [col["column"] for col in meta.get("parsed_schema", [])]
+    target_col = find_target_column(columns)
+    if not target_col:
+        raise HTTPException(status_code=400, detail="Target column not found")
+
+    def iter_chunks():
+        return iter_dataframe_chunks(session_id, meta, TRAIN_CHUNK_ROWS)
+
+    progress("preprocessing", 0.25)
+    with span("train.fit_incremental"):
+        pipeline, label_encoder, is_classification, X_test, y_test = fit_incremental(iter_chunks, target_col, progress)
+    return pipeline, label_encoder, target_col, is_classification, X_test, y_test, None, [meta.get("num_rows", 0)]
+
+
+def _warm_start_in_memory(session_id: str, meta: dict, plan: dict, progress):
+    with span("train.load"):
+        df = load_dataframe(session_id, meta)
+    if df is None or df.empty:
+        raise HTTPException(status_code=404, detail="CSV file not found")
+    record_rows("train", len(df))
+
+    progress("preprocessing", 0.25)
+    artifacts = plan["artifacts"]
+    target_col, label_encoder = artifacts["target_col"], artifacts["label_encoder"]
+    X = df.drop(columns=[target_col])
+    y = df[target_col]
+
+    # The forest's outputs are fixed: same task, no target classes it hasn't seen
+    is_classification = is_classification_target(y)
+    if is_classification != (label_encoder is not None):
+        raise WarmStartUnavailable("task type changed")
+    if is_classification:
+        if not y.isin(label_encoder.classes_).all():
+            raise WarmStartUnavailable("new target classes")
+        y = label_encoder.transform(y)
+
+    segments = plan["record"]["segments"] + [len(df) - sum(plan["record"]["segments"])]
+    X_train, X_test, y_train, y_test = segmented_split(X, y, segments)
+    if is_classification and len(np.unique(y_train)) != len(label_encoder.classes_):
+        raise WarmStartUnavailable("a target class is missing from the training split")
+
+    progress("fitting", 0.35)
+    with span("train.fit_warm_start"):
+        pipeline = warm_start_forest(artifacts["pipeline"], X_train, y_train, plan["added_estimators"])
+    return pipeline, label_encoder, target_col, is_classification, X_test, y_test, None, segments
+
+
+def _warm_start_incremental(session_id: str, meta: dict, plan: dict, progress):
+    artifacts = plan["artifacts"]
+    target_col, label_encoder = artifacts["target_col"], artifacts["label_encoder"]
+    # Only the parts appended since the previous training (part 0 is the upload)
+    chunks = iter_dataframe_chunks(session_id, meta, TRAIN_CHUNK_ROWS, first_part=plan["record"]["parts"] + 1)
+    record_rows("train", plan["new_rows"])
+
+    progress("fitting", 0.35)
+    with span("train.fit_warm_start"):
+        try:
+            pipeline, X_test, y_test = continue_incremental(
+                artifacts["pipeline"], label_encoder, chunks, target_col, progress, plan["new_rows"]
+            )
+        except ValueError as e:
+            raise WarmStartUnavailable(f"new rows don't fit the previous model: {e}")
+    segments = plan["record"]["segments"] + [plan["new_rows"]]
+    return pipeline, label_encoder, target_col, label_encoder is not None, X_test, y_test, None, segments
+
+
+def _export_compiled(session_id: str, pipeline_artifacts: dict, X_test):
+    start = time.perf_counter()
+    compiled, verified = compile_verified(pipeline_artifacts, X_test)
+    if compiled is None:
+        logger.info(f"ℹ️ No compiled export for session {session_id}: {verified}")
+        return None, None
+
+    writer = ArtifactWriter("model.compiled.npz", MODEL_COMPRESSION, session_id=session_id)
+    try:
+        writer.write(compiled.to_bytes())
+        artifact = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    artifact["export_seconds"] = round(time.perf_counter() - start, 4)
+    artifact["verified_rows"] = verified
+    logger.info(
+        f"🧩 Compiled model saved to GridFS: {writer._id} — {artifact['raw_length']} bytes, "
+        f"checked on {verified} rows, exported in {artifact['export_seconds']}s"
+    )
+    return writer._id, artifact
+
+
+def run_training(session_id: str, progress=_noop_progress, options: Optional[dict] = None) -> dict:
+    """
+    Train and persist a model for a session. Shared by the synchronous /train
+    endpoint and the background job workers; progress(stage, fraction) is
+    called between stages. `options` are the TrainRequest fields other than
+    the session id.
+
+    With `retrain`, an unchanged dataset (same fingerprint and options)
+    returns the stored model and metrics without fitting, and a dataset
+    that has only grown continues the previous model: more trees for a
+    forest, partial_fit on the new rows for the incremental path. Anything
+    else falls back to a full fit; the response says which happened.
+    """
+    options = options or {}
+    retrain = options.get("retrain", False)
+    fit_options = {k: v for k, v in options.items() if k != "retrain"}
+
+    # Load file
+    progress("loading", 0.05)
+    meta = dataset_collection.find_one({"session_id": session_id})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Session not found")
+    fingerprint = dataset_fingerprint(session_id, meta)
+
+    if retrain:
+        reused = reusable_result(meta, fingerprint, fit_options)
+        if reused is not None:
+            logger.info(f"♻️ Dataset unchanged since the last training; reusing model {reused['model_file_id']}")
+            progress("done", 1.0)
+            return reused
+
+    # Model selection searches the standard in-memory path
+    mode = "standard" if options.get("model_selection") else choose_training_mode(meta, options.get("mode", "auto"))
+
+    plan, retrain_report = None, None
+    if retrain:
+        plan, reason = plan_warm_start(session_id, meta, mode, fit_options)
+
+    with track_resources(mode) as training_profile:
+        fitted = None
+        if plan is not None:
+            warm_start = _warm_start_incremental if mode == "incremental" else _warm_start_in_memory
+            try:
+                fitted = warm_start(session_id, meta, plan, progress)
+                retrain_report = {
+                    "strategy": "warm_start",
+                    "base_model_file_id": str(plan["base_model_file_id"]),
+                    "new_rows": plan["new_rows"],
+                }
+                if mode == "standard":
+                    retrain_report["added_estimators"] = plan["added_estimators"]
+            except WarmStartUnavailable as e:
+                reason = str(e)
+        if fitted is None:
+            if retrain:
+                logger.info(f"🔁 Retraining session {session_id} from scratch: {reason}")
+                retrain_report = {"strategy": "full", "reason": reason}
+            if mode == "incremental":
+                fitted = _fit_incremental(session_id, meta, progress)
+            else:
+                fitted = _fit_in_memory(session_id, meta, mode, options, progress)
+        pipeline, label_encoder, target_col, is_classification, X_test, y_test, selection_report, segments = fitted
+        model_type = "classification" if is_classification else "regression"
+
+        # Evaluation
+        progress("evaluating", 0.8)
+        with span("train.evaluate"):
+            y_pred = pipeline.predict(X_test)
+            metrics = evaluate(is_classification, y_test, y_pred)
+
+    # Get feature importances (after preprocessing)
+    model_fitted = pipeline.named_steps["model"]
+    try:
+        importances = model_fitted.feature_importances_
+        feature_names = pipeline.named_steps["preprocessor"].get_feature_names_out()
+        top_indices = importances.argsort()[::-1][:10]
+        top_feature_importances = {
+            feature_names[i]: round(float(importances[i]), 5)
+            for i in top_indices
+        }
+    except AttributeError:
+        top_feature_importances = {}
+
+    # Save full pipeline, compressed straight into GridFS
+    progress("saving", 0.9)
+    writer = ArtifactWriter("model.joblib", MODEL_COMPRESSION, session_id=session_id)
+    try:
+        with span("train.save"):
+            joblib.dump({
+                "pipeline": pipeline,
+                "label_encoder": label_encoder,
+                "target_col": target_col
+            }, writer)
+            model_artifact = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    model_file_id = writer._id
+    logger.info(
+        f"💾 Model saved to GridFS: {model_file_id} — {model_artifact['raw_length']} bytes, "
+        f"{model_artifact['length']} stored ({model_artifact['compression']}) in {model_artifact['write_seconds']}s"
+    )
+
+    # Until the session points at them the new files are unused: a
+    # cancellation (raised by progress) up to here deletes them
+    compiled_file_id, compiled_artifact = None, None
+    try:
+        # Array-based copy for /predict, when the model is a supported forest
+        if MODEL_EXPORT_COMPILED:
+            progress("exporting", 0.95)
+            with span("train.export"):
+                compiled_file_id, compiled_artifact = _export_compiled(session_id, {
+                    "pipeline": pipeline, "label_encoder": label_encoder, "target_col": target_col
+                }, X_test)
+        progress("committing", 0.98)
+    except BaseException:
+        for file_id in (model_file_id, compiled_file_id):
+            if file_id is not None:
+                fs.delete(file_id)
+        raise
+
+    # Update DB; the model is live from here on, so progress isn't reported
+    # (and can't cancel) anymore
+    dataset_collection.update_one(
+        {"session_id": session_id},
+        {"$set": {
+            "model_file_id": model_file_id,
+            "model_artifact": model_artifact,
+            "compiled_model_file_id": compiled_file_id,
+            "compiled_model": compiled_artifact,
+            "metrics": metrics,
+            "model_type": model_type,
+            "model_selection": selection_report,
+            "training_profile": training_profile,
+            # Pairs, since feature names may contain dots
+            "feature_importances": list(top_feature_importances.items()),
+            "trained_dataset": training_record(meta, fingerprint, mode, fit_options, segments),
+            "trained_at": datetime.utcnow()
+        }}
+    )
+
+    # Drop the previous model version from the prediction cache
+    model_cache.invalidate(session_id)
+
+    return {
+        "model_type": model_type,
+        "model_file_id": str(model_file_id),
+        "metrics": metrics,
+        "feature_importances": top_feature_importances,
+        "model_selection": selection_report,
+        "training_profile": training_profile,
+        "retrain": retrain_report
+    }
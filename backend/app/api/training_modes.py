@@ -0,0 +1,313 @@
+import multiprocessing
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, LabelEncoder, OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from app.api.compaction import datetime_columns, date_transformer
+from app.api.sketches import ReservoirSample
+
+from logger import logger
+
+# Size thresholds (from the row/column counts recorded at upload) for the large-data modes
+TRAIN_HIST_ROW_THRESHOLD = int(os.getenv("TRAIN_HIST_ROW_THRESHOLD", "1000000"))
+TRAIN_HIST_CELL_THRESHOLD = int(os.getenv("TRAIN_HIST_CELL_THRESHOLD", "50000000"))
+TRAIN_INCREMENTAL_ROW_THRESHOLD = int(os.getenv("TRAIN_INCREMENTAL_ROW_THRESHOLD", "10000000"))
+
+# Out-of-core settings
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", "200000"))
+TRAIN_INCREMENTAL_SAMPLE_ROWS = int(os.getenv("TRAIN_INCREMENTAL_SAMPLE_ROWS", "100000"))
+TRAIN_INCREMENTAL_MAX_TEST_ROWS = int(os.getenv("TRAIN_INCREMENTAL_MAX_TEST_ROWS", "200000"))
+TRAIN_INCREMENTAL_MAX_CATEGORIES = int(os.getenv("TRAIN_INCREMENTAL_MAX_CATEGORIES", "50"))
+
+# HistGradientBoosting bins categories like numbers: at most 255 per feature
+HIST_MAX_CATEGORIES = 255
+
+TRAINING_MODES = ("standard", "hist", "incremental")
+
+
+def choose_training_mode(meta: dict, requested: str = "auto") -> str:
+    """Pick the training path from the dataset size unless one was requested."""
+    if requested in TRAINING_MODES:
+        return requested
+
+    num_rows = meta.get("num_rows", 0)
+    num_cells = num_rows * meta.get("num_columns", 0)
+    if num_rows > TRAIN_INCREMENTAL_ROW_THRESHOLD:
+        return "incremental"
+    if num_rows > TRAIN_HIST_ROW_THRESHOLD or num_cells > TRAIN_HIST_CELL_THRESHOLD:
+        return "hist"
+    return "standard"
+
+
+def downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Smallest integer type per integer column, float32 for floats."""
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            out[col] = series
+        elif pd.api.types.is_integer_dtype(series):
+            out[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            out[col] = pd.to_numeric(series, downcast="float")
+        else:
+            out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+def categorize_strings(df: pd.DataFrame, max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    # Repeated strings become integer codes plus one copy of each value
+    for col in df.columns:
+        series = df[col]
+        if (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)) \
+                and series.nunique() <= max_unique_ratio * max(len(series), 1):
+            df[col] = series.astype("category")
+    return df
+
+
+def load_compact_frame(chunks) -> pd.DataFrame:
+    """
+    Build the training frame from chunks, downcasting each one before they
+    are concatenated so the full-width float64 frame never exists.
+    """
+    frames = [downcast_numeric(chunk) for chunk in chunks]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    return categorize_strings(df)
+
+
+def build_hist_pipeline(X: pd.DataFrame, is_classification: bool) -> Pipeline:
+    """
+    HistGradientBoosting with native categorical splits: categories are
+    ordinal-encoded (no one-hot expansion) and missing values are left for
+    the model to route.
+    """
+    numeric_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    date_cols = datetime_columns(X)
+    categorical_cols = [col for col in X.columns if col not in numeric_cols and col not in date_cols]
+
+    preprocessor = ColumnTransformer(transformers=[
+        ("num", FunctionTransformer(feature_names_out="one-to-one"), numeric_cols),
+        ("date", date_transformer(scale=False), date_cols),
+        ("cat", OrdinalEncoder(
+            handle_unknown="use_encoded_value", unknown_value=np.nan,
+            encoded_missing_value=np.nan, max_categories=HIST_MAX_CATEGORIES,
+        ), categorical_cols),
+    ], sparse_threshold=0)
+
+    n_dense = len(numeric_cols) + len(date_cols)
+    categorical_features = list(range(n_dense, n_dense + len(categorical_cols))) or None
+    model_class = HistGradientBoostingClassifier if is_classification else HistGradientBoostingRegressor
+    return Pipeline(steps=[
+        ("preprocessor", preprocessor),
+        ("model", model_class(categorical_features=categorical_features, random_state=42)),
+    ])
+
+
+def _incremental_preprocessor(X: pd.DataFrame) -> ColumnTransformer:
+    numeric_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    date_cols = datetime_columns(X)
+    categorical_cols = [col for col in X.columns if col not in numeric_cols and col not in date_cols]
+    return ColumnTransformer(transformers=[
+        ("num", Pipeline([("imputer", SimpleImputer(strategy="mean")), ("scaler", StandardScaler())]), numeric_cols),
+        ("date", date_transformer(), date_cols),
+        ("cat", Pipeline([
+            ("imputer", SimpleImputer(strategy="most_frequent")),
+            ("onehot", OneHotEncoder(handle_unknown="infrequent_if_exist",
+                                     max_categories=TRAIN_INCREMENTAL_MAX_CATEGORIES)),
+        ]), categorical_cols),
+    ])
+
+
+def fit_incremental(iter_chunks, target_col: str, progress=None):
+    """
+    Out-of-core training with an SGD linear model over chunked reads.
+
+    Pass 1 draws a uniform sample (to fit imputers, scaling and category
+    sets) and collects the target's classes. Pass 2 transforms chunk by
+    chunk and calls partial_fit, holding out ~20% of each chunk (capped)
+    for evaluation. Returns (pipeline, label_encoder, is_classification,
+    X_test, y_test). `iter_chunks()` must return a fresh chunk iterator.
+    """
+    sample = ReservoirSample(TRAIN_INCREMENTAL_SAMPLE_ROWS, seed=42)
+    target_values, target_is_text = set(), False
+    for chunk in iter_chunks():
+        sample.update(chunk)
+        target = chunk[target_col].dropna()
+        target_is_text = target_is_text or not pd.api.types.is_numeric_dtype(target)
+        if target_is_text or len(target_values) < 20:
+            target_values.update(target.unique().tolist())
+
+    is_classification = target_is_text or len(target_values) < 20
+    sample_X = sample.frame.drop(columns=[target_col])
+    preprocessor = _incremental_preprocessor(sample_X).fit(sample_X)
+
+    label_encoder = None
+    if is_classification:
+        label_encoder = LabelEncoder().fit(sorted(target_values, key=str))
+        model = SGDClassifier(loss="log_loss", random_state=42)
+    else:
+        model = SGDRegressor(random_state=42)
+
+    rows_seen, test = _partial_fit_chunks(
+        iter_chunks(), preprocessor, model, target_col, label_encoder, progress, sample.rows_seen
+    )
+    logger.info(f"🧮 Incremental model trained on {rows_seen - len(test)} rows in chunks")
+
+    test = test if not test.empty else sample.frame
+    y_test = test[target_col]
+    if is_classification:
+        y_test = label_encoder.transform(y_test)
+
+    pipeline = Pipeline(steps=[("preprocessor", preprocessor), ("model", model)])
+    return pipeline, label_encoder, is_classification, test.drop(columns=[target_col]), y_test
+
+
+def continue_incremental(pipeline, label_encoder, chunks, target_col: str, progress=None, total_rows: int = 0):
+    """
+    Keep training a fitted incremental pipeline on new rows only: the
+    preprocessor fitted on the original sample is reused and the model
+    continues with partial_fit. Returns (pipeline, X_test, y_test) where the
+    test rows are held out of the new rows. Raises ValueError when the new
+    rows bring target classes the model doesn't know.
+    """
+    preprocessor, model = pipeline.named_steps["preprocessor"], pipeline.named_steps["model"]
+    rows_seen, test = _partial_fit_chunks(
+        chunks, preprocessor, model, target_col, label_encoder, progress, total_rows
+    )
+    logger.info(f"🧮 Incremental model continued on {rows_seen - len(test)} new rows")
+    if test.empty:
+        raise ValueError("Not enough new rows to evaluate on")
+
+    y_test = test[target_col]
+    if label_encoder is not None:
+        y_test = label_encoder.transform(y_test)
+    return pipeline, test.drop(columns=[target_col]), y_test
+
+
+def _partial_fit_chunks(chunks, preprocessor, model, target_col: str, label_encoder, progress, total_rows: int):
+    """
+    partial_fit over chunks, holding out ~20% of each chunk (capped) for
+    evaluation. Returns (rows seen, held-out frame).
+    """
+    classes = np.arange(len(label_encoder.classes_)) if label_encoder is not None else None
+    rng = np.random.default_rng(42)
+    test_parts, test_rows, rows_seen = [], 0, 0
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[target_col])
+        held_out = rng.random(len(chunk)) < 0.2
+        if test_rows >= TRAIN_INCREMENTAL_MAX_TEST_ROWS:
+            held_out[:] = False
+        if held_out.any():
+            test_parts.append(chunk[held_out])
+            test_rows += int(held_out.sum())
+
+        train_chunk = chunk[~held_out]
+        if train_chunk.empty:
+            continue
+        Xt = preprocessor.transform(train_chunk.drop(columns=[target_col]))
+        y = train_chunk[target_col]
+        if label_encoder is not None:
+            model.partial_fit(Xt, label_encoder.transform(y), classes=classes)
+        else:
+            model.partial_fit(Xt, y.to_numpy(dtype=np.float64))
+
+        rows_seen += len(chunk)
+        if progress and total_rows:
+            progress("fitting", 0.35 + 0.4 * min(rows_seen / total_rows, 1.0))
+
+    test = pd.concat(test_parts, ignore_index=True) if test_parts else pd.DataFrame()
+    return rows_seen, test
+
+
+# Trace Python/NumPy allocations during training. Slows every allocation in
+# the process, concurrent requests included: for benchmarks and debugging
+TRAIN_TRACE_MEMORY = os.getenv("TRAIN_TRACE_MEMORY", "0") == "1"
+
+# tracemalloc is process-wide; keep it on while any training run is measuring
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def _in_job_worker() -> bool:
+    # Training job workers are spawned children that run one job at a time
+    return multiprocessing.parent_process() is not None
+
+
+def _reset_peak_rss() -> bool:
+    """Restart the kernel's RSS high-water mark (Linux); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def track_resources(mode: str, trace_memory: bool = TRAIN_TRACE_MEMORY):
+    """
+    Measure wall time and peak RSS of a training run. In a job worker the
+    RSS high-water mark is reset first, so it covers this run alone
+    (peak_rss_scope "run"); in the API process it is the process's lifetime
+    peak ("process"), since other requests share it.
+
+    With trace_memory, the peak Python/NumPy heap is also traced
+    (peak_memory_bytes). Overlapping traced runs share tracemalloc's counter,
+    so a later one reports the peak since the earliest one started.
+    """
+    global _tracing_users, _tracing_started
+    if trace_memory:
+        with _tracing_lock:
+            if _tracing_users == 0:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracing_started = True
+                # Only the first run resets the peak, so it can't wipe out
+                # the peak of a run already being measured
+                tracemalloc.reset_peak()
+            _tracing_users += 1
+
+    report = {"mode": mode, "peak_rss_scope": "run" if _in_job_worker() and _reset_peak_rss() else "process"}
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report["wall_seconds"] = round(time.perf_counter() - start, 3)
+        report["peak_rss_bytes"] = _peak_rss_bytes()
+        if trace_memory:
+            with _tracing_lock:
+                report["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                _tracing_users -= 1
+                if _tracing_users == 0 and _tracing_started:
+                    tracemalloc.stop()
+                    _tracing_started = False
+        logger.info(
+            f"⏱️ Training ({mode}) took {report['wall_seconds']}s, "
+            f"peak RSS {report['peak_rss_bytes'] / 1e6:.1f} MB ({report['peak_rss_scope']})"
+        )
@@ -1,28 +1,142 @@
-from fastapi import APIRouter, UploadFile
+from fastapi import APIRouter, UploadFile, Query
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
+import hashlib
 import uuid
 
-from app.db.mongo import dataset_collection, fs  # ✅ import GridFS handler
+from app.api.compaction import compact_frame, StreamingCompactor, UPLOAD_COMPACT
+from app.api.dataset_store import ColumnarWriter, record_profile_aggregates, save_columnar_copy
+from app.api.metrics import span, record_payload, record_rows
+from app.api.ingest import (
+    infer_column_type, ingest_csv_stream, SchemaAccumulator,
+    UPLOAD_PARSE_CHUNK_ROWS, UPLOAD_STREAMING_THRESHOLD_BYTES,
+)
+from app.api.profile import new_profile_aggregates
+from app.api.session_store import session_store
+from app.db.artifacts import ArtifactWriter, compress_bytes, open_artifact, DATASET_COMPRESSION, GRIDFS_CHUNK_SIZE_BYTES
+from app.db.mongo import fs
+from app.db.mongo_async import async_dataset_collection, write_gridfs_file
 from logger import logger
 from exception import DAException
 
 router = APIRouter()
 
-# In-memory session storage
-session_data = {}
+
+def infer_schema(df: pd.DataFrame, compaction: dict = None) -> list:
+    parsed_schema = []
+    for col in df.columns:
+        series = df[col]
+        col_type = infer_column_type(series)
+        unique_vals = series.nunique()
+        null_pct = series.isnull().mean() * 100
+        sample_vals = series.dropna().unique()[:3].tolist()
+
+        parsed_schema.append({
+            "column": col,
+            "dtype": col_type,
+            "unique_values": int(unique_vals),
+            "null_percentage": round(null_pct, 2),
+            "high_cardinality": unique_vals > 50,
+            "constant": unique_vals == 1,
+            "sample_values": [str(val) for val in sample_vals]
+        })
+        if compaction:
+            parsed_schema[-1].update(compaction["columns"][col])
+    return parsed_schema
+
+
+def _save_profile_aggregates(session_id: str, df: pd.DataFrame):
+    aggregates = new_profile_aggregates()
+    aggregates.update(df)
+    record_profile_aggregates(session_id, {}, aggregates)
+
+
+def _memory_profile(compaction: dict = None):
+    # Frame-level summary; per-column figures live in parsed_schema
+    if not compaction:
+        return None
+    return {k: compaction[k] for k in ("bytes_before", "bytes_after", "seconds")}
+
+
+def _ingest_streaming(file: UploadFile, session_id: str):
+    """
+    Copy the upload into GridFS block by block (compressed on the way) while
+    parsing it in row chunks, settling each column's compacted type. Nothing
+    is kept in memory afterwards; the session is rehydrated from GridFS on first use.
+    """
+    writer = ArtifactWriter(file.filename, DATASET_COMPRESSION, session_id=session_id)
+    try:
+        file.file.seek(0)
+        with span("upload.streaming_ingest"):
+            compactor, tee = ingest_csv_stream(
+                file.file, writer, UPLOAD_PARSE_CHUNK_ROWS, StreamingCompactor(UPLOAD_COMPACT)
+            )
+            stored = writer.close()
+    except Exception as e:
+        writer.abort()
+        logger.exception("❌ Failed to stream CSV")
+        raise DAException(f"Failed to read CSV: {str(e)}", status_code=400)
+
+    logger.info(
+        f"🗂️ CSV streamed to GridFS: {writer._id} — {tee.bytes_read} bytes "
+        f"({stored['length']} stored, {stored['compression']}), {compactor.num_rows} rows"
+    )
+    record_payload("upload", tee.bytes_read)
+    record_rows("upload", compactor.num_rows)
+    return writer._id, compactor, tee.sha256.hexdigest()
+
+
+def _read_streamed(session_id: str, csv_file_id, compactor: StreamingCompactor):
+    """
+    Second pass over the stored CSV, one compacted chunk at a time: builds
+    the schema, the columnar copy and the profile aggregates an in-memory
+    upload gets from its frame. Returns (parsed_schema, compaction,
+    parquet_file_id, aggregates).
+    """
+    accumulator = SchemaAccumulator()
+    aggregates = new_profile_aggregates()
+    columnar = ColumnarWriter(session_id)
+    with span("upload.streaming_compact"):
+        for chunk in compactor.read_csv(open_artifact(csv_file_id), UPLOAD_PARSE_CHUNK_ROWS):
+            accumulator.update(chunk)
+            aggregates.update(chunk)
+            if columnar is None:
+                continue
+            try:
+                columnar.write(chunk)
+            except Exception:
+                logger.warning(f"⚠️ Could not build columnar copy for session {session_id}; CSV will be used")
+                columnar.abort()
+                columnar = None
+        parquet_file_id = columnar.close() if columnar is not None else None
+
+    compaction = compactor.report()
+    parsed_schema = accumulator.parsed_schema()
+    if compaction:
+        for column in parsed_schema:
+            column.update(compaction["columns"][column["column"]])
+    return parsed_schema, compaction, parquet_file_id, aggregates
+
 
 @router.post("/upload")
-async def upload_csv(file: UploadFile):
+async def upload_csv(file: UploadFile, stream: bool = Query(False)):
     logger.info(f"📤 Uploading file: {file.filename}")
 
     if not file.filename.endswith(".csv"):
         logger.warning(f"❌ Invalid file format: {file.filename}")
         raise DAException("Only CSV files are allowed.", status_code=400)
 
+    # Large uploads (or explicit ?stream=true) use chunked ingestion with bounded memory
+    if stream or (file.size or 0) > UPLOAD_STREAMING_THRESHOLD_BYTES:
+        return await upload_csv_streaming(file)
+
     contents = await file.read()
+    record_payload("upload", len(contents))
 
     try:
-        df = pd.read_csv(pd.io.common.BytesIO(contents))
+        with span("upload.read_csv"):
+            df = await run_in_threadpool(pd.read_csv, pd.io.common.BytesIO(contents))
+        record_rows("upload", len(df))
         logger.info(f"✅ CSV read successfully: {file.filename} — Shape: {df.shape}")
     except Exception as e:
         logger.exception("❌ Failed to read CSV")
@@ -31,60 +145,47 @@ async def upload_csv(file: UploadFile):
     session_id = str(uuid.uuid4())
     logger.info(f"🆔 New session created: {session_id}")
 
-    # Infer parsed schema
-    def infer_column_type(series: pd.Series):
-        if pd.api.types.is_numeric_dtype(series):
-            return "numerical"
-        elif pd.api.types.is_datetime64_any_dtype(series):
-            return "datetime"
-        elif pd.api.types.is_bool_dtype(series):
-            return "boolean"
-        else:
-            return "categorical"
+    # Compact dtypes (categories, narrow numbers, dates) before the frame is cached
+    compaction = None
+    if UPLOAD_COMPACT:
+        with span("upload.compact"):
+            df, compaction = await run_in_threadpool(compact_frame, df)
 
-    parsed_schema = []
-    for col in df.columns:
-        series = df[col]
-        col_type = infer_column_type(series)
-        unique_vals = series.nunique()
-        null_pct = series.isnull().mean() * 100
-        sample_vals = series.dropna().unique()[:3].tolist()
-
-        parsed_schema.append({
-            "column": col,
-            "dtype": col_type,
-            "unique_values": int(unique_vals),
-            "null_percentage": round(null_pct, 2),
-            "high_cardinality": unique_vals > 50,
-            "constant": unique_vals == 1,
-            "sample_values": [str(val) for val in sample_vals]
-        })
+    # Infer parsed schema
+    with span("upload.infer_schema"):
+        parsed_schema = await run_in_threadpool(infer_schema, df, compaction)
 
     # Save DataFrame and schema in memory
-    session_data[session_id] = {
-        "df": df,
-        "parsed_schema": parsed_schema
-    }
+    session_store.put(session_id, df, parsed_schema)
     logger.info(f"🧠 Session data stored in memory for: {session_id}")
 
-    # ✅ Store CSV file in GridFS
+    # ✅ Store CSV file in GridFS (compressed; readers decompress transparently)
     try:
-        csv_file_id = fs.put(contents, filename=file.filename, session_id=session_id)
-        logger.info(f"🗂️ CSV file saved to GridFS: {csv_file_id}")
+        with span("upload.compress"):
+            payload, metadata = await run_in_threadpool(compress_bytes, contents, DATASET_COMPRESSION)
+        with span("upload.gridfs_write"):
+            csv_file_id = await write_gridfs_file(
+                file.filename, payload, metadata,
+                chunk_size_bytes=GRIDFS_CHUNK_SIZE_BYTES,
+                session_id=session_id,
+            )
+        logger.info(f"🗂️ CSV file saved to GridFS: {csv_file_id} — {len(payload)} bytes stored ({metadata['compression']})")
     except Exception as e:
         logger.exception("❌ Failed to store CSV in GridFS")
         raise DAException("Failed to store CSV file.", status_code=500)
 
     # ✅ Save schema + file ID to MongoDB
     try:
-        dataset_collection.update_one(
+        await async_dataset_collection.update_one(
             {"session_id": session_id},
             {"$set": {
                 "session_id": session_id,
                 "parsed_schema": parsed_schema,
                 "num_rows": len(df),
                 "num_columns": len(df.columns),
-                "csv_file_id": csv_file_id  
+                "csv_file_id": csv_file_id,
+                "csv_sha256": hashlib.sha256(contents).hexdigest(),
+                "memory_profile": _memory_profile(compaction)
             }},
             upsert=True
         )
@@ -94,7 +195,79 @@ async def upload_csv(file: UploadFile):
         logger.exception("❌ Failed to save schema to MongoDB")
         raise DAException("Failed to save metadata to database.", status_code=500)
 
+    # ✅ Keep a columnar copy so /train and /profile never re-parse the CSV
+    try:
+        with span("upload.columnar_copy"):
+            await run_in_threadpool(save_columnar_copy, session_id, df)
+    except Exception:
+        logger.exception("⚠️ Failed to store columnar copy; CSV will be parsed on demand")
+
+    # ✅ Mergeable profile aggregates, so /upload/append never rescans these rows
+    try:
+        with span("upload.profile_aggregates"):
+            await run_in_threadpool(_save_profile_aggregates, session_id, df)
+    except Exception:
+        logger.exception("⚠️ Failed to store profile aggregates; the first /profile will build them")
+
     return {
         "session_id": session_id,
-        "parsed_schema": parsed_schema
+        "parsed_schema": parsed_schema,
+        "memory_profile": _memory_profile(compaction)
     }
+
+
+async def upload_csv_streaming(file: UploadFile):
+    session_id = str(uuid.uuid4())
+    logger.info(f"🆔 New session created (streaming): {session_id}")
+
+    # Parsing is CPU-bound, so the tee into GridFS runs on a worker thread with the sync client
+    csv_file_id, compactor, csv_sha256 = await run_in_threadpool(_ingest_streaming, file, session_id)
+
+    # Compact the stored copy chunk by chunk, as the in-memory path compacts its frame
+    try:
+        parsed_schema, compaction, parquet_file_id, aggregates = await run_in_threadpool(
+            _read_streamed, session_id, csv_file_id, compactor
+        )
+    except Exception as e:
+        await run_in_threadpool(fs.delete, csv_file_id)
+        logger.exception("❌ Failed to compact streamed CSV")
+        raise DAException(f"Failed to read CSV: {str(e)}", status_code=400)
+    if parquet_file_id is not None:
+        logger.info(f"🧱 Columnar copy saved to GridFS: {parquet_file_id}")
+
+    try:
+        await async_dataset_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {
+                "session_id": session_id,
+                "parsed_schema": parsed_schema,
+                "num_rows": compactor.num_rows,
+                "num_columns": len(parsed_schema),
+                "csv_file_id": csv_file_id,
+                "csv_sha256": csv_sha256,
+                "parquet_file_id": parquet_file_id,
+                "memory_profile": _memory_profile(compaction)
+            }},
+            upsert=True
+        )
+        logger.info(f"💾 Parsed schema saved to MongoDB for session: {session_id}")
+    except Exception as e:
+        logger.exception("❌ Failed to save schema to MongoDB")
+        raise DAException("Failed to save metadata to database.", status_code=500)
+
+    try:
+        with span("upload.profile_aggregates"):
+            await run_in_threadpool(record_profile_aggregates, session_id, {}, aggregates)
+    except Exception:
+        logger.exception("⚠️ Failed to store profile aggregates; the first /profile will build them")
+
+    return {
+        "session_id": session_id,
+        "parsed_schema": parsed_schema,
+        "memory_profile": _memory_profile(compaction)
+    }
+
+
+@router.get("/sessions/stats")
+def session_stats():
+    return session_store.stats()
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import io
+import os
+import time
+
+from app.db.mongo import fs
+
+from logger import logger
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional codec
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # optional codec
+    zstandard = None
+
+# Larger chunks mean fewer chunk documents (and round trips) per artifact
+GRIDFS_CHUNK_SIZE_BYTES = int(os.getenv("GRIDFS_CHUNK_SIZE_BYTES", str(1024 * 1024)))
+
+# "<codec>[:<level>]" with codec one of none, gzip, lz4, zstd
+MODEL_COMPRESSION = os.getenv("MODEL_COMPRESSION", "gzip:3")
+DATASET_COMPRESSION = os.getenv("DATASET_COMPRESSION", "gzip:1")
+
+_DEFAULT_LEVELS = {"none": 0, "gzip": 3, "lz4": 0, "zstd": 3}
+_AVAILABLE = {
+    "none": True,
+    "gzip": True,
+    "lz4": lz4_frame is not None,
+    "zstd": zstandard is not None,
+}
+
+
+def parse_compression(spec: str):
+    """
+    Turn a "<codec>[:<level>]" setting into (codec, level). Codecs whose
+    package isn't installed fall back to gzip so a missing extra never
+    breaks uploads or training.
+    """
+    codec, _, level = (spec or "none").strip().lower().partition(":")
+    if codec not in _DEFAULT_LEVELS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    if not _AVAILABLE[codec]:
+        logger.warning(f"⚠️ Compression codec '{codec}' is not installed, using gzip")
+        codec, level = "gzip", ""
+    return codec, int(level) if level else _DEFAULT_LEVELS[codec]
+
+
+def _compressing_stream(sink, codec: str, level: int):
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=level, mtime=0)
+    if codec == "lz4":
+        return lz4_frame.LZ4FrameFile(sink, mode="wb", compression_level=level)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).stream_writer(sink, closefd=False)
+    return None
+
+
+def decompressing_reader(source, codec: str):
+    """Wrap a readable stored file so callers see the original bytes."""
+    if not codec or codec == "none":
+        return source
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=source, mode="rb")
+    if codec == "lz4":
+        return lz4_frame.LZ4FrameFile(source, mode="rb")
+    if codec == "zstd":
+        # Buffered so readers can peek (joblib sniffs the first bytes)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(source, closefd=False))
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def compression_of(grid_out) -> str:
+    return (grid_out.metadata or {}).get("compression", "none")
+
+
+class ArtifactWriter:
+    """
+    Write-only file object that compresses straight into a new GridFS file.
+
+    Nothing is buffered beyond the compressor's window and one GridFS chunk,
+    so artifacts of any size can be streamed in. On close the codec, raw and
+    stored sizes, the SHA-256 of the raw bytes and the write time are
+    recorded in the file's metadata.
+    """
+
+    def __init__(self, filename: str, compression: str = "none", **fields):
+        self.codec, self.level = parse_compression(compression)
+        self.raw_length = 0
+        self.sha256 = hashlib.sha256()
+        self._started = time.perf_counter()
+        self._grid_in = fs.new_file(filename=filename, chunk_size=GRIDFS_CHUNK_SIZE_BYTES, **fields)
+        self._stream = _compressing_stream(self._grid_in, self.codec, self.level) or self._grid_in
+
+    @property
+    def _id(self):
+        return self._grid_in._id
+
+    def writable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._grid_in.closed
+
+    def write(self, data) -> int:
+        self._stream.write(data)
+        self.sha256.update(data)
+        self.raw_length += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Position in the uncompressed stream (joblib aligns arrays on it)
+        return self.raw_length
+
+    def flush(self):
+        pass
+
+    def close(self) -> dict:
+        """Finish the GridFS file and return its artifact metadata."""
+        if self._stream is not self._grid_in:
+            self._stream.close()
+        metadata = {
+            "compression": self.codec,
+            "compression_level": self.level,
+            "raw_length": self.raw_length,
+            "sha256": self.sha256.hexdigest(),
+            "write_seconds": round(time.perf_counter() - self._started, 4),
+        }
+        self._grid_in.metadata = metadata
+        self._grid_in.close()
+        metadata["length"] = self._grid_in.length
+        return metadata
+
+    def abort(self):
+        self._grid_in.abort()
+
+
+def compress_bytes(data: bytes, compression: str):
+    """
+    Compress an in-memory payload for GridFS clients that take bytes (Motor's
+    upload_from_stream). Returns (payload, metadata).
+    """
+    started = time.perf_counter()
+    codec, level = parse_compression(compression)
+    buffer = io.BytesIO()
+    stream = _compressing_stream(buffer, codec, level)
+    if stream is None:
+        payload = data
+    else:
+        with stream:
+            stream.write(data)
+        payload = buffer.getvalue()
+    return payload, {
+        "compression": codec,
+        "compression_level": level,
+        "raw_length": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "write_seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def open_artifact(file_id):
+    """
+    Readable, decompressed stream over a stored GridFS file, or None if it
+    doesn't exist. Files written before compression was added read as-is.
+    """
+    grid_out = fs.find_one({"_id": file_id})
+    if grid_out is None:
+        return None
+    return decompressing_reader(grid_out, compression_of(grid_out))
+
+
+def artifact_size(grid_out) -> int:
+    """Uncompressed size of a stored file, falling back to the stored length."""
+    return (grid_out.metadata or {}).get("raw_length", grid_out.length)
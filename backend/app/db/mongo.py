@@ -1,6 +1,7 @@
-from pymongo import MongoClient
-import gridfs
+
 import os
+import threading
+
 import certifi  # ← Add this
 from dotenv import load_dotenv
 
@@ -9,13 +10,90 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 
-# Use certifi to fix SSL handshake issues with MongoDB Atlas
-client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
 
-db = client[DB_NAME]
+def client_options() -> dict:
+    """Connection pool and timeout settings shared by the sync and async clients."""
+    return {
+        "tlsCAFile": certifi.where(),  # Use certifi to fix SSL handshake issues with MongoDB Atlas
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    }
+
+
+class LazyHandle:
+    """
+    Stands in for a client-derived object (collection, GridFS bucket) until
+    first use, then forwards every attribute to it. Importing a module that
+    holds one neither imports the driver nor touches the network, so the
+    app starts (and reports itself unready) while MongoDB is unreachable.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def reset(self):
+        with self._lock:
+            self._target = None
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+# Built on first use; a test or benchmark may assign its own client beforehand
+client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from pymongo import MongoClient
+                client = MongoClient(MONGO_URI, **client_options())
+    return client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def _gridfs():
+    import gridfs
+    return gridfs.GridFS(get_db())
+
+
+def ping():
+    """Round trip to the server; raises when MongoDB is unreachable."""
+    get_client().admin.command("ping")
+
+
+def close_client():
+    global client
+    with _client_lock:
+        if client is not None:
+            client.close()
+            client = None
+            dataset_collection.reset()
+            fs.reset()
+
 
 # Collections
-dataset_collection = db["datasets"]  # Single collection for all info
+dataset_collection = LazyHandle(lambda: get_db()["datasets"])  # Single collection for all info
 
 # GridFS
-fs = gridfs.GridFS(db)
+fs = LazyHandle(_gridfs)
@@ -0,0 +1,75 @@
+import threading
+
+from app.db.mongo import MONGO_URI, DB_NAME, LazyHandle, client_options
+
+# Non-blocking counterparts of app.db.mongo for use inside `async def` handlers.
+# Both clients read and write the same collection and GridFS bucket; like the
+# sync client, this one (and Motor itself) is only loaded on first use.
+async_client = None
+_client_lock = threading.Lock()
+
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        with _client_lock:
+            if async_client is None:
+                from motor.motor_asyncio import AsyncIOMotorClient
+                async_client = AsyncIOMotorClient(MONGO_URI, **client_options())
+    return async_client
+
+
+def get_async_db():
+    return get_async_client()[DB_NAME]
+
+
+def _async_gridfs():
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+    return AsyncIOMotorGridFSBucket(get_async_db())
+
+
+def close_async_client():
+    global async_client
+    with _client_lock:
+        if async_client is not None:
+            async_client.close()
+            async_client = None
+            async_dataset_collection.reset()
+            async_gridfs_files.reset()
+            async_fs.reset()
+
+
+# Collections
+async_dataset_collection = LazyHandle(lambda: get_async_db()["datasets"])
+
+# GridFS (same default "fs" bucket as the sync gridfs.GridFS)
+async_fs = LazyHandle(_async_gridfs)
+async_gridfs_files = LazyHandle(lambda: get_async_db()["fs.files"])
+
+
+async def write_gridfs_file(filename: str, payload: bytes, metadata: dict, chunk_size_bytes: int, **fields):
+    """
+    Store a GridFS file and return its id. Extra fields (e.g. session_id) go
+    on the file document itself, as gridfs.GridFS.put and ArtifactWriter
+    store them; Motor's bucket only takes metadata, so they are set after.
+    """
+    file_id = await async_fs.upload_from_stream(
+        filename, payload, chunk_size_bytes=chunk_size_bytes, metadata=metadata
+    )
+    if fields:
+        await async_gridfs_files.update_one({"_id": file_id}, {"$set": fields})
+    return file_id
+
+
+async def read_gridfs_file(file_id):
+    """
+    Return (bytes, grid_out) for a GridFS file, or (None, None) if it doesn't
+    exist. The grid_out carries the stored length and metadata.
+    """
+    from gridfs.errors import NoFile
+
+    try:
+        stream = await async_fs.open_download_stream(file_id)
+    except NoFile:
+        return None, None
+    return await stream.read(), stream
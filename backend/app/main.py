@@ -1,17 +1,57 @@
 # main.py or app.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.auth import router as auth_router 
 from app.api.upload import router as upload_router
+from app.api.append import router as append_router
 from app.api.profile import router as profile_router
 from app.api.train import router as train_router
+from app.api.predict import router as predict_router
+from app.api.model_cache import warm_up_model_cache, MODEL_CACHE_WARMUP
+from app.api.jobs import job_manager
+from app.api.analysis import analysis_runner
+from app.api.metrics import router as metrics_router, registry, MetricsMiddleware
+from app.api.model_cache import model_cache
+from app.api.local_models import local_model_store
+from app.api.batcher import micro_batcher
+from app.api.profile_cache import profile_cache
+from app.api.session_store import session_store
+from app.api.auth_cache import token_cache
+from app.api.health import router as health_router, startup_tasks, preload_modules, STARTUP_PRELOAD
+from app.db.mongo import close_client
+from app.db.mongo_async import close_async_client
 
 from logger import logger
 
 from exception import DAException
 
-app = FastAPI()
+
+# Routers import no ML libraries and build no DB clients at import time, so the
+# server accepts connections right away; /health/ready turns 200 once the
+# startup tasks below are done and MongoDB answers
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # (name, fn, needs MongoDB, required for readiness)
+    steps = [("resume_train_jobs", job_manager.start, True, True)]
+    if MODEL_CACHE_WARMUP > 0:
+        steps.append(("model_cache_warmup", lambda: warm_up_model_cache(MODEL_CACHE_WARMUP), True, True))
+    if STARTUP_PRELOAD:
+        steps.append(("preload", preload_modules, False, False))
+    startup_tasks.start(steps)
+
+    yield
+
+    startup_tasks.stop()
+    job_manager.shutdown()
+    analysis_runner.shutdown()
+    close_async_client()
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,13 +60,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Register routers
 app.include_router(auth_router)
 app.include_router(upload_router)
+app.include_router(append_router)
 app.include_router(profile_router)
 app.include_router(train_router)
+app.include_router(predict_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
 
-
-
+# Component stats exported as gauges on /metrics
+registry.register_stats("model_cache", model_cache.stats)
+registry.register_stats("model_local_tier", local_model_store.stats)
+registry.register_stats("predict_batcher", micro_batcher.stats)
+registry.register_stats("profile_cache", profile_cache.stats)
+registry.register_stats("session_store", session_store.stats)
+registry.register_stats("auth_token_cache", token_cache.stats)
+registry.register_stats("startup", startup_tasks.stats)
@@ -0,0 +1,203 @@
+"""
+End-to-end API benchmark for /upload, /profile, /train and /predict.
+
+Generates synthetic CSVs over a grid of row counts, column counts and
+categorical cardinalities, drives the app through FastAPI's TestClient
+against an in-process MongoDB/GridFS stand-in (benchmarks.inprocess_db),
+and reports throughput, p50/p99 latency and peak RSS per endpoint.
+
+Results are written as JSON so two commits can be compared:
+    python -m benchmarks.bench_api --output before.json
+    (check out another commit)
+    python -m benchmarks.bench_api --output after.json --compare before.json
+
+Run from the backend directory; no database server is needed.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Keep the benchmark self-contained: no background analysis processes and a
+# throwaway directory for the local model tier
+os.environ.setdefault("ANALYSIS_ENABLED", "0")
+os.environ.setdefault("MODEL_LOCAL_DIR", tempfile.mkdtemp(prefix="bench-api-models-"))
+
+from benchmarks import inprocess_db
+
+inprocess_db.install()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def make_csv(n_rows: int, n_columns: int, cardinality: int, seed: int = 0) -> bytes:
+    """Half numeric, half categorical features plus a binary `target`."""
+    rng = np.random.default_rng(seed)
+    n_numeric = max(1, n_columns // 2)
+    data = {f"num_{i}": rng.normal(size=n_rows).round(4) for i in range(n_numeric)}
+    for i in range(n_columns - n_numeric):
+        data[f"cat_{i}"] = rng.choice([f"v{j}" for j in range(cardinality)], size=n_rows)
+    signal = data["num_0"] + rng.normal(scale=0.5, size=n_rows)
+    data["target"] = np.where(signal > 0, "yes", "no")
+    return pd.DataFrame(data).to_csv(index=False).encode()
+
+
+def rss_bytes() -> dict:
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return {
+        "current": current,
+        "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def summarize(samples: list, rows_per_call: int, errors: int) -> dict:
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(samples, 99)) * 1000, 3),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+        "throughput_rps": round(len(samples) / total, 3) if total else None,
+        "rows_per_second": round(len(samples) * rows_per_call / total, 1) if total else None,
+    }
+
+
+def timed(call, repeat: int, rows_per_call: int) -> dict:
+    samples, errors = [], 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        response = call(i)
+        samples.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+    stats = summarize(samples, rows_per_call, errors)
+    stats["rss_bytes"] = rss_bytes()
+    return stats
+
+
+def run_scenario(client: TestClient, n_rows: int, n_columns: int, cardinality: int, args) -> dict:
+    # Distinct contents per upload, so every profile below is a cold one
+    payloads = [make_csv(n_rows, n_columns, cardinality, seed=i) for i in range(args.repeat)]
+    session_ids = []
+
+    def upload(i):
+        response = client.post("/upload", files={"file": ("bench.csv", payloads[i], "text/csv")})
+        session_ids.append(response.json().get("session_id"))
+        return response
+
+    results = {"upload": timed(upload, args.repeat, n_rows)}
+    results["upload"]["payload_bytes"] = len(payloads[0])
+
+    results["profile_cold"] = timed(
+        lambda i: client.get("/profile", params={"session_id": session_ids[i]}), args.repeat, n_rows
+    )
+    results["profile_cached"] = timed(
+        lambda i: client.get("/profile", params={"session_id": session_ids[0]}), args.repeat, n_rows
+    )
+    results["train"] = timed(
+        lambda i: client.post("/train", json={"session_id": session_ids[i]}),
+        min(args.train_repeat, len(session_ids)), n_rows,
+    )
+
+    features = pd.read_csv(pd.io.common.BytesIO(payloads[0])).drop(columns=["target"])
+    session_id = session_ids[0]
+    for batch_rows in args.predict_rows:
+        records = json.loads(features.head(batch_rows).to_json(orient="records"))
+        client.post("/predict", json={"session_id": session_id, "inputs": records})  # model load, untimed
+        results[f"predict_{batch_rows}"] = timed(
+            lambda i: client.post("/predict", json={"session_id": session_id, "inputs": records}),
+            args.predict_repeat, len(records),
+        )
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Endpoints whose p50 got slower than baseline by more than `threshold` (a ratio)."""
+    regressions = []
+    for name, endpoints in current["scenarios"].items():
+        for endpoint, stats in endpoints.items():
+            before = baseline.get("scenarios", {}).get(name, {}).get(endpoint)
+            if not before or not before["p50_ms"]:
+                continue
+            ratio = stats["p50_ms"] / before["p50_ms"]
+            print(f"{name:>28} {endpoint:>16}: p50 {before['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} ms  ({ratio:5.2f}x)")
+            if ratio > 1 + threshold:
+                regressions.append((name, endpoint, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--columns", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--cardinality", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--repeat", type=int, default=5, help="uploads (and cold profiles) per scenario")
+    parser.add_argument("--train-repeat", type=int, default=2)
+    parser.add_argument("--predict-repeat", type=int, default=50)
+    parser.add_argument("--predict-rows", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--output", default="bench_api_results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown ratio before failing")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "scenarios": {},
+    }
+
+    with TestClient(app) as client:
+        for n_rows, n_columns, cardinality in itertools.product(args.rows, args.columns, args.cardinality):
+            name = f"rows={n_rows},cols={n_columns},card={cardinality}"
+            results = run_scenario(client, n_rows, n_columns, cardinality, args)
+            report["scenarios"][name] = results
+            print(name)
+            for endpoint, stats in results.items():
+                print(
+                    f"  {endpoint:>16}: p50={stats['p50_ms']:>10.2f} ms  p99={stats['p99_ms']:>10.2f} ms  "
+                    f"{stats['throughput_rps']:>9.2f} req/s  peak RSS {stats['rss_bytes']['peak'] / 1e6:8.1f} MB"
+                    + (f"  errors={stats['errors']}" if stats["errors"] else "")
+                )
+
+    report["peak_rss_bytes"] = rss_bytes()["peak"]
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.compare} (commit {baseline.get('commit')})")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} endpoint(s) regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Artifact compression benchmark.
+
+Serializes a RandomForest pipeline the way /train does and reports stored
+size, compression time and load time for each available codec, i.e. how
+many bytes GridFS has to move per /train and cold /predict.
+
+Run from the backend directory:
+    python -m benchmarks.bench_artifacts
+"""
+import argparse
+import io
+import time
+
+import joblib
+
+from app.db.artifacts import compress_bytes, decompressing_reader, _AVAILABLE
+from benchmarks.bench_predict import make_dataset, fit_artifacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--train-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    joblib.dump(fit_artifacts(make_dataset(args.train_rows)), buffer)
+    raw = buffer.getvalue()
+    print(f"raw joblib: {len(raw)} bytes")
+
+    for spec in ("none", "gzip:1", "gzip:3", "gzip:6", "lz4", "zstd:3"):
+        if not _AVAILABLE[spec.split(":")[0]]:
+            print(f"{spec:>8}: not installed")
+            continue
+        payload, metadata = compress_bytes(raw, spec)
+
+        start = time.perf_counter()
+        joblib.load(decompressing_reader(io.BytesIO(payload), metadata["compression"]))
+        load_seconds = time.perf_counter() - start
+
+        print(
+            f"{spec:>8}: stored={len(payload):>10} bytes  ratio={len(raw) / len(payload):5.2f}  "
+            f"compress={metadata['write_seconds'] * 1000:8.1f}ms  load={load_seconds * 1000:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Authentication overhead benchmark.
+
+Measures, on a throwaway SQLite user database:
+  * bcrypt hash time per cost setting (BCRYPT_ROUNDS),
+  * per-request cost of resolving a bearer token on /me with the token
+    cache on and off, against an unauthenticated baseline route,
+  * /token login throughput under concurrency, and how late an
+    unauthenticated request is served while logins are hashing.
+
+Run from the backend directory (no MongoDB needed):
+    python -m benchmarks.bench_auth --rounds 8 10 12
+"""
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app.api import auth
+from app.api.auth_cache import token_cache
+from app.db import models
+from app.db.database import Base, SessionLocal
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(auth.router)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def use_temporary_database():
+    path = tempfile.NamedTemporaryFile(prefix="bench-auth-", suffix=".db", delete=False).name
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    SessionLocal.configure(bind=engine)
+    Base.metadata.create_all(engine, tables=[models.User.__table__])
+
+
+def percentiles(samples: list) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(samples, 99)) * 1000, 3),
+    }
+
+
+def timeit(fn, repeat: int) -> dict:
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for rounds in args.rounds:
+        hasher = auth.pwd_context.copy(bcrypt__rounds=rounds)
+        print(f"bcrypt rounds={rounds:>2}: hash {timeit(lambda: hasher.hash('correct horse'), 5)}")
+
+    use_temporary_database()
+    client = TestClient(make_app())
+    client.post("/register", json={"username": "bench", "email": "bench@example.com", "password": "pw"})
+    token = client.post("/token", data={"username": "bench", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    baseline = timeit(lambda: client.get("/ping"), args.repeat)
+    cached = timeit(lambda: client.get("/me", headers=headers), args.repeat)
+    ttl = token_cache.ttl_seconds
+    token_cache.ttl_seconds = 0
+    uncached = timeit(lambda: client.get("/me", headers=headers), args.repeat)
+    token_cache.ttl_seconds = ttl
+
+    print(f"unauthenticated /ping: {baseline}")
+    print(f"/me, token cache on:   {cached}")
+    print(f"/me, token cache off:  {uncached}")
+    print(
+        f"auth overhead per request (p50): cached {cached['p50_ms'] - baseline['p50_ms']:.3f} ms, "
+        f"uncached {uncached['p50_ms'] - baseline['p50_ms']:.3f} ms"
+    )
+
+    # Logins hash on a pool of AUTH_HASH_WORKERS threads; other requests keep flowing
+    stop, ping_samples = threading.Event(), []
+
+    def pinger():
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get("/ping")
+            ping_samples.append(time.perf_counter() - start)
+
+    ping_thread = threading.Thread(target=pinger)
+    ping_thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        statuses = list(pool.map(
+            lambda _: client.post("/token", data={"username": "bench", "password": "pw"}).status_code,
+            range(args.logins),
+        ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    ping_thread.join()
+
+    print(
+        f"{args.logins} logins at concurrency {args.concurrency} (rounds={auth.BCRYPT_ROUNDS}, "
+        f"workers={auth.AUTH_HASH_WORKERS}): {args.logins / elapsed:.1f} logins/s, "
+        f"{statuses.count(200)} ok; /ping during logins {percentiles(ping_samples)}"
+    )
+    print(f"token cache: {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compiled model benchmark.
+
+Compares the joblib Pipeline with its compiled, array-based export (see
+app/api/compiled_model.py) on a RandomForest fitted like /train does:
+  * load time and stored size (joblib unpickling vs .npz arrays),
+  * latency for 1, 100 and 10k records and for a 10k-row frame, through
+    the Pipeline, the compiled evaluator alone, and /predict's routing
+    (compiled up to COMPILED_MAX_ROWS rows, the Pipeline past it),
+and checks that all of them return identical predictions.
+
+Run from the backend directory:
+    python -m benchmarks.bench_compiled --trees 100 --train-rows 20000
+"""
+import argparse
+import io
+import time
+
+import joblib
+import numpy as np
+
+from app.api.compiled_model import CompiledModel, COMPILED_MAX_ROWS
+from app.api.inference import predict_frame, predict_records
+from benchmarks.bench_predict import make_dataset, fit_artifacts, timeit
+
+
+def timed_load(fn, repeat: int) -> dict:
+    result = timeit(fn, repeat)
+    return {"p50_ms": result["p50_ms"], "p99_ms": result["p99_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    df = make_dataset(args.train_rows)
+    artifacts = fit_artifacts(df)
+    artifacts["pipeline"].named_steps["model"].set_params(n_estimators=args.trees)
+    artifacts["pipeline"].fit(df.drop(columns=["target"]), artifacts["label_encoder"].transform(df["target"]))
+
+    start = time.perf_counter()
+    compiled = CompiledModel.from_artifacts(artifacts)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f} ms, {len(compiled.forest['roots'])} trees, "
+          f"{len(compiled.forest['feature'])} nodes, max depth {compiled.forest['max_depth']}")
+
+    buffer = io.BytesIO()
+    joblib.dump(artifacts, buffer)
+    pickled, exported = buffer.getvalue(), compiled.to_bytes()
+    print(f"size: joblib {len(pickled) / 1e6:.2f} MB, compiled {len(exported) / 1e6:.2f} MB")
+    print(f"load: joblib {timed_load(lambda: joblib.load(io.BytesIO(pickled)), 10)}  "
+          f"compiled {timed_load(lambda: CompiledModel.from_bytes(exported), 10)}")
+
+    compiled = CompiledModel.from_bytes(exported)
+    # What the model cache hands /predict: the export plus an on-demand Pipeline
+    routed_artifacts = {"compiled": compiled, "load_pipeline": lambda: artifacts}
+    print(f"routing: compiled up to {COMPILED_MAX_ROWS} rows")
+
+    for n_rows in (1, 100, 10_000):
+        records = make_dataset(n_rows, seed=1).drop(columns=["target"]).to_dict("records")
+        expected = predict_records(artifacts, records)
+        assert np.array_equal(expected, compiled.predict_records(records))
+        assert np.array_equal(expected, predict_records(routed_artifacts, records))
+        pipeline_path = timeit(lambda: predict_records(artifacts, records), args.repeat)
+        compiled_path = timeit(lambda: compiled.predict_records(records), args.repeat)
+        routed = timeit(lambda: predict_records(routed_artifacts, records), args.repeat)
+        print(f"records={n_rows:>6}  pipeline={pipeline_path}  compiled={compiled_path}  routed={routed}")
+
+    frame = make_dataset(10_000, seed=2).drop(columns=["target"])
+    assert np.array_equal(predict_frame(artifacts, frame), compiled.predict_frame(frame))
+    pipeline_path = timeit(lambda: predict_frame(artifacts, frame), args.repeat)
+    compiled_path = timeit(lambda: compiled.predict_frame(frame), args.repeat)
+    print(f"frame=  10000  pipeline={pipeline_path}  compiled={compiled_path}")
+
+
+if __name__ == "__main__":
+    main()
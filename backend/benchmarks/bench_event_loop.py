@@ -0,0 +1,77 @@
+"""
+Event-loop responsiveness benchmark for the MongoDB/GridFS data layer.
+
+Writes a large blob to GridFS while a ticker coroutine measures how late
+the event loop wakes it up. The blocking variant calls the sync `fs.put`
+directly inside the coroutine (what the handlers used to do); the async
+variant uses the Motor bucket from app.db.mongo_async.
+
+Needs a reachable MongoDB (MONGO_URI and DB_NAME, as for the app).
+Run from the backend directory:
+    python -m benchmarks.bench_event_loop --size-mb 64
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from app.db.mongo import fs
+from app.db.mongo_async import async_fs
+
+TICK_SECONDS = 0.005
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def measure(write, payload: bytes):
+    lags, stop = [], asyncio.Event()
+    task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    file_id = await write(payload)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await task
+    return file_id, elapsed, lags
+
+
+async def blocking_write(payload: bytes):
+    return fs.put(payload, filename="bench_event_loop.bin")
+
+
+async def async_write(payload: bytes):
+    return await async_fs.upload_from_stream("bench_event_loop.bin", payload)
+
+
+async def run(size_mb: int):
+    payload = os.urandom(size_mb * 1024 * 1024)
+    for name, write in (("sync fs.put", blocking_write), ("motor bucket", async_write)):
+        file_id, elapsed, lags = await measure(write, payload)
+        await async_fs.delete(file_id)
+
+        lags_ms = np.array(lags or [0.0]) * 1000
+        print(
+            f"{name:>12}: write={elapsed * 1000:.1f}ms  ticks={len(lags)}  "
+            f"lag p50={np.percentile(lags_ms, 50):.2f}ms  p99={np.percentile(lags_ms, 99):.2f}ms  "
+            f"max={lags_ms.max():.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(run(args.size_mb))
+
+
+if __name__ == "__main__":
+    main()
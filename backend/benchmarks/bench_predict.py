@@ -0,0 +1,89 @@
+"""
+Prediction latency benchmark.
+
+Compares the DataFrame Pipeline path with the NumPy fast path used by
+/predict for small requests, at 1 row and 10k rows.
+
+Run from the backend directory:
+    python -m benchmarks.bench_predict
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
+
+from app.api.inference import predict_frame, predict_records, _build_fast_path, _encode_records, _decode
+
+
+def make_dataset(n_rows: int, n_numeric: int = 8, n_categorical: int = 4, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.normal(size=n_rows) for i in range(n_numeric)}
+    for i in range(n_categorical):
+        data[f"cat_{i}"] = rng.choice([f"v{j}" for j in range(10)], size=n_rows)
+    data["target"] = rng.choice(["yes", "no"], size=n_rows)
+    return pd.DataFrame(data)
+
+
+def fit_artifacts(df: pd.DataFrame):
+    # Same preprocessing layout as app/api/training.py
+    X = df.drop(columns=["target"])
+    numeric_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    categorical_cols = X.select_dtypes(exclude=[np.number]).columns.tolist()
+    preprocessor = ColumnTransformer(transformers=[
+        ("num", Pipeline([("imputer", SimpleImputer(strategy="mean")), ("scaler", StandardScaler())]), numeric_cols),
+        ("cat", Pipeline([("imputer", SimpleImputer(strategy="most_frequent")),
+                          ("onehot", OneHotEncoder(handle_unknown="ignore"))]), categorical_cols),
+    ])
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df["target"])
+    pipeline = Pipeline([("preprocessor", preprocessor), ("model", RandomForestClassifier(random_state=42))])
+    pipeline.fit(X, y)
+    return {"pipeline": pipeline, "label_encoder": label_encoder, "target_col": "target"}
+
+
+def timeit(fn, repeat: int):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(samples, 99)) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--train-rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    df = make_dataset(args.train_rows)
+    artifacts = fit_artifacts(df)
+    fast_path = _build_fast_path(artifacts["pipeline"])
+
+    for n_rows in (1, 10_000):
+        batch = make_dataset(n_rows, seed=1).drop(columns=["target"])
+        records = batch.to_dict("records")
+
+        dataframe_path = timeit(lambda: predict_frame(artifacts, pd.DataFrame(records)), args.repeat)
+        numpy_path = timeit(
+            lambda: _decode(artifacts, fast_path["model"].predict(_encode_records(fast_path, records))),
+            args.repeat,
+        )
+        routed = timeit(lambda: predict_records(artifacts, records), args.repeat)
+
+        assert list(predict_frame(artifacts, batch)) == list(predict_records(artifacts, records))
+        print(f"rows={n_rows:>6}  dataframe={dataframe_path}  numpy={numpy_path}  /predict routing={routed}")
+
+
+if __name__ == "__main__":
+    main()
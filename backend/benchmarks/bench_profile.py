@@ -0,0 +1,119 @@
+"""
+Profiling benchmark on wide frames.
+
+Compares the previous per-column /profile implementation with the
+vectorized engine in app/api/profiling.py and checks that they agree.
+
+Run from the backend directory:
+    python -m benchmarks.bench_profile --rows 20000 --cols 600
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import skew
+
+from app.api.profiling import compute_profile
+
+
+def legacy_profile(df: pd.DataFrame, parsed_schema: list) -> dict:
+    """The /profile implementation before the vectorized engine."""
+    outliers = {}
+    for col in df.select_dtypes(include=[np.number]).columns:
+        Q1 = df[col].quantile(0.25)
+        Q3 = df[col].quantile(0.75)
+        IQR = Q3 - Q1
+        outlier_count = ((df[col] < Q1 - 1.5 * IQR) | (df[col] > Q3 + 1.5 * IQR)).sum()
+        outliers[col] = int(outlier_count)
+
+    skewness = df.select_dtypes(include=[np.number]).apply(
+        lambda x: round(skew(x.dropna()), 3)
+    ).to_dict()
+
+    correlations = df.select_dtypes(include=[np.number]).corr().to_dict()
+
+    imbalance = {}
+    for col in df.columns:
+        freq = df[col].value_counts(normalize=True, dropna=False)
+        if not freq.empty and freq.iloc[0] > 0.9:
+            imbalance[col] = round(freq.iloc[0] * 100, 2)
+
+    leakage = {}
+    if 'target' in df.columns:
+        for col in df.select_dtypes(include=[np.number]).columns:
+            if col != 'target':
+                sub = df[[col, 'target']].dropna()
+                if len(sub) > 1:
+                    corr_val = sub.corr().iloc[0, 1]
+                    if pd.notna(corr_val) and abs(corr_val) > 0.9:
+                        leakage[col] = round(corr_val, 4)
+
+    return {
+        "parsed_schema": parsed_schema,
+        "outliers": outliers,
+        "skewness": skewness,
+        "pairwise_correlations": correlations,
+        "imbalanced_columns": imbalance,
+        "potential_leakage": leakage
+    }
+
+
+def make_wide_frame(n_rows: int, n_cols: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n_numeric = int(n_cols * 0.9)
+    data = {}
+    for i in range(n_numeric):
+        col = rng.lognormal(size=n_rows) if i % 3 else rng.normal(size=n_rows)
+        if i % 5 == 0:
+            col[rng.random(n_rows) < 0.1] = np.nan
+        if i % 7 == 0:
+            col = np.where(rng.random(n_rows) < 0.95, 0.0, col)
+        data[f"num_{i}"] = col
+    for i in range(n_cols - n_numeric - 1):
+        data[f"cat_{i}"] = rng.choice(["a", "b", "c", None], size=n_rows, p=[0.92, 0.04, 0.02, 0.02])
+    data["target"] = data["num_1"] * 2 + rng.normal(scale=0.01, size=n_rows)
+    return pd.DataFrame(data)
+
+
+def _close(a, b, tol=1e-9):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k], tol) for k in a)
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    if isinstance(a, (int, float)):
+        return abs(a - b) <= tol * max(1.0, abs(a))
+    return a == b
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_wide_frame(args.rows, args.cols)
+    legacy_s, legacy = timeit(lambda: legacy_profile(df, []), args.repeat)
+    engine_s, engine = timeit(lambda: compute_profile(df, []), args.repeat)
+
+    for key in ("outliers", "skewness", "imbalanced_columns", "potential_leakage"):
+        assert _close(legacy[key], engine[key], tol=1e-3), key
+    assert _close(legacy["pairwise_correlations"], engine["pairwise_correlations"], tol=1e-6)
+
+    print(f"frame={args.rows}x{args.cols}  legacy={legacy_s:.3f}s  engine={engine_s:.3f}s  "
+          f"speedup={legacy_s / engine_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Startup benchmark: import time, cold start and startup during a MongoDB outage.
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported or connected:
+  * import    time to `import app.main`, its peak RSS, and which heavy
+              libraries (sklearn, SciPy, joblib, pandas, pymongo, Motor)
+              that import loaded,
+  * cold      against the in-process MongoDB stand-in (benchmarks.inprocess_db):
+              time until the app serves /health/live, until /health/ready
+              returns 200, until the background preload has finished, and
+              the first /train and /predict after that,
+  * outage    with MONGO_URI pointing at a closed port: whether startup
+              completes and what /health/live and /health/ready answer.
+
+Results are written as JSON, like benchmarks.bench_api:
+    python -m benchmarks.bench_startup --repeat 5 --output startup.json
+
+Run from the backend directory; no database server is needed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+HEAVY_MODULES = ("sklearn", "scipy", "joblib", "pandas", "pymongo", "motor")
+
+_IMPORT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+_COLD = """
+import json, time
+import numpy as np, pandas as pd
+start = time.perf_counter()
+from benchmarks import inprocess_db
+inprocess_db.install()
+from fastapi.testclient import TestClient
+from app.main import app
+
+result = {"import_seconds": time.perf_counter() - start}
+with TestClient(app) as client:
+    result["live_seconds"] = time.perf_counter() - start
+    while True:
+        response = client.get("/health/ready")
+        # Apps without the probe finish their startup work before serving
+        if response.status_code in (200, 404):
+            break
+        time.sleep(0.05)
+    result["ready_seconds"] = time.perf_counter() - start
+    # Then wait out the preload, so the first requests below measure a warmed-up app
+    while client.get("/health/ready").json().get("startup", {}).get("steps_pending"):
+        time.sleep(0.05)
+    result["warm_seconds"] = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"x": rng.normal(size=2000), "c": rng.choice(["a", "b"], 2000)})
+    frame["target"] = np.where(frame["x"] > 0, "yes", "no")
+    session_id = client.post(
+        "/upload", files={"file": ("bench.csv", frame.to_csv(index=False).encode(), "text/csv")}
+    ).json()["session_id"]
+
+    t = time.perf_counter()
+    assert client.post("/train", json={"session_id": session_id}).status_code == 200
+    result["first_train_seconds"] = time.perf_counter() - t
+    t = time.perf_counter()
+    assert client.post("/predict", json={"session_id": session_id, "inputs": [{"x": 0.5, "c": "a"}]}).status_code == 200
+    result["first_predict_seconds"] = time.perf_counter() - t
+print(json.dumps(result))
+"""
+
+_OUTAGE = """
+import json, time
+start = time.perf_counter()
+result = {}
+try:
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        result["started_seconds"] = time.perf_counter() - start
+        result["live_status"] = client.get("/health/live").status_code
+        t = time.perf_counter()
+        result["ready_status"] = client.get("/health/ready").status_code
+        result["ready_seconds"] = time.perf_counter() - t
+except Exception as e:
+    result["startup_error"] = f"{type(e).__name__}: {e}"[:200]
+print(json.dumps(result))
+"""
+
+
+def run_child(code: str, env: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", code], env={**os.environ, **env},
+        capture_output=True, text=True, timeout=600,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"benchmark child failed:\n{completed.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def summarize(runs: list) -> dict:
+    """Median of every numeric field across runs; other fields from the first run."""
+    summary = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, float):
+            summary[key] = round(statistics.median(run[key] for run in runs), 4)
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--output", default="bench_startup_results.json")
+    args = parser.parse_args()
+
+    # Logs and the local model tier go to a throwaway directory; no analysis processes
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    env = {
+        "PYTHONPATH": os.getcwd(),
+        "DB_NAME": "benchmark",
+        "ANALYSIS_ENABLED": "0",
+        "MODEL_LOCAL_DIR": os.path.join(workdir, "models"),
+    }
+    outage_env = {
+        **env,
+        "MONGO_URI": "mongodb://127.0.0.1:9/",
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": "300",
+        "MONGO_CONNECT_TIMEOUT_MS": "300",
+        "READINESS_TIMEOUT_SECONDS": "1",
+    }
+
+    def repeat(code: str, child_env: dict, times: int) -> dict:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            return summarize([run_child(code, child_env) for _ in range(times)])
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "import": repeat(_IMPORT % (HEAVY_MODULES,), env, args.repeat),
+        "cold": repeat(_COLD, env, args.repeat),
+        "outage": repeat(_OUTAGE, outage_env, 1),
+    }
+
+    imported = report["import"]
+    print(f"import app.main: {imported['seconds'] * 1000:.0f} ms, peak RSS {imported['peak_rss_bytes'] / 1e6:.0f} MB, "
+          f"loaded {', '.join(imported['loaded']) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+    cold = report["cold"]
+    print(f"cold start: live {cold['live_seconds'] * 1000:.0f} ms, ready {cold['ready_seconds'] * 1000:.0f} ms, "
+          f"preloaded {cold['warm_seconds'] * 1000:.0f} ms, "
+          f"first /train {cold['first_train_seconds'] * 1000:.0f} ms, "
+          f"first /predict {cold['first_predict_seconds'] * 1000:.0f} ms")
+    outage = report["outage"]
+    if "startup_error" in outage:
+        print(f"MongoDB down: startup failed ({outage['startup_error']})")
+    else:
+        print(f"MongoDB down: started in {outage['started_seconds'] * 1000:.0f} ms, "
+              f"/health/live {outage['live_status']}, /health/ready {outage['ready_status']} "
+              f"in {outage['ready_seconds'] * 1000:.0f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+In-process stand-in for MongoDB and GridFS, for benchmarks and tests that
+should run without a database server. It needs mongomock, which is listed
+in requirements-dev.txt.
+
+`install()` gives app.db.mongo a mongomock client, which its lazily built
+collection and GridFS handles then use. It also points app.db.mongo_async
+at thin async adapters over the same collections. It must run before any
+other app module is imported, since those bind `async_fs`,
+`async_dataset_collection` etc. at import time.
+
+Timings taken on top of it exclude network and server-side costs: they
+measure the API's own parsing, compute and serialization work.
+"""
+import os
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return self._collection.update_one(*args, **kwargs)
+
+
+class _AsyncDownloadStream:
+    def __init__(self, grid_out):
+        self._grid_out = grid_out
+        self._id = grid_out._id
+        self.length = grid_out.length
+        self.metadata = grid_out.metadata
+
+    async def read(self):
+        return self._grid_out.read()
+
+
+class _AsyncGridFSBucket:
+    def __init__(self, fs):
+        self._fs = fs
+
+    async def upload_from_stream(self, filename, source, chunk_size_bytes=None, metadata=None):
+        kwargs = {"chunk_size": chunk_size_bytes} if chunk_size_bytes else {}
+        return self._fs.put(source, filename=filename, metadata=metadata, **kwargs)
+
+    async def open_download_stream(self, file_id):
+        return _AsyncDownloadStream(self._fs.get(file_id))
+
+
+def install(db_name: str = "benchmark"):
+    os.environ.setdefault("DB_NAME", db_name)
+
+    import mongomock
+    import mongomock.gridfs
+
+    import app.db.mongo as mongo
+    import app.db.mongo_async as mongo_async
+
+    mongomock.gridfs.enable_gridfs_integration()
+    mongo.client = mongomock.MongoClient()
+
+    mongo_async.async_dataset_collection = _AsyncCollection(mongo.dataset_collection)
+    mongo_async.async_gridfs_files = _AsyncCollection(mongo.get_db()["fs.files"])
+    mongo_async.async_fs = _AsyncGridFSBucket(mongo.fs)
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ANALYSIS_ENABLED", "0")
+os.environ.setdefault("MODEL_LOCAL_DIR", tempfile.mkdtemp(prefix="tests-models-"))
+
+# Before any other app module binds the database handles
+from benchmarks import inprocess_db  # noqa: E402
+
+inprocess_db.install("tests")
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def upload(client):
+    def upload(frame, **params):
+        response = client.post(
+            "/upload", params=params,
+            files={"file": ("data.csv", frame.to_csv(index=False).encode(), "text/csv")},
+        )
+        assert response.status_code == 200, response.text
+        return response.json()["session_id"]
+
+    return upload
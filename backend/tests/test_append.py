@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api import dataset_store
+
+
+def _frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "x": rng.normal(size=n),
+        "y": rng.integers(0, 100, n),
+        "c": rng.choice(["a", "b", "c"], n),
+        "target": rng.normal(size=n),
+    })
+    frame.loc[rng.random(n) < 0.05, "x"] = np.nan
+    return frame
+
+
+def _append(client, session_id, frame):
+    return client.post(
+        "/upload/append", data={"session_id": session_id},
+        files={"file": ("more.csv", frame.to_csv(index=False).encode(), "text/csv")},
+    )
+
+
+def _comparable(profile: dict) -> dict:
+    schema = {
+        entry["column"]: (entry["unique_values"], entry["null_percentage"], entry["dtype"])
+        for entry in profile["parsed_schema"]
+    }
+    return {**{k: v for k, v in profile.items() if k != "parsed_schema"}, "parsed_schema": schema}
+
+
+def _assert_close(actual, expected):
+    # Merged sums and a direct pass agree up to float rounding
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            _assert_close(actual[key], expected[key])
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, abs=1e-9)
+    else:
+        assert actual == expected
+
+
+def test_appending_matches_profiling_all_rows(client, upload):
+    a, b = _frame(300, 0), _frame(200, 1)
+
+    combined = upload(pd.concat([a, b], ignore_index=True))
+    expected = client.get("/profile", params={"session_id": combined, "mode": "exact"}).json()["profile"]
+
+    session_id = upload(a)
+    response = _append(client, session_id, b)
+    assert response.status_code == 200, response.text
+    appended = response.json()["profile"]
+
+    _assert_close(_comparable(appended), _comparable(expected))
+
+
+def test_upload_stores_aggregates_so_append_never_rescans(client, upload, monkeypatch):
+    session_id = upload(_frame(100, 0))
+    meta = dataset_store.dataset_collection.find_one({"session_id": session_id})
+    assert meta["profile_aggregates"]["dataset_version"] == 0
+
+    def rescan(*args, **kwargs):
+        raise AssertionError("append rescanned the stored rows")
+
+    monkeypatch.setattr(dataset_store, "_iter_part_chunks", rescan)
+    monkeypatch.setattr(dataset_store, "load_persisted_dataframe", rescan)
+    assert _append(client, session_id, _frame(50, 1)).status_code == 200
+
+
+def test_sessions_without_aggregates_get_them_on_first_profile(client, upload):
+    session_id = upload(_frame(100, 0))
+    # As for datasets uploaded before aggregates were kept
+    dataset_store.dataset_collection.update_one({"session_id": session_id}, {"$unset": {"profile_aggregates": ""}})
+
+    assert _append(client, session_id, _frame(50, 1)).status_code == 409
+    assert client.get("/profile", params={"session_id": session_id}).status_code == 200
+    assert _append(client, session_id, _frame(50, 1)).status_code == 200
+
+
+def test_column_summary_ignores_zero_counts():
+    from app.api.profiling import ProfileAggregates
+
+    aggregates = ProfileAggregates(sample_size=100, frequency_counters=10)
+    # Compacted columns are categorical; unused categories are counted as 0
+    aggregates.update(pd.DataFrame({"c": pd.Categorical(["a", "a", None], categories=["a", "b", "z"])}))
+
+    assert aggregates.column_summary("c") == {"nulls": 1, "unique_values": 1, "approximate_unique": False}
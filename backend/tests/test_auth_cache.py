@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import auth, auth_cache
+from app.api.auth_cache import TokenCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(auth_cache, "time", clock)
+    return clock
+
+
+def _user(username):
+    return {"id": 1, "username": username, "email": f"{username}@example.com"}
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TokenCache(ttl_seconds=60, max_entries=10)
+    cache.put("token", _user("ada"), token_expires_at=clock.now + 3600)
+
+    clock.now += 59
+    assert cache.get("token") == _user("ada")
+    clock.now += 1
+    assert cache.get("token") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_entries_never_outlive_the_token_exp(clock):
+    cache = TokenCache(ttl_seconds=60, max_entries=10)
+    cache.put("token", _user("ada"), token_expires_at=clock.now + 5)
+
+    clock.now += 4
+    assert cache.get("token") is not None
+    clock.now += 1
+    assert cache.get("token") is None
+
+    # Already expired tokens are never served
+    cache.put("expired", _user("ada"), token_expires_at=clock.now - 1)
+    assert cache.get("expired") is None
+
+
+def test_invalidate_user_drops_only_that_users_tokens(clock):
+    cache = TokenCache(ttl_seconds=60, max_entries=10)
+    cache.put("ada-laptop", _user("ada"), clock.now + 600)
+    cache.put("ada-phone", _user("ada"), clock.now + 600)
+    cache.put("grace", _user("grace"), clock.now + 600)
+
+    cache.invalidate_user("ada")
+
+    assert cache.get("ada-laptop") is None
+    assert cache.get("ada-phone") is None
+    assert cache.get("grace") == _user("grace")
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_changing_a_password_invalidates_cached_tokens(clock, monkeypatch):
+    cache = TokenCache(ttl_seconds=60, max_entries=10)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    cache.put("token", _user("ada"), clock.now + 600)
+    db = SimpleNamespace(commits=0)
+    db.commit = lambda: setattr(db, "commits", db.commits + 1)
+    user = SimpleNamespace(username="ada", hashed_password="old")
+
+    auth._rehash_user(db, user, "new")
+
+    assert user.hashed_password == "new"
+    assert db.commits == 1
+    assert cache.get("token") is None
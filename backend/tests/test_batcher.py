@@ -0,0 +1,105 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.api import batcher
+from app.api.batcher import MicroBatcher
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def predict_records(artifacts, records, max_rows=None):
+        calls.append(len(records))
+        if any("x" not in record for record in records):
+            raise ValueError("missing column x")
+        return np.array([record["x"] * 10 for record in records])
+
+    monkeypatch.setattr(batcher, "predict_records", predict_records)
+    return calls
+
+
+def _requests(n_requests, rows):
+    return [[{"x": i * 100 + j} for j in range(rows)] for i in range(n_requests)]
+
+
+def _expected(records):
+    return [record["x"] * 10 for record in records]
+
+
+def test_concurrent_requests_share_one_predict(calls):
+    micro_batcher = MicroBatcher(window_ms=20, max_rows=100)
+    artifacts = {}
+    requests = _requests(4, 3)
+
+    async def run():
+        return await asyncio.gather(*(micro_batcher.predict("s", artifacts, records) for records in requests))
+
+    results = asyncio.run(run())
+
+    assert calls == [12]
+    for records, preds in zip(requests, results):
+        assert preds.tolist() == _expected(records)
+    stats = micro_batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["requests"] == 4
+    assert stats["queue_depth"] == 0
+
+
+def test_full_batch_is_scored_without_waiting_for_the_window(calls):
+    micro_batcher = MicroBatcher(window_ms=10_000, max_rows=6)
+    artifacts = {}
+    requests = _requests(2, 3)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(micro_batcher.predict("s", artifacts, records) for records in requests)), 5
+        )
+
+    results = asyncio.run(run())
+
+    assert calls == [6]
+    assert [preds.tolist() for preds in results] == [_expected(records) for records in requests]
+
+
+def test_bad_request_fails_alone(calls):
+    micro_batcher = MicroBatcher(window_ms=20, max_rows=100)
+    artifacts = {}
+    good, other = _requests(2, 2)
+    bad = [{"y": 1}]
+
+    async def run():
+        return await asyncio.gather(
+            micro_batcher.predict("s", artifacts, good),
+            micro_batcher.predict("s", artifacts, bad),
+            micro_batcher.predict("s", artifacts, other),
+            return_exceptions=True,
+        )
+
+    first, failed, last = asyncio.run(run())
+
+    # The merged call fails, then each request is scored on its own
+    assert calls == [5, 2, 1, 2]
+    assert first.tolist() == _expected(good)
+    assert last.tolist() == _expected(other)
+    assert isinstance(failed, ValueError)
+    assert micro_batcher.stats()["fallbacks"] == 1
+
+
+def test_models_are_batched_separately(calls):
+    micro_batcher = MicroBatcher(window_ms=20, max_rows=100)
+    first_model, second_model = {}, {}
+    a, b = _requests(2, 2)
+
+    async def run():
+        return await asyncio.gather(
+            micro_batcher.predict("s", first_model, a),
+            micro_batcher.predict("s", second_model, b),
+        )
+
+    results = asyncio.run(run())
+
+    assert calls == [2, 2]
+    assert [preds.tolist() for preds in results] == [_expected(a), _expected(b)]
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from app.api.compaction import compact_frame
+
+
+@pytest.mark.parametrize("values", [
+    ["March", "April", "May"],
+    ["10:30", "11:45", "12:00"],
+    ["now", "today", "now"],
+    ["1h", "2h", "3h"],
+])
+def test_text_that_is_not_a_calendar_date_stays_text(values):
+    df, report = compact_frame(pd.DataFrame({"col": values * 4}))
+
+    assert not pd.api.types.is_datetime64_any_dtype(df["col"])
+    assert df["col"].astype(str).tolist() == values * 4
+    assert report["columns"]["col"]["storage_dtype"] in ("category", "object", "str")
+
+
+def test_full_dates_are_parsed_with_their_format():
+    df, _ = compact_frame(pd.DataFrame({"col": ["2021-01-02 10:30", None, "2021-03-04 11:45"]}))
+
+    assert pd.api.types.is_datetime64_dtype(df["col"])
+    assert df["col"].tolist()[0] == pd.Timestamp("2021-01-02 10:30")
+    assert df["col"].isna().tolist() == [False, True, False]
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder
+
+from app.api.compiled_model import CompiledModel
+from app.api.training import build_preprocessor
+
+
+def _frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "x": rng.normal(size=n),
+        # float32 like compacted uploads, so thresholds need the float32 floor
+        "z": rng.normal(size=n).astype(np.float32),
+        "c": rng.choice(["a", "b", "c"], n).astype(object),
+        "d": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24, n), unit="h"),
+    })
+    frame.loc[rng.random(n) < 0.1, "x"] = np.nan
+    frame.loc[rng.random(n) < 0.1, "c"] = None
+    frame.loc[rng.random(n) < 0.1, "d"] = pd.NaT
+    return frame
+
+
+def _inputs(seed: int) -> pd.DataFrame:
+    # Unseen categories next to the usual NaNs
+    frame = _frame(300, seed)
+    frame.loc[::7, "c"] = "never_seen"
+    return frame
+
+
+def _records(frame: pd.DataFrame) -> list:
+    # What /predict receives: JSON scalars, dates as strings, None for missing
+    raw = frame.astype(object)
+    raw["d"] = frame["d"].dt.strftime("%Y-%m-%d %H:%M:%S").astype(object)
+    return raw.where(frame.notna(), None).to_dict("records")
+
+
+def _fit(model, y):
+    X = _frame(len(y), 0)
+    pipeline = Pipeline([("preprocessor", build_preprocessor(X)), ("model", model)])
+    return pipeline.fit(X, y)
+
+
+def _signal(n: int) -> np.ndarray:
+    X = _frame(n, 0)
+    return np.nan_to_num(X["x"].to_numpy()) + X["z"].to_numpy() + (X["c"] == "a") + X["d"].dt.month.fillna(0) / 6
+
+
+def test_compiled_classifier_matches_pipeline_and_decodes_labels():
+    signal = _signal(500)
+    labels = LabelEncoder().fit(["high", "low", "mid"])
+    y = labels.transform(np.where(signal > 1.5, "high", np.where(signal < 0, "low", "mid")))
+    pipeline = _fit(RandomForestClassifier(n_estimators=20, random_state=0), y)
+    compiled = CompiledModel.from_bytes(
+        CompiledModel.from_artifacts({"pipeline": pipeline, "label_encoder": labels}).to_bytes()
+    )
+
+    X = _inputs(1)
+    expected = labels.inverse_transform(pipeline.predict(X))
+    np.testing.assert_array_equal(compiled.predict_frame(X), expected)
+    np.testing.assert_array_equal(compiled.predict_records(_records(X)), expected)
+
+
+def test_compiled_regressor_matches_pipeline():
+    pipeline = _fit(RandomForestRegressor(n_estimators=20, random_state=0), _signal(500))
+    compiled = CompiledModel.from_bytes(CompiledModel.from_artifacts({"pipeline": pipeline}).to_bytes())
+
+    X = _inputs(2)
+    expected = pipeline.predict(X)
+    np.testing.assert_array_equal(compiled.predict_frame(X), expected)
+    np.testing.assert_array_equal(compiled.predict_records(_records(X)), expected)
+
+
+def test_compiled_thresholds_between_adjacent_float32_values():
+    # Neighbouring float32 inputs put split thresholds halfway between two
+    # float32 values, where rounding them to nearest would flip comparisons
+    rng = np.random.default_rng(0)
+    steps = rng.integers(0, 40, 400)
+    one = np.float32(1)
+    X = pd.DataFrame({"z": (one + steps.astype(np.float32) * np.spacing(one)).astype(np.float32)})
+    pipeline = Pipeline([("preprocessor", build_preprocessor(X)),
+                         ("model", RandomForestRegressor(n_estimators=10, random_state=0))])
+    pipeline.fit(X, steps % 2 + rng.normal(size=400) * 0.01)
+
+    compiled = CompiledModel.from_artifacts({"pipeline": pipeline})
+
+    np.testing.assert_array_equal(compiled.predict_frame(X), pipeline.predict(X))
+
+
+def test_compiled_model_file_is_memory_mapped(tmp_path):
+    labels = LabelEncoder().fit(["no", "yes"])
+    pipeline = _fit(RandomForestClassifier(n_estimators=5, random_state=0), (_signal(200) > 0).astype(int))
+    compiled = CompiledModel.from_artifacts({"pipeline": pipeline, "label_encoder": labels})
+    path = tmp_path / "model.npz"
+    path.write_bytes(compiled.to_bytes())
+
+    mapped = CompiledModel.from_file(str(path))
+
+    assert isinstance(mapped.forest["threshold"], np.memmap)
+    assert not mapped.forest["threshold"].flags.writeable
+    X = _inputs(3)
+    np.testing.assert_array_equal(mapped.predict_frame(X), labels.inverse_transform(pipeline.predict(X)))
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api import jobs, training
+from app.api.jobs import JobCancelled, TrainJobManager
+from app.db.mongo import dataset_collection, fs
+
+
+def _frame(rows=120):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "x": rng.normal(size=rows),
+        "z": rng.normal(size=rows),
+        "target": rng.choice(["a", "b"], rows),
+    })
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = TrainJobManager(1)
+    scheduled = []
+    monkeypatch.setattr(manager, "_schedule", lambda job_id, session_id: scheduled.append(job_id))
+    manager.scheduled = scheduled
+    return manager
+
+
+def _job(session_id, **fields):
+    return dataset_collection.find_one({"session_id": session_id})["train_job"] | fields
+
+
+def test_submit_rejects_a_second_job_while_one_is_active(upload, manager):
+    session_id = upload(_frame())
+    job = manager.submit(session_id)
+
+    with pytest.raises(HTTPException) as excinfo:
+        manager.submit(session_id)
+    assert excinfo.value.status_code == 409
+    assert manager.scheduled == [job["job_id"]]
+
+    # A finished job is replaced
+    jobs._set_job(job["job_id"], {"status": "completed"})
+    assert manager.submit(session_id)["job_id"] != job["job_id"]
+
+
+def test_resume_takes_over_only_expired_jobs(upload, manager):
+    live, expired = upload(_frame()), upload(_frame())
+    live_job, expired_job = manager.submit(live), manager.submit(expired)
+    stale = datetime.utcnow() - timedelta(seconds=jobs.TRAIN_JOB_HEARTBEAT_TIMEOUT_SECONDS + 1)
+    jobs._set_job(live_job["job_id"], {"status": "running", "owner": "other:1"})
+    jobs._set_job(expired_job["job_id"], {"status": "running", "owner": "other:2", "heartbeat_at": stale})
+
+    successor = TrainJobManager(1)
+    successor._schedule = lambda job_id, session_id: successor._futures.setdefault(job_id, None)
+    assert successor.resume() == 1
+
+    assert list(successor._futures) == [expired_job["job_id"]]
+    assert _job(expired)["owner"] == successor.owner
+    assert _job(expired)["attempt"] == 1
+    assert _job(live)["owner"] == "other:1"
+    assert _job(live)["status"] == "running"
+    # Claimed jobs are live again, so a second pass leaves them alone
+    assert successor.resume() == 0
+
+
+def test_cancel_after_the_model_is_written_deletes_it(upload):
+    session_id = upload(_frame())
+    stages = []
+
+    def progress(stage, fraction):
+        stages.append(stage)
+        if stage == "committing":
+            raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        training.run_training(session_id, progress=progress)
+
+    assert "saving" in stages
+    assert "model_file_id" not in dataset_collection.find_one({"session_id": session_id})
+    assert fs.find_one({"session_id": session_id, "filename": "model.joblib"}) is None
+    assert fs.find_one({"session_id": session_id, "filename": {"$regex": r"\.npz$"}}) is None
+
+
+def test_cancel_after_the_model_is_committed_completes_the_job(upload, manager, monkeypatch):
+    session_id = upload(_frame())
+    job = manager.submit(session_id)
+
+    # The cancel arrives once the session already points at the new model
+    def invalidate(session):
+        manager.cancel(job["job_id"])
+    monkeypatch.setattr(training.model_cache, "invalidate", invalidate)
+
+    result = jobs._run_train_job(job["job_id"], session_id)
+
+    finished = _job(session_id)
+    assert finished["cancel_requested"]
+    assert finished["status"] == "completed"
+    assert finished["stage"] == "done"
+    assert str(dataset_collection.find_one({"session_id": session_id})["model_file_id"]) == result["model_file_id"]
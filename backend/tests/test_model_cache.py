@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.api import model_cache as model_cache_module
+from app.api.model_cache import ModelCache, model_cache
+from app.db.mongo import dataset_collection
+
+
+def _keys(cache):
+    return list(cache._entries)
+
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = ModelCache(max_entries=2, max_bytes=1000)
+    cache.store("a", 1, "model a", 10)
+    cache.store("b", 1, "model b", 10)
+    assert cache.lookup("a", 1) == "model a"
+
+    cache.store("c", 1, "model c", 10)
+
+    assert _keys(cache) == [("a", "1"), ("c", "1")]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 20
+
+
+def test_byte_bound_evicts_until_under_budget():
+    cache = ModelCache(max_entries=10, max_bytes=100)
+    cache.store("a", 1, "model a", 40)
+    cache.store("b", 1, "model b", 40)
+    cache.store("c", 1, "model c", 50)
+
+    assert _keys(cache) == [("b", "1"), ("c", "1")]
+    assert cache.stats()["bytes"] == 90
+
+    # Larger than the whole cache: not stored, nothing else evicted
+    cache.store("d", 1, "model d", 101)
+    assert _keys(cache) == [("b", "1"), ("c", "1")]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_new_model_version_replaces_the_old_one():
+    cache = ModelCache(max_entries=10, max_bytes=1000)
+    cache.store("a", 1, "version 1", 10)
+    cache.store("a", 2, "version 2", 10)
+
+    assert _keys(cache) == [("a", "2")]
+    assert cache.stats()["invalidations"] == 1
+    cache.invalidate("a")
+    assert cache.lookup("a", 2) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_concurrent_loads_of_one_model_call_the_loader_once():
+    cache = ModelCache(max_entries=10, max_bytes=1000)
+    calls = []
+
+    def loader():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return {"model": len(calls)}, 10
+
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        start.wait()
+        results.append(cache.get_or_load("a", 1, loader))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 7
+    assert not cache._key_locks
+
+
+def test_concurrent_async_loads_share_one_download(monkeypatch):
+    monkeypatch.setattr(model_cache_module, "model_cache", ModelCache(10, 1000))
+    calls = []
+
+    async def load(session_id, model_file_id):
+        calls.append(model_file_id)
+        await asyncio.sleep(0.05)
+        artifacts = {"model": model_file_id}
+        model_cache_module.model_cache.store(session_id, model_file_id, artifacts, 10)
+        return artifacts
+
+    monkeypatch.setattr(model_cache_module, "_load_model_async", load)
+
+    async def requests():
+        return await asyncio.gather(
+            *(model_cache_module.get_model_artifacts_async("a", "m1") for _ in range(5))
+        )
+
+    results = asyncio.run(requests())
+
+    assert calls == ["m1"]
+    assert all(result is results[0] for result in results)
+    assert not model_cache_module._async_loads
+
+
+def test_retraining_drops_the_cached_model(client, upload):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"x": rng.normal(size=80), "target": rng.choice(["a", "b"], 80)})
+    session_id = upload(frame)
+    model_cache.clear()
+
+    def predict():
+        response = client.post("/predict", json={"session_id": session_id, "inputs": [{"x": 0.5}]})
+        assert response.status_code == 200, response.text
+
+    def cached_keys():
+        return [key for key in _keys(model_cache) if key[0] == session_id]
+
+    assert client.post("/train", json={"session_id": session_id}).status_code == 200
+    predict()
+    first = cached_keys()
+    assert len(first) == 1
+
+    assert client.post("/train", json={"session_id": session_id}).status_code == 200
+    assert cached_keys() == []
+
+    predict()
+    meta = dataset_collection.find_one({"session_id": session_id})
+    current = str(meta.get("compiled_model_file_id") or meta["model_file_id"])
+    assert cached_keys() == [(session_id, current)]
+    assert cached_keys() != first
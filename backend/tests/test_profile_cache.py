@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from app.api.profile_cache import profile_cache
+
+
+def _frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"x": rng.normal(size=n), "c": rng.choice(["a", "b"], n)})
+
+
+def _profile(client, session_id, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/profile", params={"session_id": session_id}, headers=headers)
+
+
+def test_matching_etag_returns_304(client, upload):
+    session_id = upload(_frame(100, 0))
+    first = _profile(client, session_id)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    before = profile_cache.stats()["not_modified"]
+    response = _profile(client, session_id, etag)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert profile_cache.stats()["not_modified"] == before + 1
+
+    # Any other tag gets the full profile again
+    stale = _profile(client, session_id, '"something-else"')
+    assert stale.status_code == 200
+    assert stale.json()["profile"] == first.json()["profile"]
+
+
+def test_etag_changes_after_append(client, upload):
+    session_id = upload(_frame(100, 0))
+    etag = _profile(client, session_id).headers["ETag"]
+
+    appended = client.post(
+        "/upload/append", data={"session_id": session_id},
+        files={"file": ("more.csv", _frame(50, 1).to_csv(index=False).encode(), "text/csv")},
+    )
+    assert appended.status_code == 200, appended.text
+
+    response = _profile(client, session_id, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["profile"] == appended.json()["profile"]
+    assert _profile(client, session_id, response.headers["ETag"]).status_code == 304
+
+
+def test_etag_follows_the_uploaded_content(client, upload):
+    frame = _frame(100, 0)
+    etag = _profile(client, upload(frame)).headers["ETag"]
+
+    # Re-uploading different rows gives a different tag; the same rows, the same one
+    assert _profile(client, upload(_frame(100, 1))).headers["ETag"] != etag
+    assert _profile(client, upload(frame), etag).status_code == 304
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from app.api import training
+from app.api.compaction import compact_frame
+
+
+def _noop(stage, fraction):
+    pass
+
+
+def test_compacted_string_target_with_many_classes_is_classification(monkeypatch):
+    rng = np.random.default_rng(0)
+    classes = [f"class_{i}" for i in range(25)]
+    frame = pd.DataFrame({"x": rng.normal(size=200), "target": rng.choice(classes, 200)})
+    df, _ = compact_frame(frame)
+    assert isinstance(df["target"].dtype, pd.CategoricalDtype)
+    monkeypatch.setattr(training, "load_dataframe", lambda session_id, meta: df)
+
+    pipeline, label_encoder, target_col, is_classification, X_test, y_test, _, _ = training._fit_in_memory(
+        "session", {}, "standard", {}, _noop
+    )
+
+    assert is_classification
+    assert target_col == "target"
+    assert set(label_encoder.classes_) == set(frame["target"])
+    assert set(label_encoder.inverse_transform(pipeline.predict(X_test))) <= set(classes)
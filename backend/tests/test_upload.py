@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from app.api import upload as upload_module
+from app.api.dataset_store import load_persisted_dataframe
+from app.db.mongo import dataset_collection
+
+# Memory figures are summed per chunk when streaming, so they only roughly agree
+MEMORY_FIELDS = ("memory_bytes", "memory_bytes_before", "approximate_unique")
+
+
+def _frame(rows=40):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "small_int": rng.integers(0, 300, rows),
+        "int_with_gap": np.where(np.arange(rows) == 30, np.nan, rng.integers(0, 5, rows)),
+        "wide_float": rng.normal(size=rows),
+        "exact_float": rng.integers(0, 8, rows) / 4,
+        "category": rng.choice(["a", "b", "c"], rows),
+        "late_category": ["x"] * 20 + list(rng.choice(["y", "z"], rows - 20)),
+        "text": [f"t{i}" for i in range(rows)],
+        "date": pd.date_range("2024-01-01", periods=rows).strftime("%Y-%m-%d"),
+        "numbers_then_text": [str(i) for i in range(rows - 5)] + list("abcde"),
+        "flag": rng.choice([True, False], rows),
+        "empty": [np.nan] * rows,
+    })
+    frame.loc[3, "date"] = np.nan
+    frame.loc[0:10, "category"] = np.nan
+    return frame
+
+
+def _schema(parsed_schema):
+    return [{k: v for k, v in column.items() if k not in MEMORY_FIELDS} for column in parsed_schema]
+
+
+def test_streaming_upload_stores_what_an_in_memory_upload_does(client, monkeypatch):
+    # Several chunks, so column types have to agree across them
+    monkeypatch.setattr(upload_module, "UPLOAD_PARSE_CHUNK_ROWS", 7)
+    body = _frame().to_csv(index=False).encode()
+
+    results = {}
+    for stream in (False, True):
+        response = client.post(
+            "/upload", params={"stream": stream}, files={"file": ("data.csv", body, "text/csv")}
+        )
+        assert response.status_code == 200, response.text
+        session_id = response.json()["session_id"]
+        meta = dataset_collection.find_one({"session_id": session_id})
+        results[stream] = response.json(), meta, load_persisted_dataframe(session_id, meta)
+    (in_memory, memory_meta, memory_df), (streamed, streamed_meta, streamed_df) = results[False], results[True]
+
+    assert _schema(streamed["parsed_schema"]) == _schema(in_memory["parsed_schema"])
+    assert _schema(streamed_meta["parsed_schema"]) == _schema(memory_meta["parsed_schema"])
+    assert set(streamed["memory_profile"]) == set(in_memory["memory_profile"])
+    assert streamed_meta.keys() == memory_meta.keys()
+    for key in ("num_rows", "num_columns", "csv_sha256"):
+        assert streamed_meta[key] == memory_meta[key]
+    assert streamed_meta["parquet_file_id"] is not None
+    assert streamed_meta["profile_aggregates"]["dataset_version"] == 0
+
+    # Categories are unified in order of appearance rather than sorted
+    pd.testing.assert_frame_equal(streamed_df, memory_df, check_categorical=False)
+    assert {col: str(dtype) for col, dtype in streamed_df.dtypes.items()} == {
+        "small_int": "int16", "int_with_gap": "float32", "wide_float": "float64",
+        "exact_float": "float32", "category": "category", "late_category": "category",
+        "text": "str", "date": "datetime64[us]", "numbers_then_text": "str",
+        "flag": "bool", "empty": "float32",
+    }